@@ -1,15 +1,21 @@
 import streamlit as st
 import pandas as pd
 import os
-from main import main as run_pipeline
+from datetime import date
+from src import runner
+from src.cache import dataset_cache
+from src.metrics import load_last_run
+from src.risk import RiskEngine, risk_table_for
+from src.raster import RASTER_RESOLUTION, density_image
+from src.slice_index import SliceIndex
 from src.data_analysis import (
-    load_weekly_data, 
-    generate_hourly_chart,
-    generate_top_chart,
-    generate_biome_chart,
+    load_weekly_snapshot,
+    load_weekly_density,
+    render_hourly_chart,
+    render_top_chart,
+    render_biome_chart,
     calculate_risk_df
 )
-import glob
 
 # Configuração da página
 st.set_page_config(page_title="Monitor de Queimadas", layout="wide")
@@ -18,43 +24,85 @@ st.set_page_config(page_title="Monitor de Queimadas", layout="wide")
 st.title("🔥 Monitor de Queimadas no Brasil")
 st.markdown("Dashboard interativo para análise de focos de queimadas da última semana.")
 
-# Botão para executar o pipeline
+# Botão para executar o pipeline: a execução acontece num processo separado
+# (ver src/runner.py), com lock, e o dashboard continua respondendo enquanto isso
 if st.button("Atualizar e Analisar Novos Dados"):
-    with st.spinner("Executando o pipeline completo... Por favor, aguarde."):
-        try:
-            run_pipeline()
-            st.success("Pipeline executado com sucesso! Os dados foram atualizados.")
-        except Exception as e:
-            st.error(f"Ocorreu um erro durante a execução do pipeline: {e}")
+    if runner.start_background():
+        st.success("Pipeline iniciado em segundo plano. O dashboard passa a usar os novos dados ao final da execução.")
+    else:
+        st.warning("O pipeline já está em execução.")
 
 # --- Carregamento dos Dados e Definição de Caminhos ---
-REPORTS_DIR = "reports"
 PROCESSED_DATA_DIR = os.path.join("data", "processed")
-df_semana = load_weekly_data(PROCESSED_DATA_DIR)
+
+# Os dados e tudo o que deriva deles ficam num cache do processo, compartilhado
+# entre as sessões e indexado pela versão dos dados processados: quando o
+# pipeline grava dados novos, a versão muda e o cache é descartado. Durante uma
+# execução, a versão fica presa à anterior, e a troca acontece de uma vez no fim:
+# rollup e densidade são lidos dos retratos dessa versão (ver src/snapshot.py),
+# nunca dos arquivos que o pipeline está gravando.
+data_version = runner.data_version(PROCESSED_DATA_DIR)
+hoje = date.today()
+
+# Progresso da execução em andamento, consultado a cada 2 s só enquanto ela dura
+status_execucao = runner.load_status()
+em_execucao = bool(status_execucao) and status_execucao['estado'] in ('iniciando', 'executando')
+
+@st.fragment(run_every=2 if em_execucao else None)
+def progresso_pipeline():
+    status = runner.load_status()
+    if status and status['estado'] in ('iniciando', 'executando'):
+        etapa = status.get('etapa') or 'iniciando'
+        st.progress(runner.progress(status), text=f"Pipeline em execução (etapa: {etapa})...")
+    elif runner.data_version(PROCESSED_DATA_DIR) != data_version or (status and em_execucao):
+        # A execução terminou: recarrega a página inteira com a versão nova
+        st.rerun()
+    elif status and status['estado'] == 'erro':
+        st.error(f"Ocorreu um erro durante a execução do pipeline: {status.get('erro')}")
+    elif status and status['estado'] == 'interrompido':
+        st.warning("A última execução do pipeline foi interrompida.")
+
+progresso_pipeline()
+
+def cached(key, compute):
+    return dataset_cache.get_or_compute(data_version, (hoje,) + key, compute)
+
+# Rollup diário (estado x município x bioma x hora) da semana, no retrato Arrow
+# mapeado em memória (ver src/snapshot.py): abri-lo não copia os dados, e
+# gráficos e tabela de risco são agregados com os kernels do Arrow
+df_semana = cached(('semana',), lambda: load_weekly_snapshot(PROCESSED_DATA_DIR, version=data_version))
 
 # --- Layout Principal ---
-if not df_semana.empty:
+if df_semana.num_rows:
     st.sidebar.header("Filtros de Análise")
     
+    # Rollup ordenado por (estado, dia), com as posições de cada estado e dia:
+    # os filtros abaixo são fatias, sem percorrer o DataFrame a cada interação
+    indice = cached(('indice',), lambda: SliceIndex(df_semana))
+
     # --- Filtro Principal de Estado (na barra lateral) ---
-    estados = ['Brasil (Todos)'] + sorted(df_semana['estado'].unique().tolist())
+    estados = ['Brasil (Todos)'] + indice.estados
     estado_selecionado = st.sidebar.selectbox("Selecione uma Localidade", estados)
 
     # Filtra dados com base no estado e define o nível de análise
     if estado_selecionado != 'Brasil (Todos)':
-        df_analise = df_semana[df_semana['estado'] == estado_selecionado]
+        estado_filtro = estado_selecionado
         level_top_chart = 'municipio'
         level_risk_table = 'municipio'
         titulo_localidade = estado_selecionado
     else:
-        df_analise = df_semana
+        estado_filtro = None
         level_top_chart = 'estado'
         level_risk_table = 'estado'
         titulo_localidade = 'Brasil'
+    df_analise = indice.select(estado_filtro)
 
     # --- Filtro de Dia (na barra lateral) ---
-    dias = ['Todos os Dias'] + sorted(df_analise['data_hora_gmt'].dt.date.unique().tolist())
+    dias = ['Todos os Dias'] + indice.dias(estado_filtro)
     dia_selecionado = st.sidebar.selectbox("Selecione o Dia (para análise horária)", dias)
+    deduplicar = st.sidebar.checkbox("Contar eventos (sem duplicatas entre satélites)",
+                                     help="O mesmo fogo detectado por vários satélites na mesma "
+                                          "área e hora conta uma única vez na tabela de risco.")
 
     st.header(f"Análise Detalhada para: {titulo_localidade}")
 
@@ -62,7 +110,15 @@ if not df_semana.empty:
     
     # 1. Tabela de Risco
     st.subheader(f"Localidades em Situação Crítica em {titulo_localidade}")
-    df_risco = calculate_risk_df(df_analise, level=level_risk_table)
+    if estado_selecionado != 'Brasil (Todos)':
+        # Tabelas de todos os estados calculadas de uma vez; cada estado é uma consulta
+        tabela_risco_estados = cached(('risco_estados', deduplicar),
+                                      lambda: RiskEngine(df_semana, level='municipio', group='estado',
+                                                         dedup=deduplicar).top_k(15))
+        df_risco = risk_table_for(tabela_risco_estados, estado_selecionado)
+    else:
+        df_risco = cached(('risco', estado_selecionado, deduplicar),
+                          lambda: calculate_risk_df(df_analise, level=level_risk_table, dedup=deduplicar))
     if not df_risco.empty:
         st.dataframe(df_risco.style.format({
             'media_dias_sem_chuva': '{:.1f}',
@@ -72,23 +128,22 @@ if not df_semana.empty:
     else:
         st.info("Nenhum foco de queimada registrado para esta localidade na última semana.")
 
-    # Gera os gráficos dinâmicos
-    generate_top_chart(df_analise, REPORTS_DIR, level=level_top_chart)
-    generate_biome_chart(df_analise, REPORTS_DIR)
+    # Gera os gráficos dinâmicos em memória (PNG em cache, sem passar pelo disco)
+    grafico_localidade = cached(('grafico_localidade', estado_selecionado),
+                                lambda: render_top_chart(df_analise, level=level_top_chart))
+    grafico_bioma = cached(('grafico_bioma', estado_selecionado), lambda: render_biome_chart(df_analise))
 
     # 2. Gráficos de Topo e Bioma
     col1, col2 = st.columns(2)
-    path_grafico_localidade = os.path.join(REPORTS_DIR, 'focos_por_localidade.png')
-    path_grafico_bioma = os.path.join(REPORTS_DIR, 'focos_por_bioma.png')
 
     with col1:
-        if os.path.exists(path_grafico_localidade):
-            st.image(path_grafico_localidade, use_column_width=True)
+        if grafico_localidade is not None:
+            st.image(grafico_localidade, use_column_width=True)
         else:
             st.info("Sem dados para o gráfico de localidades.")
     with col2:
-        if os.path.exists(path_grafico_bioma):
-            st.image(path_grafico_bioma, use_column_width=True)
+        if grafico_bioma is not None:
+            st.image(grafico_bioma, use_column_width=True)
         else:
             st.info("Sem dados para o gráfico de biomas.")
             
@@ -96,19 +151,48 @@ if not df_semana.empty:
     st.subheader("Análise Horária Detalhada")
     
     # Aplica o filtro de dia para a análise horária
-    df_horaria = df_analise.copy()
+    df_horaria = df_analise
     location_name = titulo_localidade
     
     if dia_selecionado != 'Todos os Dias':
-        df_horaria = df_horaria[df_horaria['data_hora_gmt'].dt.date == dia_selecionado]
+        df_horaria = indice.select(estado_filtro, dia_selecionado)
         location_name += f" - {dia_selecionado.strftime('%d/%m/%Y')}"
         
-    generate_hourly_chart(df_horaria, REPORTS_DIR, location_name)
-    path_grafico_hora = os.path.join(REPORTS_DIR, 'focos_por_hora.png')
-    if os.path.exists(path_grafico_hora):
-        st.image(path_grafico_hora, use_column_width=True)
+    grafico_hora = cached(('grafico_hora', estado_selecionado, dia_selecionado),
+                          lambda: render_hourly_chart(df_horaria, location_name))
+    if grafico_hora is not None:
+        st.image(grafico_hora, use_column_width=True)
     else:
         st.warning("Não há dados de focos para a seleção horária atual.")
 
+    # 4. Mapa de Densidade (soma dos rasters diários gravados na ingestão, do retrato da semana)
+    st.subheader(f"Mapa de Densidade de Focos em {titulo_localidade}")
+    camada = st.radio("Camada do mapa", ['focos', 'frp'], horizontal=True,
+                      format_func=lambda c: 'Número de focos' if c == 'focos' else 'FRP total (MW)')
+    if dia_selecionado != 'Todos os Dias':
+        inicio_mapa = fim_mapa = dia_selecionado
+    else:
+        inicio_mapa, fim_mapa = dias[1], dias[-1]
+    densidade = cached(('densidade', estado_selecionado, dia_selecionado),
+                       lambda: load_weekly_density(PROCESSED_DATA_DIR, inicio_mapa, fim_mapa, estado=estado_filtro,
+                                                   version=data_version))
+    if densidade.any():
+        mapa = cached(('mapa', estado_selecionado, dia_selecionado, camada),
+                      lambda: density_image(densidade, camada))
+        st.image(mapa, caption=f"Células de {RASTER_RESOLUTION:g}° (escala logarítmica)")
+    else:
+        st.info("Sem mapa de densidade para a seleção atual (reprocesse os dados para gerá-lo).")
+
 else:
-    st.info("Clique no botão 'Atualizar e Analisar Novos Dados' para carregar os dados.") 
\ No newline at end of file
+    st.info("Clique no botão 'Atualizar e Analisar Novos Dados' para carregar os dados.") 
+
+# --- Métricas da última execução do pipeline ---
+ultima_execucao = load_last_run("reports")
+if ultima_execucao:
+    with st.sidebar.expander("Métricas da última execução"):
+        st.caption(f"Início: {ultima_execucao['inicio']} | "
+                   f"duração: {ultima_execucao['duracao_total_s']:.1f} s")
+        etapas = pd.DataFrame.from_dict(ultima_execucao['etapas'], orient='index')
+        st.dataframe(etapas[['chamadas', 'duracao_s', 'cpu_s']].style.format(
+            {'duracao_s': '{:.3f}', 'cpu_s': '{:.3f}'}))
+        st.json(ultima_execucao['contadores'])
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""
+Compara o download sequencial (um `requests.get` por arquivo) com o download
+em paralelo de `download_files`, usando um servidor HTTP local que simula a
+latência do servidor do INPE.
+
+Uso:
+    python -m benchmarks.bench_download --dias 90 --latencia 0.2
+"""
+import argparse
+import functools
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from src.data_collection import download_files
+
+SAMPLE_FILE = os.path.join('data', 'raw', 'focos_diario_br_20250604.csv')
+
+class _SlowHandler(SimpleHTTPRequestHandler):
+    """Servidor de arquivos estáticos com latência fixa por requisição."""
+    latency = 0.0
+
+    def send_head(self):
+        time.sleep(self.latency)
+        return super().send_head()
+
+    def log_message(self, format, *args):
+        pass
+
+def _serve(directory: str, latency: float):
+    handler = functools.partial(_SlowHandler, directory=directory)
+    _SlowHandler.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dias', type=int, default=90, help='Número de arquivos diários servidos.')
+    parser.add_argument('--latencia', type=float, default=0.2, help='Latência simulada por requisição (s).')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench_download_')
+    server_dir = os.path.join(work_dir, 'server')
+    os.makedirs(server_dir)
+    start = date(2025, 1, 1)
+    names = [f"focos_diario_br_{(start + timedelta(days=i)):%Y%m%d}.csv" for i in range(args.dias)]
+    for name in names:
+        shutil.copyfile(SAMPLE_FILE, os.path.join(server_dir, name))
+
+    server = _serve(server_dir, args.latencia)
+    base_url = f"http://127.0.0.1:{server.server_port}/"
+    urls = [base_url + name for name in names]
+
+    try:
+        # Caminho antigo: um requests.get por arquivo, corpo inteiro em memória
+        serial_dir = os.path.join(work_dir, 'serial')
+        os.makedirs(serial_dir)
+        t0 = time.perf_counter()
+        for url in urls:
+            response = requests.get(url, timeout=60)
+            with open(os.path.join(serial_dir, os.path.basename(url)), 'wb') as f:
+                f.write(response.content)
+        serial = time.perf_counter() - t0
+
+        bulk_dir = os.path.join(work_dir, 'bulk')
+        t0 = time.perf_counter()
+        download_files(urls, bulk_dir, max_workers=args.workers)
+        bulk = time.perf_counter() - t0
+
+        # Segunda execução: todos os arquivos são revalidados (304)
+        t0 = time.perf_counter()
+        download_files(urls, bulk_dir, max_workers=args.workers)
+        revalidate = time.perf_counter() - t0
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\n{args.dias} arquivos, latência de {args.latencia:.2f}s por requisição")
+    print(f"Sequencial:              {serial:7.2f}s")
+    print(f"download_files ({args.workers} thr): {bulk:7.2f}s  ({serial / bulk:.1f}x)")
+    print(f"Revalidação (304):       {revalidate:7.2f}s")
+
+if __name__ == '__main__':
+    main()
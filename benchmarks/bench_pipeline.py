@@ -0,0 +1,212 @@
+"""
+Mede o tempo e o pico de memória das etapas do pipeline sobre dados sintéticos
+(ver benchmarks/synthetic.py) e compara com a linha de base gravada em
+benchmarks/baseline.json. Termina com código 1 se alguma etapa regredir além
+da tolerância.
+
+Cada caso roda em um processo novo, para que o pico de memória (RSS) de um
+caso não contamine o do seguinte. O pico inclui a preparação do caso (ex:
+carregar a semana antes de calcular o risco) e a importação das bibliotecas.
+
+Uso:
+    python -m benchmarks.bench_pipeline --linhas 100000
+    python -m benchmarks.bench_pipeline --linhas 1000000 --salvar-baseline
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.synthetic import generate_dataset
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+def _processed_dir(work_dir):
+    return os.path.join(work_dir, 'processed')
+
+def _weekly(work_dir):
+    from src.data_analysis import load_weekly_data
+    return load_weekly_data(_processed_dir(work_dir))
+
+def _top_estado(df):
+    return df['estado'].value_counts().index[0]
+
+# --- Casos: cada um faz a sua preparação e devolve a função a ser medida ---
+
+def _case_process_data(work_dir):
+    from src.data_processing import process_data
+    raw_files = sorted(os.listdir(os.path.join(work_dir, 'raw')))
+    out_dir = os.path.join(work_dir, 'process_data')
+
+    def run():
+        for name in raw_files:
+            stem = os.path.splitext(name)[0]
+            process_data(os.path.join(work_dir, 'raw', name), os.path.join(out_dir, stem + '.parquet'),
+                         verbose=False, rollup_file_path=os.path.join(out_dir, '_rollup', stem + '.parquet'))
+    return run
+
+def _case_load_weekly_data(work_dir):
+    from src.data_analysis import load_weekly_data
+    return lambda: load_weekly_data(_processed_dir(work_dir))
+
+def _case_calculate_risk_df(work_dir):
+    from src.data_analysis import calculate_risk_df
+    df = _weekly(work_dir)
+    return lambda: (calculate_risk_df(df, 'municipio'), calculate_risk_df(df, 'estado'))
+
+def _case_generate_hourly_chart(work_dir):
+    from src.data_analysis import generate_hourly_chart
+    df = _weekly(work_dir)
+    return lambda: generate_hourly_chart(df, os.path.join(work_dir, 'reports'))
+
+def _case_generate_top_chart(work_dir):
+    from src.data_analysis import generate_top_chart
+    df = _weekly(work_dir)
+    return lambda: generate_top_chart(df, os.path.join(work_dir, 'reports'), level='estado')
+
+def _case_generate_biome_chart(work_dir):
+    from src.data_analysis import generate_biome_chart
+    df = _weekly(work_dir)
+    return lambda: generate_biome_chart(df, os.path.join(work_dir, 'reports'))
+
+def _case_filtro_app(work_dir):
+    # Mesmo caminho que o app.py percorre (sem o cache) ao selecionar um estado e um dia:
+    # retratos da semana, SliceIndex, RiskEngine por estado, gráficos e mapa de densidade
+    from src.data_analysis import (load_weekly_snapshot, load_weekly_density, prepare_weekly_snapshots,
+                                   render_top_chart, render_biome_chart, render_hourly_chart)
+    from src.risk import RiskEngine, risk_table_for
+    from src.raster import density_image
+    from src.slice_index import SliceIndex
+
+    # Os retratos são gravados pelo pipeline; o caso mede só a leitura
+    prepare_weekly_snapshots(_processed_dir(work_dir))
+    indice = SliceIndex(load_weekly_snapshot(_processed_dir(work_dir)))
+    estado = max(indice.estados, key=lambda e: indice.select(e).num_rows)
+
+    def run():
+        df_semana = load_weekly_snapshot(_processed_dir(work_dir))
+        indice = SliceIndex(df_semana)
+        df_analise = indice.select(estado)
+        dias = indice.dias(estado)
+        risk_table_for(RiskEngine(df_semana, level='municipio', group='estado').top_k(15), estado)
+        render_top_chart(df_analise, level='municipio')
+        render_biome_chart(df_analise)
+        render_hourly_chart(df_analise, estado)
+        render_hourly_chart(indice.select(estado, dias[-1]), estado)
+        density_image(load_weekly_density(_processed_dir(work_dir), dias[0], dias[-1], estado=estado))
+    return run
+
+CASES = {
+    'process_data': _case_process_data,
+    'load_weekly_data': _case_load_weekly_data,
+    'calculate_risk_df': _case_calculate_risk_df,
+    'generate_hourly_chart': _case_generate_hourly_chart,
+    'generate_top_chart': _case_generate_top_chart,
+    'generate_biome_chart': _case_generate_biome_chart,
+    'filtro_app': _case_filtro_app,
+}
+
+def _run_case(name: str, work_dir: str, repeats: int) -> dict:
+    """Executa um caso no processo atual: menor tempo entre as repetições e pico de RSS."""
+    import matplotlib
+    matplotlib.use('Agg')
+    from src.metrics import peak_rss_mb
+
+    run = CASES[name](work_dir)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return {'tempo_s': min(timings), 'pico_rss_mb': peak_rss_mb()}
+
+def run_benchmarks(work_dir: str, cases: list, repeats: int) -> dict:
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for name in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results[name] = executor.submit(_run_case, name, work_dir, repeats).result()
+        print(f"  {name:<24} {results[name]['tempo_s']:8.3f} s  {results[name]['pico_rss_mb'] or 0:8.1f} MB")
+    return results
+
+def compare(results: dict, baseline: dict, time_tolerance: float, memory_tolerance: float) -> list:
+    """Lista as regressões (tempo ou memória acima da linha de base mais a tolerância)."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for key, tolerance in (('tempo_s', time_tolerance), ('pico_rss_mb', memory_tolerance)):
+            if result.get(key) is None or base.get(key) is None:
+                continue
+            limit = base[key] * (1 + tolerance)
+            if result[key] > limit:
+                regressions.append(f"{name}: {key} = {result[key]:.3f} (linha de base {base[key]:.3f}, "
+                                   f"limite {limit:.3f})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--linhas', type=int, default=100_000, help='Total de focos sintéticos (10k a 10M).')
+    parser.add_argument('--dias', type=int, default=7)
+    parser.add_argument('--skew', type=float, default=1.0)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--casos', default=','.join(CASES), help='Casos a executar, separados por vírgula.')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--tolerancia', type=float, default=0.5,
+                        help='Aumento de tempo tolerado em relação à linha de base (0.5 = 50%%).')
+    parser.add_argument('--tolerancia-memoria', type=float, default=0.25)
+    parser.add_argument('--salvar-baseline', action='store_true',
+                        help='Grava os resultados como a nova linha de base desta escala.')
+    args = parser.parse_args()
+
+    cases = [c.strip() for c in args.casos.split(',') if c.strip()]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"casos desconhecidos: {', '.join(sorted(unknown))}")
+
+    work_dir = tempfile.mkdtemp(prefix='bench_pipeline_')
+    try:
+        print(f"Gerando {args.linhas} focos sintéticos em {args.dias} dias...")
+        generate_dataset(os.path.join(work_dir, 'raw'), args.linhas, args.dias, skew=args.skew)
+        from src.data_processing import process_new_files
+        process_new_files(os.path.join(work_dir, 'raw'), _processed_dir(work_dir))
+        os.makedirs(os.path.join(work_dir, 'reports'))
+
+        print("Executando os casos:")
+        results = run_benchmarks(work_dir, cases, args.repeticoes)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    scale = f"{args.linhas}x{args.dias}"
+    try:
+        with open(args.baseline, encoding='utf-8') as f:
+            baselines = json.load(f)
+    except FileNotFoundError:
+        baselines = {}
+
+    if args.salvar_baseline:
+        baselines[scale] = {**baselines.get(scale, {}), **results}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Linha de base da escala {scale} gravada em {args.baseline}.")
+        return
+
+    if scale not in baselines:
+        print(f"Sem linha de base para a escala {scale}; use --salvar-baseline para gravá-la.")
+        return
+    regressions = compare(results, baselines[scale], args.tolerancia, args.tolerancia_memoria)
+    if regressions:
+        print("REGRESSÕES DE DESEMPENHO:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"Nenhuma regressão em relação à linha de base da escala {scale}.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Mede o tempo de inicialização de cada subcomando de main.py (fetch, ingest,
+report, all): o tempo para um interpretador novo importar main.py e os módulos
+que o subcomando usa (ver `COMMAND_MODULES`), sem executar a etapa. Compara
+com a linha de base gravada em benchmarks/baseline.json (chave "startup") e
+termina com código 1 se algum subcomando regredir além da tolerância.
+
+Uso:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --salvar-baseline
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_pipeline import BASELINE_FILE, compare
+from main import COMMAND_MODULES
+
+BASELINE_KEY = 'startup'
+# Bibliotecas pesadas cuja presença em cada subcomando é registrada no resultado
+HEAVY_MODULES = ['pandas', 'pyarrow', 'matplotlib']
+
+_SCRIPT = """
+import sys, time, importlib
+start = time.perf_counter()
+import main
+for module in main.COMMAND_MODULES[sys.argv[1]]:
+    importlib.import_module(module)
+print(time.perf_counter() - start, *[m for m in sys.argv[2:] if m in sys.modules])
+"""
+
+def measure(command: str, repeats: int) -> dict:
+    """Menor tempo (processo completo e só as importações) entre `repeats` interpretadores novos."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    totals, imports = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', _SCRIPT, command, *HEAVY_MODULES], cwd=root,
+                                capture_output=True, text=True, check=True).stdout.split()
+        totals.append(time.perf_counter() - start)
+        imports.append(float(output[0]))
+    return {'tempo_s': min(totals), 'importacao_s': min(imports), 'modulos_pesados': output[1:]}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--tolerancia', type=float, default=0.5,
+                        help='Aumento de tempo tolerado em relação à linha de base (0.5 = 50%%).')
+    parser.add_argument('--salvar-baseline', action='store_true',
+                        help='Grava os resultados como a nova linha de base.')
+    args = parser.parse_args()
+
+    print("Inicialização dos subcomandos:")
+    results = {}
+    for command in COMMAND_MODULES:
+        results[command] = measure(command, args.repeticoes)
+        print(f"  {command:<8} {results[command]['tempo_s']:6.3f} s  "
+              f"(importações {results[command]['importacao_s']:.3f} s)  "
+              f"{', '.join(results[command]['modulos_pesados']) or '-'}")
+
+    try:
+        with open(args.baseline, encoding='utf-8') as f:
+            baselines = json.load(f)
+    except FileNotFoundError:
+        baselines = {}
+
+    if args.salvar_baseline:
+        baselines[BASELINE_KEY] = results
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Linha de base de inicialização gravada em {args.baseline}.")
+        return
+
+    if BASELINE_KEY not in baselines:
+        print("Sem linha de base de inicialização; use --salvar-baseline para gravá-la.")
+        return
+    regressions = compare(results, baselines[BASELINE_KEY], args.tolerancia, 0)
+    if regressions:
+        print("REGRESSÕES DE DESEMPENHO:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("Nenhuma regressão em relação à linha de base de inicialização.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Gerador de arquivos diários sintéticos no formato do INPE (focos_diario_br_*.csv).
+
+As distribuições são estimadas a partir dos CSVs reais de `data/raw`:
+município (com estado, bioma e ids), satélite, dias sem chuva, precipitação,
+risco de fogo e FRP são sorteados com as frequências observadas, e a hora do
+foco segue o perfil diurno observado. O parâmetro `skew` concentra (>1) ou
+achata (<1) a distribuição dos focos entre os municípios.
+
+Uso:
+    python -m benchmarks.synthetic --linhas 1000000 --dias 7 --saida data/sintetico
+"""
+import argparse
+import glob
+import os
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+
+SAMPLE_DIR = os.path.join('data', 'raw')
+COLUMNS = ['id', 'lat', 'lon', 'data_hora_gmt', 'satelite', 'municipio', 'estado', 'pais',
+           'municipio_id', 'estado_id', 'pais_id', 'numero_dias_sem_chuva', 'precipitacao',
+           'risco_fogo', 'bioma', 'frp']
+# Colunas copiadas de um foco real sorteado (mantém a correlação entre elas e
+# os valores especiais do INPE, como -999 e campos vazios)
+_TEMPLATE_COLUMNS = ['satelite', 'numero_dias_sem_chuva', 'precipitacao', 'risco_fogo', 'frp']
+_PLACE_COLUMNS = ['municipio', 'estado', 'pais', 'municipio_id', 'estado_id', 'pais_id', 'bioma']
+# Tamanho dos blocos gravados de cada vez (limita a memória em escalas grandes)
+_BLOCK_ROWS = 500_000
+
+class Catalog:
+    """Distribuições observadas nos arquivos reais, usadas para sortear os focos."""
+
+    def __init__(self, sample_dir: str = SAMPLE_DIR):
+        files = sorted(glob.glob(os.path.join(sample_dir, 'focos_diario_br_*.csv')))
+        if not files:
+            raise FileNotFoundError(f"Nenhum CSV de amostra encontrado em {sample_dir}")
+        # Tudo como texto: os valores são regravados exatamente como vieram
+        convert = pv.ConvertOptions(column_types={col: pa.string() for col in COLUMNS},
+                                    strings_can_be_null=True)
+        sample = pa.concat_tables([pv.read_csv(f, convert_options=convert) for f in files])
+
+        self.templates = sample.select(_TEMPLATE_COLUMNS)
+
+        # Um registro por município, com peso proporcional ao número de focos
+        # observados e a posição média dos focos
+        places = sample.select(_PLACE_COLUMNS).append_column(
+            'lat', pc.cast(pc.utf8_trim_whitespace(sample['lat']), pa.float64())).append_column(
+            'lon', pc.cast(pc.utf8_trim_whitespace(sample['lon']), pa.float64()))
+        grouped = places.group_by(_PLACE_COLUMNS).aggregate(
+            [('lat', 'mean'), ('lat', 'count'), ('lon', 'mean')])
+        self.places = grouped.select(_PLACE_COLUMNS)
+        self.place_counts = grouped['lat_count'].to_numpy().astype('float64')
+        self.place_lat = grouped['lat_mean'].to_numpy()
+        self.place_lon = grouped['lon_mean'].to_numpy()
+
+        timestamps = pc.strptime(sample['data_hora_gmt'], format='%Y-%m-%d %H:%M:%S', unit='s')
+        hours = pc.hour(timestamps).to_numpy()
+        # Suavização para que nenhuma hora fique com probabilidade zero
+        hour_counts = np.bincount(hours, minlength=24).astype('float64') + 1
+        self.hour_weights = hour_counts / hour_counts.sum()
+
+    def place_weights(self, skew: float = 1.0) -> np.ndarray:
+        weights = self.place_counts ** skew
+        return weights / weights.sum()
+
+def _random_ids(rng: np.random.Generator, n: int) -> pa.Array:
+    """Ids no formato de UUID (8-4-4-4-12 dígitos hexadecimais)."""
+    hex_digits = np.frombuffer(rng.bytes(16 * n).hex().encode('ascii'), dtype='S32')
+    raw = pc.cast(pa.array(hex_digits, pa.binary()), pa.string())
+    parts = [pc.utf8_slice_codeunits(raw, start, stop)
+             for start, stop in ((0, 8), (8, 12), (12, 16), (16, 20), (20, 32))]
+    return pc.binary_join_element_wise(*parts, '-')
+
+def _generate_block(catalog: Catalog, rng: np.random.Generator, n: int, day: date,
+                    place_weights: np.ndarray) -> pa.Table:
+    place_idx = rng.choice(len(place_weights), size=n, p=place_weights)
+    template_idx = rng.integers(0, catalog.templates.num_rows, size=n)
+    hours = rng.choice(24, size=n, p=catalog.hour_weights)
+    seconds = hours * 3600 + rng.integers(0, 60, size=n) * 60
+    timestamps = np.datetime64(day, 's') + seconds.astype('timedelta64[s]')
+
+    places = catalog.places.take(place_idx)
+    templates = catalog.templates.take(template_idx)
+    # Dispersão dos focos em torno da posição média do município (~10 km)
+    lat = np.round(catalog.place_lat[place_idx] + rng.normal(0, 0.1, size=n), 6)
+    lon = np.round(catalog.place_lon[place_idx] + rng.normal(0, 0.1, size=n), 6)
+
+    columns = {
+        'id': _random_ids(rng, n),
+        'lat': pa.array(lat),
+        'lon': pa.array(lon),
+        'data_hora_gmt': pa.array(np.sort(timestamps)),
+    }
+    for col in _TEMPLATE_COLUMNS:
+        columns[col] = templates[col]
+    for col in _PLACE_COLUMNS:
+        columns[col] = places[col]
+    return pa.table({col: columns[col] for col in COLUMNS})
+
+def generate_focos_csv(path: str, n_rows: int, day: date, catalog: Catalog = None,
+                       seed: int = 0, skew: float = 1.0) -> str:
+    """
+    Grava um arquivo diário sintético com `n_rows` focos.
+
+    Args:
+        path (str): Caminho do CSV a ser gravado.
+        n_rows (int): Número de focos do dia.
+        day (date): Dia dos focos (data_hora_gmt).
+        catalog (Catalog, opcional): Distribuições de referência (padrão: data/raw).
+        seed (int): Semente do gerador aleatório.
+        skew (float): Expoente aplicado às frequências dos municípios.
+
+    Returns:
+        str: O caminho do arquivo gravado.
+    """
+    catalog = catalog or Catalog()
+    rng = np.random.default_rng(seed)
+    weights = catalog.place_weights(skew)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write((','.join(COLUMNS) + '\n').encode('utf-8'))
+        options = pv.WriteOptions(include_header=False)
+        remaining = n_rows
+        while remaining > 0:
+            n = min(remaining, _BLOCK_ROWS)
+            pv.write_csv(_generate_block(catalog, rng, n, day, weights), f, options)
+            remaining -= n
+    return path
+
+def generate_dataset(raw_data_dir: str, total_rows: int, days: int = 7, end_date: date = None,
+                     seed: int = 0, skew: float = 1.0, sample_dir: str = SAMPLE_DIR) -> list:
+    """
+    Gera `days` arquivos diários terminando em `end_date` (padrão: hoje), com
+    `total_rows` focos no total.
+
+    Returns:
+        list: Os caminhos dos arquivos gravados, do mais antigo ao mais recente.
+    """
+    end_date = end_date or datetime.now().date()
+    catalog = Catalog(sample_dir)
+    per_day = [total_rows // days + (1 if i < total_rows % days else 0) for i in range(days)]
+    paths = []
+    for i, n_rows in enumerate(per_day):
+        day = end_date - timedelta(days=days - 1 - i)
+        path = os.path.join(raw_data_dir, f"focos_diario_br_{day:%Y%m%d}.csv")
+        paths.append(generate_focos_csv(path, n_rows, day, catalog, seed=seed + i, skew=skew))
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--linhas', type=int, default=100_000, help='Total de focos gerados.')
+    parser.add_argument('--dias', type=int, default=7, help='Número de arquivos diários.')
+    parser.add_argument('--saida', default=os.path.join('data', 'sintetico'))
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--skew', type=float, default=1.0,
+                        help='Concentração dos focos entre os municípios (1 = observada).')
+    args = parser.parse_args()
+
+    paths = generate_dataset(args.saida, args.linhas, args.dias, seed=args.semente, skew=args.skew)
+    size = sum(os.path.getsize(p) for p in paths)
+    print(f"{len(paths)} arquivos gerados em {args.saida} ({args.linhas} focos, {size / 1024 ** 2:.1f} MB).")
+
+if __name__ == '__main__':
+    main()
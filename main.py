@@ -1,60 +1,104 @@
-from src.data_collection import get_last_week_file_urls, download_file
-from src.data_processing import process_data
-from src.data_analysis import analyze_and_generate_report
+from src import metrics
 import os
-import glob
+import argparse
 
-def main():
-    """
-    Orquestra o pipeline completo: coleta, processamento e análise dos dados de queimadas.
-    """
-    print("--- INICIANDO PIPELINE DE MONITORAMENTO DE QUEIMADAS ---")
+# Os módulos de cada etapa são importados só quando a etapa roda: a coleta não
+# carrega pandas/pyarrow e nenhuma etapa além do relatório carrega o matplotlib.
+# COMMAND_MODULES lista o que cada subcomando importa (ver benchmarks/bench_startup.py).
+COMMAND_MODULES = {
+    'fetch': ['src.data_collection'],
+    'ingest': ['src.data_processing'],
+    'report': ['src.data_analysis'],
+}
+COMMAND_MODULES['all'] = [module for modules in COMMAND_MODULES.values() for module in modules]
+
+REPORTS_DIR = "reports"
+RAW_DATA_DIR = os.path.join("data", "raw")
+PROCESSED_DATA_DIR = os.path.join("data", "processed")
+
+def fetch():
+    """Baixa (ou revalida) os arquivos da última semana."""
+    from src.data_collection import LISTING_URL, get_last_week_file_urls, download_files
 
-    # --- 1. Coleta de Dados ---
     print("\n[ETAPA 1/3] Coletando dados da última semana...")
-    LISTING_URL = "https://dataserver-coids.inpe.br/queimadas/queimadas/focos/csv/diario/Brasil/"
-    RAW_DATA_DIR = os.path.join("data", "raw")
-    
-    urls_to_download = get_last_week_file_urls(LISTING_URL)
-    
+    with metrics.stage('listagem'):
+        urls_to_download = get_last_week_file_urls(LISTING_URL)
+
     if not urls_to_download:
         print("Nenhum arquivo novo encontrado para baixar. Análise será feita com dados existentes.")
     else:
-        for url in urls_to_download:
-            file_name = os.path.basename(url)
-            save_path = os.path.join(RAW_DATA_DIR, file_name)
-            if not os.path.exists(save_path):
-                print(f"Baixando {file_name}...")
-                download_file(url, save_path)
-            else:
-                print(f"Arquivo {file_name} já existe. Pulando download.")
-
-    # --- 2. Processamento de Dados ---
+        # Downloads em paralelo; arquivos existentes (como o do dia corrente,
+        # que cresce ao longo do dia) são revalidados com requisições condicionais.
+        with metrics.stage('download'):
+            download_files(urls_to_download, RAW_DATA_DIR)
+
+def ingest():
+    """Processa os arquivos brutos novos ou alterados."""
+    from src.data_processing import process_new_files
+
     print("\n[ETAPA 2/3] Processando novos dados...")
-    PROCESSED_DATA_DIR = os.path.join("data", "processed")
-    
-    # Pega todos os arquivos CSV do diretório raw
-    all_raw_files = glob.glob(os.path.join(RAW_DATA_DIR, '*.csv'))
-    for raw_file_path in all_raw_files:
-        file_name = os.path.basename(raw_file_path)
-        processed_file_name = os.path.splitext(file_name)[0] + '.parquet'
-        processed_file_path = os.path.join(PROCESSED_DATA_DIR, processed_file_name)
-        
-        # Processa apenas se o arquivo processado ainda não existir
-        if not os.path.exists(processed_file_path):
-            print(f"Processando {file_name}...")
-            process_data(raw_file_path, processed_file_path)
-        else:
-            print(f"Arquivo {file_name} já foi processado. Pulando.")
-
-
-    # --- 3. Análise e Geração de Relatório ---
+    # Processa, em paralelo, apenas os arquivos novos ou alterados (ver manifesto)
+    with metrics.stage('processamento'):
+        process_new_files(RAW_DATA_DIR, PROCESSED_DATA_DIR)
+
+def report(all_states: bool = False):
+    """Gera o relatório da semana (e, opcionalmente, os de cada estado)."""
+    from src.data_analysis import analyze_and_generate_report, generate_state_reports
+
     print("\n[ETAPA 3/3] Gerando relatório de análise...")
-    REPORTS_DIR = "reports"
-    analyze_and_generate_report(PROCESSED_DATA_DIR, REPORTS_DIR)
+    with metrics.stage('analise'):
+        analyze_and_generate_report(PROCESSED_DATA_DIR, REPORTS_DIR)
+    if all_states:
+        with metrics.stage('relatorios_estados'):
+            generate_state_reports(PROCESSED_DATA_DIR, REPORTS_DIR)
+
+def main(all_states: bool = False, profile_stages: list = None, on_stage=None, command: str = 'all'):
+    """
+    Orquestra o pipeline completo: coleta, processamento e análise dos dados de queimadas.
+
+    Os tempos de cada etapa, a vazão e o pico de memória da execução são
+    gravados em reports/metricas/ (ver src/metrics.py).
+
+    Args:
+        all_states (bool): Se True, gera também os relatórios de cada estado
+            em reports/estados/.
+        profile_stages (list, opcional): Etapas a perfilar com cProfile e
+            tracemalloc (padrão: variável de ambiente PIPELINE_PROFILE).
+        on_stage (callable, opcional): Chamado no início e no fim de cada
+            etapa (ver `metrics.RunMetrics`).
+        command (str): Parte do pipeline a executar: 'fetch', 'ingest',
+            'report' ou 'all' (todas).
+    """
+    print("--- INICIANDO PIPELINE DE MONITORAMENTO DE QUEIMADAS ---")
+    metrics.start_run(profile_stages, on_stage)
+
+    try:
+        # --- 1. Coleta de Dados ---
+        if command in ('fetch', 'all'):
+            fetch()
+        # --- 2. Processamento de Dados ---
+        if command in ('ingest', 'all'):
+            ingest()
+        # --- 3. Análise e Geração de Relatório ---
+        if command in ('report', 'all'):
+            report(all_states)
+    finally:
+        metrics_path = metrics.finish_run(REPORTS_DIR)
 
     print("\n--- PIPELINE CONCLUÍDO COM SUCESSO! ---")
     print(f"Relatórios gerados na pasta: {REPORTS_DIR}")
+    print(f"Métricas da execução: {metrics_path}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Pipeline de monitoramento de queimadas.")
+    parser.add_argument('comando', nargs='?', default='all', choices=list(COMMAND_MODULES),
+                        help="Parte do pipeline a executar: fetch (coleta), ingest (processamento), "
+                             "report (relatórios) ou all (todas, padrão).")
+    parser.add_argument('--todos-estados', action='store_true',
+                        help="Gera também os relatórios de cada estado em reports/estados/.")
+    parser.add_argument('--perfil', metavar='ETAPAS',
+                        help="Etapas a perfilar com cProfile e tracemalloc, separadas por vírgula "
+                             "(ex: processamento,analise; '*' perfila todas).")
+    args = parser.parse_args()
+    profile_stages = args.perfil.split(',') if args.perfil else None
+    main(all_states=args.todos_estados, profile_stages=profile_stages, command=args.comando)
@@ -0,0 +1,84 @@
+import pandas as pd
+import sys
+import threading
+from collections import OrderedDict
+
+class VersionedLRUCache:
+    """
+    Cache em memória, compartilhado pelo processo, limitado pelo tamanho estimado dos valores.
+
+    Todas as entradas pertencem a uma versão dos dados (ver
+    `get_data_version`); quando uma versão nova é pedida, as entradas da versão
+    anterior são descartadas. Dentro da mesma versão, as entradas menos usadas
+    recentemente são removidas quando o total passa de `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.version = None
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, version: str, key, compute):
+        """
+        Retorna o valor de `key` na `version` pedida, calculando-o com `compute()` se preciso.
+
+        Args:
+            version (str): Versão dos dados à qual o valor pertence.
+            key: Chave (hashable) do valor dentro da versão.
+            compute (callable): Função sem argumentos que produz o valor.
+
+        Returns:
+            O valor em cache ou recém-calculado.
+        """
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.total_bytes = 0
+                self.version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+
+        value = compute()
+        size = estimate_size(value)
+
+        with self._lock:
+            if version != self.version or key in self._entries:
+                return value
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            # Remove as entradas mais antigas, mas nunca a que acabou de entrar
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, old_size) = self._entries.popitem(last=False)
+                self.total_bytes -= old_size
+        return value
+
+    def clear(self):
+        """Descarta todas as entradas."""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+            self.version = None
+
+    def __len__(self):
+        return len(self._entries)
+
+def estimate_size(value) -> int:
+    """Estima, em bytes, a memória ocupada por um valor guardado no cache."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    # Tabelas Arrow, vetores do numpy e índices (ver `SliceIndex.nbytes`)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+# Instância única do processo: no Streamlit, os módulos importados sobrevivem
+# às reexecuções do script, então todas as sessões compartilham este cache.
+dataset_cache = VersionedLRUCache()
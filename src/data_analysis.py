@@ -1,9 +1,30 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
 import os
 import glob
-import matplotlib.pyplot as plt
-import seaborn as sns
+import io
+import unicodedata
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib import colormaps
+from matplotlib.figure import Figure
 from datetime import datetime, timedelta
+import pyarrow.compute as pc
+from src.data_processing import to_pandas, ROLLUP_DIR
+from src.snapshot import (open_snapshot, ensure_snapshot, read_snapshot, daily_totals, filter_estado,
+                          ensure_density_snapshot, read_density)
+from src.metrics import timed
+from src.risk import RiskEngine, RISK_WEIGHTS, RISK_COLUMNS, risk_table_for, table_columns, is_empty
+
+# Unidades da federação, como aparecem na coluna `estado` dos arquivos do INPE
+ESTADOS = [
+    'ACRE', 'ALAGOAS', 'AMAPÁ', 'AMAZONAS', 'BAHIA', 'CEARÁ', 'DISTRITO FEDERAL',
+    'ESPÍRITO SANTO', 'GOIÁS', 'MARANHÃO', 'MATO GROSSO', 'MATO GROSSO DO SUL',
+    'MINAS GERAIS', 'PARÁ', 'PARAÍBA', 'PARANÁ', 'PERNAMBUCO', 'PIAUÍ',
+    'RIO DE JANEIRO', 'RIO GRANDE DO NORTE', 'RIO GRANDE DO SUL', 'RONDÔNIA',
+    'RORAIMA', 'SANTA CATARINA', 'SÃO PAULO', 'SERGIPE', 'TOCANTINS',
+]
 
 def find_latest_processed_file(processed_data_dir: str) -> str:
     """
@@ -15,177 +36,451 @@ def find_latest_processed_file(processed_data_dir: str) -> str:
     Returns:
         str: O caminho para o arquivo mais recente, ou None se o diretório estiver vazio.
     """
-    list_of_files = glob.glob(os.path.join(processed_data_dir, '*.parquet'))
+    list_of_files = glob.glob(os.path.join(processed_data_dir, '**', '*.parquet'), recursive=True)
     if not list_of_files:
         return None
     latest_file = max(list_of_files, key=os.path.getctime)
     return latest_file
 
-def load_weekly_data(processed_data_dir: str) -> pd.DataFrame:
+def _iso_date(value) -> str:
+    """Normaliza date, datetime ou texto 'AAAA-MM-DD' para o formato da partição."""
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+    return value.strftime('%Y-%m-%d')
+
+@timed()
+def load_data(processed_data_dir: str, start_date=None, end_date=None,
+              estados: list = None, columns: list = None) -> pd.DataFrame:
+    """
+    Carrega os dados processados aplicando os filtros diretamente na leitura do dataset.
+
+    O intervalo de datas seleciona apenas as partições data=... necessárias; o
+    filtro de estado descarta partições estado=... ou, sem elas, os grupos de
+    linhas cujas estatísticas não contêm os estados pedidos; e só as colunas
+    pedidas são lidas do disco.
+
+    Args:
+        processed_data_dir (str): O caminho para o diretório de dados processados.
+        start_date (date | str, opcional): Primeiro dia (inclusive).
+        end_date (date | str, opcional): Último dia (inclusive).
+        estados (list, opcional): Estados a incluir.
+        columns (list, opcional): Colunas a carregar (padrão: todas).
+
+    Returns:
+        pd.DataFrame: Os dados filtrados, ou um DataFrame vazio.
+    """
+    table = _read_dataset(processed_data_dir, start_date, end_date, estados, columns)
+    if table is None or table.num_rows == 0:
+        return pd.DataFrame()
+    return to_pandas(table)
+
+def _read_dataset(path: str, start_date=None, end_date=None, estados: list = None, columns: list = None):
+    """Lê um dataset particionado por dia com filtros e projeção de colunas (ver `load_data`)."""
+    try:
+        dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    except FileNotFoundError:
+        return None
+    names = dataset.schema.names
+    if not names:
+        return None
+
+    expr = None
+    conditions = []
+    if 'data' in names:
+        if start_date is not None:
+            conditions.append(ds.field('data') >= _iso_date(start_date))
+        if end_date is not None:
+            conditions.append(ds.field('data') <= _iso_date(end_date))
+    if estados is not None and 'estado' in names:
+        conditions.append(ds.field('estado').isin(list(estados)))
+    for condition in conditions:
+        expr = condition if expr is None else expr & condition
+
+    # A coluna de partição "data" só é carregada se pedida explicitamente
+    if columns is None:
+        columns = [c for c in names if c != 'data']
+    else:
+        columns = [c for c in columns if c in names]
+
+    return dataset.to_table(columns=columns, filter=expr)
+
+def _last_days(window_days: int):
+    """Retorna o primeiro e o último dia da janela dos últimos `window_days` dias (incluindo hoje)."""
+    today = datetime.now().date()
+    return today - timedelta(days=window_days - 1), today
+
+def _last_week():
+    """Retorna o primeiro e o último dia da janela da última semana (7 dias, incluindo hoje)."""
+    return _last_days(7)
+
+def load_weekly_data(processed_data_dir: str, estados: list = None, columns: list = None) -> pd.DataFrame:
     """
     Carrega todos os arquivos de dados processados da última semana e os combina.
 
     Args:
         processed_data_dir (str): O caminho para o diretório de dados processados.
+        estados (list, opcional): Estados a incluir.
+        columns (list, opcional): Colunas a carregar (padrão: todas).
 
     Returns:
         pd.DataFrame: Um DataFrame contendo todos os dados da semana, ou um DataFrame vazio.
     """
-    today = datetime.now()
-    seven_days_ago = today - timedelta(days=7)
-    all_files = glob.glob(os.path.join(processed_data_dir, '*.parquet'))
-    
-    weekly_dfs = []
-    for f in all_files:
-        try:
-            # Extrai a data do nome do arquivo
-            date_str = os.path.basename(f).split('_')[-1].split('.')[0]
-            file_date = datetime.strptime(date_str, '%Y%m%d')
-            if seven_days_ago <= file_date <= today:
-                df = pd.read_parquet(f)
-                weekly_dfs.append(df)
-        except (ValueError, IndexError):
-            continue
-    
-    if not weekly_dfs:
+    start_date, end_date = _last_week()
+    return load_data(processed_data_dir, start_date=start_date, end_date=end_date,
+                     estados=estados, columns=columns)
+
+@timed()
+def load_rollup(processed_data_dir: str, start_date=None, end_date=None, estados: list = None) -> pd.DataFrame:
+    """
+    Carrega o rollup diário (estado x município x bioma x hora) gerado na ingestão.
+
+    As funções de gráfico e `calculate_risk_df` aceitam esse DataFrame no lugar
+    dos focos individuais, com custo proporcional ao número de grupos.
+
+    Args:
+        processed_data_dir (str): O caminho para o diretório de dados processados.
+        start_date (date | str, opcional): Primeiro dia (inclusive).
+        end_date (date | str, opcional): Último dia (inclusive).
+        estados (list, opcional): Estados a incluir.
+
+    Returns:
+        pd.DataFrame: O rollup com a coluna `data` (datetime), ou um DataFrame vazio.
+    """
+    table = _read_dataset(os.path.join(processed_data_dir, ROLLUP_DIR), start_date, end_date, estados,
+                          columns=['data', 'estado', 'municipio', 'bioma', 'hora', 'total_focos', 'eventos',
+                                   'soma_dias_sem_chuva', 'n_dias_sem_chuva', 'soma_frp', 'n_frp'])
+    if table is None or table.num_rows == 0 or 'data' not in table.column_names:
         return pd.DataFrame()
-        
-    return pd.concat(weekly_dfs, ignore_index=True)
+    i = table.column_names.index('data')
+    table = table.set_column(i, 'data', pc.strptime(table.column(i), format='%Y-%m-%d', unit='s'))
+    return to_pandas(table)
 
-def generate_hourly_chart(df: pd.DataFrame, reports_dir: str, location_name: str = "Brasil"):
-    """Gera e salva um gráfico da distribuição de focos por hora."""
-    
-    # Garante que a coluna 'hora' exista
-    if 'data_hora_gmt' in df.columns and pd.api.types.is_datetime64_any_dtype(df['data_hora_gmt']):
-        df['hora'] = df['data_hora_gmt'].dt.hour
-    
-    if df.empty or 'hora' not in df.columns:
-        print(f"Não há dados para gerar o gráfico horário para {location_name}.")
+def load_weekly_rollup(processed_data_dir: str, estados: list = None) -> pd.DataFrame:
+    """Carrega o rollup diário da última semana (ver `load_rollup`)."""
+    start_date, end_date = _last_week()
+    return load_rollup(processed_data_dir, start_date=start_date, end_date=end_date, estados=estados)
+
+def load_weekly_snapshot(processed_data_dir: str, version: str = None) -> pa.Table:
+    """
+    Abre o retrato (Arrow, mapeado em memória) do rollup diário da última semana.
+
+    As funções de gráfico e `calculate_risk_df` aceitam a tabela no lugar do
+    DataFrame e fazem as agregações com os kernels do Arrow (ver src/snapshot.py).
+
+    Args:
+        processed_data_dir (str): O caminho para o diretório de dados processados.
+        version (str, opcional): Versão dos dados (padrão: a atual); uma versão
+            anterior só é lida do seu retrato, nunca dos arquivos atuais.
+    """
+    start_date, end_date = _last_week()
+    return open_snapshot(processed_data_dir, start_date, end_date, version)
+
+def load_weekly_density(processed_data_dir: str, start_date=None, end_date=None, estado: str = None,
+                        version: str = None) -> np.ndarray:
+    """
+    Soma a densidade de dias da última semana (ver `src.raster.load_density`), lida do retrato da versão.
+
+    Args:
+        processed_data_dir (str): O caminho para o diretório de dados processados.
+        start_date (date, opcional): Primeiro dia (inclusive).
+        end_date (date, opcional): Último dia (inclusive).
+        estado (str, opcional): Mantém só as células do estado.
+        version (str, opcional): Versão dos dados (ver `load_weekly_snapshot`).
+    """
+    path = ensure_density_snapshot(processed_data_dir, *_last_week(), version)
+    return read_density(path, start_date, end_date, estado)
+
+def prepare_weekly_snapshots(processed_data_dir: str):
+    """Grava os retratos da última semana na versão atual, antes de o pipeline alterar os dados."""
+    start_date, end_date = _last_week()
+    ensure_snapshot(processed_data_dir, start_date, end_date)
+    ensure_density_snapshot(processed_data_dir, start_date, end_date)
+
+def is_rollup(df: pd.DataFrame) -> bool:
+    """Indica se o DataFrame é um rollup (contagens agregadas) e não focos individuais."""
+    return 'total_focos' in table_columns(df)
+
+def _count_by(df: pd.DataFrame, col: str) -> pd.Series:
+    """Total de focos por valor de `col`, a partir de focos individuais ou de um rollup (pandas ou Arrow)."""
+    if isinstance(df, pa.Table):
+        if df.num_rows == 0:
+            return pd.Series(dtype='int64')
+        if is_rollup(df):
+            sums = df.group_by(col).aggregate([('total_focos', 'sum')])
+            labels, values = sums.column(col), sums.column('total_focos_sum')
+        else:
+            counts = pc.value_counts(df.column(col))
+            labels, values = counts.field('values'), counts.field('counts')
+        counts = pd.Series(values.to_numpy(zero_copy_only=False), index=labels.to_pylist(), dtype='int64')
+        return counts[counts.index.notna()].sort_values(ascending=False)
+    if is_rollup(df):
+        counts = df.groupby(col, observed=True)['total_focos'].sum()
+        return counts.sort_values(ascending=False)
+    return df[col].value_counts()
+
+def _figure_to_png(fig: Figure) -> bytes:
+    """Codifica uma figura em PNG, em memória."""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+def _write_chart(png: bytes, path: str) -> bool:
+    """Grava o PNG no disco ou, se não houver gráfico, remove a versão antiga do arquivo."""
+    if png is None:
         # Se o gráfico antigo existir, remove para não mostrar dados desatualizados
-        path_grafico_hora = os.path.join(reports_dir, 'focos_por_hora.png')
-        if os.path.exists(path_grafico_hora):
-            os.remove(path_grafico_hora)
-        return
-
-    focos_por_hora = df['hora'].value_counts().sort_index().reset_index()
-    focos_por_hora.columns = ['Hora', 'Total de Focos']
-
-    plt.figure(figsize=(12, 7))
-    sns.lineplot(data=focos_por_hora, x='Hora', y='Total de Focos', marker='o', color='red')
-    title = f'Distribuição de Focos por Hora - {location_name}'
-    plt.title(title)
-    plt.xlabel('Hora do Dia')
-    plt.ylabel('Total de Focos')
-    plt.xticks(range(0, 24))
-    plt.grid(True, linestyle='--', alpha=0.6)
-    plt.tight_layout()
+        if os.path.exists(path):
+            os.remove(path)
+        return False
+    with open(path, 'wb') as f:
+        f.write(png)
+    return True
+
+def _hour_counts(df: pd.DataFrame) -> pd.Series:
+    """Total de focos por hora do dia, sem alterar o DataFrame recebido."""
+    if is_rollup(df) or 'hora' in table_columns(df):
+        return _count_by(df, 'hora')
+    if isinstance(df, pa.Table):
+        if 'data_hora_gmt' in df.column_names and pa.types.is_timestamp(df.schema.field('data_hora_gmt').type):
+            return _count_by(pa.table({'hora': pc.hour(df.column('data_hora_gmt'))}), 'hora')
+        return pd.Series(dtype='int64')
+    if 'data_hora_gmt' in df.columns and pd.api.types.is_datetime64_any_dtype(df['data_hora_gmt']):
+        return df['data_hora_gmt'].dt.hour.value_counts()
+    return pd.Series(dtype='int64')
+
+@timed()
+def render_hourly_chart(df: pd.DataFrame, location_name: str = "Brasil") -> bytes:
+    """
+    Renderiza em memória o gráfico da distribuição de focos por hora.
+
+    Returns:
+        bytes: A imagem PNG, ou None se não houver dados.
+    """
+    focos_por_hora = _hour_counts(df).sort_index()
+    if is_empty(df) or focos_por_hora.empty:
+        return None
+
+    fig = Figure(figsize=(12, 7))
+    ax = fig.subplots()
+    ax.plot(focos_por_hora.index, focos_por_hora.values, marker='o', color='red')
+    ax.set_title(f'Distribuição de Focos por Hora - {location_name}')
+    ax.set_xlabel('Hora do Dia')
+    ax.set_ylabel('Total de Focos')
+    ax.set_xticks(range(0, 24))
+    ax.grid(True, linestyle='--', alpha=0.6)
+    fig.tight_layout()
+    return _figure_to_png(fig)
+
+def _barh(ax, labels: list, values: list, cmap: str):
+    """Barras horizontais com a maior no topo, coloridas ao longo de um colormap."""
+    colors = colormaps[cmap](np.linspace(0, 1, len(values))) if len(values) > 1 else colormaps[cmap]([0.0])
+    positions = np.arange(len(values))
+    ax.barh(positions, values, color=colors)
+    ax.set_yticks(positions, labels)
+    ax.invert_yaxis()
+
+@timed()
+def render_top_chart(df: pd.DataFrame, level: str = 'estado') -> bytes:
+    """
+    Renderiza em memória o gráfico de Top 10 para estados ou municípios.
+
+    Returns:
+        bytes: A imagem PNG, ou None se não houver dados.
+    """
+    title_name = 'Estados' if level == 'estado' else 'Municípios'
+    if is_empty(df) or level not in table_columns(df):
+        return None
+
+    focos_counts = _count_by(df, level).nlargest(10)
+    focos_counts = focos_counts[focos_counts > 0]
+    if focos_counts.empty:
+        return None
+
+    fig = Figure(figsize=(12, 8))
+    ax = fig.subplots()
+    # Rótulos como texto: categorias não observadas não devem virar barras vazias
+    _barh(ax, focos_counts.index.astype(str).tolist(), focos_counts.values, 'viridis')
+    ax.set_title(f'Top 10 {title_name} com Mais Focos de Queimada')
+    ax.set_xlabel('Total de Focos')
+    ax.set_ylabel(title_name)
+    fig.tight_layout()
+    return _figure_to_png(fig)
+
+@timed()
+def render_biome_chart(df: pd.DataFrame) -> bytes:
+    """
+    Renderiza em memória o gráfico de distribuição por bioma.
+
+    Returns:
+        bytes: A imagem PNG, ou None se não houver dados.
+    """
+    if is_empty(df) or 'bioma' not in table_columns(df):
+        return None
+
+    focos_por_bioma = _count_by(df, 'bioma')
+    focos_por_bioma = focos_por_bioma[focos_por_bioma > 0]
+    if focos_por_bioma.empty:
+        return None
+
+    fig = Figure(figsize=(10, 7))
+    ax = fig.subplots()
+    _barh(ax, focos_por_bioma.index.astype(str).tolist(), focos_por_bioma.values, 'plasma')
+    ax.set_title('Total de Focos de Queimada por Bioma')
+    ax.set_xlabel('Total de Focos')
+    ax.set_ylabel('Bioma')
+    fig.tight_layout()
+    return _figure_to_png(fig)
+
+@timed()
+def render_weekly_chart(focos_por_dia: pd.Series, window_days: int = 7) -> bytes:
+    """
+    Renderiza em memória o gráfico de barras do total de focos por dia.
+
+    Args:
+        focos_por_dia (pd.Series): Total de focos indexado pela data.
+        window_days (int): Tamanho da janela, usado no título.
+
+    Returns:
+        bytes: A imagem PNG, ou None se não houver dados.
+    """
+    if focos_por_dia.empty:
+        return None
+
+    fig = Figure(figsize=(12, 7))
+    ax = fig.subplots()
+    labels = [str(day) for day in focos_por_dia.index]
+    ax.bar(labels, focos_por_dia.values, color='royalblue')
+    ax.set_title(f'Focos de Queimada nos Últimos {window_days} Dias (Brasil)')
+    ax.set_xlabel('Data')
+    ax.set_ylabel('Total de Focos')
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    return _figure_to_png(fig)
+
+@timed()
+def render_daily_chart(focos_por_dia: pd.Series, title: str = None) -> bytes:
+    """
+    Renderiza em memória a série diária de focos de um intervalo longo (linha).
+
+    Args:
+        focos_por_dia (pd.Series): Total de focos indexado pela data.
+        title (str, opcional): Título do gráfico (padrão: o intervalo).
+
+    Returns:
+        bytes: A imagem PNG, ou None se não houver dados.
+    """
+    if focos_por_dia.empty or not focos_por_dia.any():
+        return None
+
+    fig = Figure(figsize=(14, 7))
+    ax = fig.subplots()
+    ax.plot(pd.to_datetime(focos_por_dia.index), focos_por_dia.values, color='firebrick', linewidth=1)
+    ax.set_title(title or f'Focos de Queimada por Dia de {focos_por_dia.index[0]} a {focos_por_dia.index[-1]}')
+    ax.set_xlabel('Data')
+    ax.set_ylabel('Total de Focos')
+    ax.grid(True, linestyle='--', alpha=0.6)
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    return _figure_to_png(fig)
+
+@timed()
+def render_season_chart(acumulado: pd.DataFrame) -> bytes:
+    """
+    Renderiza em memória o total acumulado de focos ao longo de cada temporada.
+
+    Args:
+        acumulado (pd.DataFrame): Uma coluna por ano, indexada pelo dia da temporada.
+
+    Returns:
+        bytes: A imagem PNG, ou None se não houver dados.
+    """
+    if acumulado.empty:
+        return None
+
+    fig = Figure(figsize=(12, 7))
+    ax = fig.subplots()
+    colors = colormaps['viridis'](np.linspace(0, 1, len(acumulado.columns)))
+    for color, year in zip(colors, acumulado.columns):
+        serie = acumulado[year].dropna()
+        # A temporada mais recente (a última coluna) é destacada
+        ax.plot(serie.index, serie.values, label=str(year), color=color,
+                linewidth=2.5 if year == acumulado.columns[-1] else 1.2)
+    ax.set_title('Focos Acumulados por Temporada de Fogo')
+    ax.set_xlabel('Dia da Temporada')
+    ax.set_ylabel('Total Acumulado de Focos')
+    ax.legend()
+    ax.grid(True, linestyle='--', alpha=0.6)
+    fig.tight_layout()
+    return _figure_to_png(fig)
+
+def generate_hourly_chart(df: pd.DataFrame, reports_dir: str, location_name: str = "Brasil") -> bytes:
+    """Gera e salva um gráfico da distribuição de focos por hora (e devolve o PNG)."""
+    png = render_hourly_chart(df, location_name)
     path_grafico_hora = os.path.join(reports_dir, 'focos_por_hora.png')
-    plt.savefig(path_grafico_hora)
-    plt.close()
-    print(f"Gráfico de focos por hora ({location_name}) salvo em: {path_grafico_hora}")
+    if _write_chart(png, path_grafico_hora):
+        print(f"Gráfico de focos por hora ({location_name}) salvo em: {path_grafico_hora}")
+    else:
+        print(f"Não há dados para gerar o gráfico horário para {location_name}.")
+    return png
 
-def generate_top_chart(df: pd.DataFrame, reports_dir: str, level: str = 'estado'):
-    """Gera o gráfico de Top 10 para estados ou municípios."""
-    col_name = level
+def generate_top_chart(df: pd.DataFrame, reports_dir: str, level: str = 'estado') -> bytes:
+    """Gera o gráfico de Top 10 para estados ou municípios (e devolve o PNG)."""
     title_name = 'Estados' if level == 'estado' else 'Municípios'
+    png = render_top_chart(df, level)
     path_grafico = os.path.join(reports_dir, 'focos_por_localidade.png')
+    if _write_chart(png, path_grafico):
+        print(f"Gráfico de Top 10 {title_name} salvo em: {path_grafico}")
+    return png
 
-    if df.empty or col_name not in df.columns:
-        if os.path.exists(path_grafico): os.remove(path_grafico)
-        return
-
-    focos_counts = df[col_name].value_counts().nlargest(10).reset_index()
-    focos_counts.columns = [title_name, 'Total de Focos']
-
-    plt.figure(figsize=(12, 8))
-    sns.barplot(data=focos_counts, x='Total de Focos', y=title_name, hue=title_name, palette='viridis', legend=False)
-    plt.title(f'Top 10 {title_name} com Mais Focos de Queimada')
-    plt.xlabel('Total de Focos')
-    plt.ylabel(title_name)
-    plt.tight_layout()
-    plt.savefig(path_grafico)
-    plt.close()
-    print(f"Gráfico de Top 10 {title_name} salvo em: {path_grafico}")
-
-def generate_biome_chart(df: pd.DataFrame, reports_dir: str):
-    """Gera o gráfico de distribuição por bioma para o DataFrame fornecido."""
+def generate_biome_chart(df: pd.DataFrame, reports_dir: str) -> bytes:
+    """Gera o gráfico de distribuição por bioma para o DataFrame fornecido (e devolve o PNG)."""
+    png = render_biome_chart(df)
     path_grafico = os.path.join(reports_dir, 'focos_por_bioma.png')
-    if df.empty or 'bioma' not in df.columns or df['bioma'].nunique() == 0:
-        if os.path.exists(path_grafico): os.remove(path_grafico)
-        return
-
-    focos_por_bioma = df['bioma'].value_counts().reset_index()
-    focos_por_bioma.columns = ['Bioma', 'Total de Focos']
-
-    plt.figure(figsize=(10, 7))
-    sns.barplot(data=focos_por_bioma, x='Total de Focos', y='Bioma', hue='Bioma', palette='plasma', legend=False)
-    plt.title('Total de Focos de Queimada por Bioma')
-    plt.xlabel('Total de Focos')
-    plt.ylabel('Bioma')
-    plt.tight_layout()
-    plt.savefig(path_grafico)
-    plt.close()
-    print(f"Gráfico de focos por bioma salvo em: {path_grafico}")
-
-def calculate_risk_df(df: pd.DataFrame, level: str = 'municipio') -> pd.DataFrame:
-    """Calcula e retorna um DataFrame com as localidades em risco (estado ou município)."""
-    if df.empty or level not in df.columns:
-        return pd.DataFrame()
-
-    risk_df = df.groupby(level).agg(
-        total_focos=('id', 'count'),
-        media_dias_sem_chuva=('numero_dias_sem_chuva', 'mean'),
-        media_frp=('frp', 'mean')
-    ).reset_index()
+    if _write_chart(png, path_grafico):
+        print(f"Gráfico de focos por bioma salvo em: {path_grafico}")
+    return png
 
-    risk_df['media_frp'].fillna(0, inplace=True)
-    
-    # Normaliza os dados para o cálculo do índice
-    for col in ['total_focos', 'media_dias_sem_chuva', 'media_frp']:
-        range_val = risk_df[col].max() - risk_df[col].min()
-        if range_val > 0:
-            risk_df[col + '_norm'] = (risk_df[col] - risk_df[col].min()) / range_val
-        else:
-            risk_df[col + '_norm'] = 0
+@timed()
+def calculate_risk_df(df: pd.DataFrame, level: str = 'municipio', weights=RISK_WEIGHTS, k: int = 15,
+                      dedup: bool = False) -> pd.DataFrame:
+    """
+    Calcula e retorna um DataFrame com as localidades em risco (estado ou município).
 
-    risk_df['indice_risco'] = (
-        risk_df['total_focos_norm'] * 0.5 + 
-        risk_df['media_dias_sem_chuva_norm'] * 0.3 + 
-        risk_df['media_frp_norm'] * 0.2
-    )
+    Com `dedup=True`, `total_focos` conta eventos deduplicados (o mesmo fogo
+    detectado por vários satélites conta uma vez) em vez de detecções brutas.
 
-    top_critical = risk_df.sort_values(by='indice_risco', ascending=False).head(15)
-    
-    # Renomeia a coluna de localidade para um nome genérico para o app
-    top_critical.rename(columns={level: 'Localidade'}, inplace=True)
-    
-    return top_critical[['Localidade', 'total_focos', 'media_dias_sem_chuva', 'media_frp', 'indice_risco']]
+    Para obter de uma vez as tabelas de todos os estados, use `RiskEngine`
+    (src/risk.py), que normaliza dentro de cada estado em uma única passada.
+    """
+    if is_empty(df) or level not in table_columns(df):
+        return pd.DataFrame()
+    return RiskEngine(df, level=level, group=None, dedup=dedup).top_k(k, weights)
 
-def analyze_and_generate_report(processed_data_dir: str, reports_dir: str):
+def analyze_and_generate_report(processed_data_dir: str, reports_dir: str, window_days: int = 7):
     """
     Carrega os dados da semana e gera um relatório completo para o Brasil.
+
+    As análises são feitas com os kernels do Arrow sobre o retrato do rollup
+    da janela (ver src/snapshot.py), o mesmo arquivo mapeado em memória que a
+    aplicação abre: o custo não depende do número de focos.
+
+    Args:
+        processed_data_dir (str): O caminho para o diretório de dados processados.
+        reports_dir (str): Diretório onde os relatórios serão salvos.
+        window_days (int): Tamanho da janela em dias.
     """
     try:
-        df = load_weekly_data(processed_data_dir)
-        if df.empty:
+        df = open_snapshot(processed_data_dir, *_last_days(window_days))
+        if df.num_rows == 0:
             print("Nenhum dado da última semana encontrado para análise.")
             return
 
-        print(f"Dados da semana carregados com sucesso! Total de {len(df)} registros.")
+        totais_por_dia = daily_totals(df)
+        print(f"Dados da semana carregados com sucesso! Total de {totais_por_dia.sum()} registros.")
         os.makedirs(reports_dir, exist_ok=True)
         
         # --- Gráfico Comparativo Semanal (sempre para o Brasil todo) ---
-        df['data'] = df['data_hora_gmt'].dt.date
-        focos_por_dia = df.groupby('data')['id'].count().reset_index()
-        focos_por_dia.columns = ['Data', 'Total de Focos']
-        plt.figure(figsize=(12, 7))
-        sns.barplot(data=focos_por_dia, x='Data', y='Total de Focos', color='royalblue')
-        plt.title('Focos de Queimada nos Últimos 7 Dias (Brasil)')
-        plt.xticks(rotation=45)
-        plt.tight_layout()
         path_grafico_semanal = os.path.join(reports_dir, 'focos_semanal.png')
-        plt.savefig(path_grafico_semanal)
-        plt.close()
+        _write_chart(render_weekly_chart(totais_por_dia, window_days), path_grafico_semanal)
         print(f"Gráfico do comparativo semanal salvo em: {path_grafico_semanal}")
 
         # --- Gera as análises para o Brasil todo para o pipeline não-interativo ---
@@ -203,6 +498,75 @@ def analyze_and_generate_report(processed_data_dir: str, reports_dir: str):
     except Exception as e:
         print(f"Ocorreu um erro durante a análise e geração de relatório: {e}")
 
+def location_slug(name: str) -> str:
+    """Nome de diretório para uma localidade (ex: 'SÃO PAULO' -> 'sao_paulo')."""
+    ascii_name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    return '_'.join(ascii_name.lower().split())
+
+def _generate_location_report(snapshot: str, estado: str, output_dir: str, location_name: str,
+                              level_top_chart: str, df_risco: pd.DataFrame = None):
+    """
+    Gera o conjunto de relatórios de uma localidade (executado em um processo separado).
+
+    Cada processo abre o retrato da janela (`snapshot`) por mapeamento de
+    memória, em vez de receber uma cópia dos dados, e filtra o seu estado
+    (None para o Brasil todo).
+    """
+    df = read_snapshot(snapshot)
+    if estado is not None:
+        df = filter_estado(df, estado)
+    os.makedirs(output_dir, exist_ok=True)
+    generate_top_chart(df, output_dir, level=level_top_chart)
+    generate_biome_chart(df, output_dir)
+    generate_hourly_chart(df, output_dir, location_name)
+    if df_risco is None:
+        df_risco = calculate_risk_df(df, level='municipio')
+    if df_risco.empty:
+        df_risco = pd.DataFrame(columns=RISK_COLUMNS)
+    df_risco.to_csv(os.path.join(output_dir, 'tabela_risco_municipios.csv'), index=False)
+    return location_name
+
+def generate_state_reports(processed_data_dir: str, reports_dir: str, window_days: int = 7,
+                           max_workers: int = None) -> list:
+    """
+    Gera o conjunto completo de relatórios para o Brasil e para cada estado, em paralelo.
+
+    O retrato da janela é montado uma única vez e aberto por cada processo do
+    pool (ver `_generate_location_report`); cada localidade grava em
+    <reports_dir>/estados/<localidade>/ os gráficos de Top 10, de biomas e
+    horário, além da tabela de risco por município.
+
+    Args:
+        processed_data_dir (str): O caminho para o diretório de dados processados.
+        reports_dir (str): Diretório raiz dos relatórios.
+        window_days (int): Tamanho da janela em dias.
+        max_workers (int, opcional): Número de processos (padrão: núcleos da máquina).
+
+    Returns:
+        list: Nomes das localidades geradas.
+    """
+    snapshot = ensure_snapshot(processed_data_dir, *_last_days(window_days))
+    df = read_snapshot(snapshot)
+    if df.num_rows == 0:
+        print("Nenhum dado da última semana encontrado para análise.")
+        return []
+
+    base_dir = os.path.join(reports_dir, 'estados')
+    estados = sorted(set(ESTADOS) | set(df.column('estado').unique().dictionary_decode().drop_null().to_pylist()))
+
+    # Tabelas de risco de todos os estados em uma única passada (normalizadas dentro de cada estado)
+    risk_tables = RiskEngine(df, level='municipio', group='estado').top_k(15)
+
+    jobs = [(snapshot, None, os.path.join(base_dir, 'brasil'), 'Brasil', 'estado', None)]
+    jobs += [(snapshot, estado, os.path.join(base_dir, location_slug(estado)), estado, 'municipio',
+              risk_table_for(risk_tables, estado))
+             for estado in estados]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        generated = list(executor.map(_generate_location_report, *zip(*jobs)))
+    print(f"Relatórios de {len(generated)} localidades salvos em: {base_dir}")
+    return generated
+
 if __name__ == '__main__':
     # Esta parte é para execução de teste do módulo individualmente
     PROCESSED_DATA_DIR = os.path.join("data", "processed")
@@ -1,89 +1,317 @@
 import requests
 import os
+import re
+import html
+import json
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from src import metrics
 
-def get_last_week_file_urls(listing_url: str) -> list:
+# Arquivo (dentro do diretório de dados brutos) com os validadores HTTP
+# (ETag / Last-Modified) de cada arquivo baixado.
+HTTP_CACHE_FILE = '.http_cache.json'
+CHUNK_SIZE = 1024 * 256
+# Permissões dos arquivos baixados: as mesmas de um open() comum (0666 menos a
+# umask do processo). O arquivo temporário do download nasce com 0600. A umask
+# é lida uma vez, na importação, porque os.umask altera o valor do processo.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+FILE_MODE = 0o666 & ~_UMASK
+# Página com a listagem dos arquivos diários de focos do INPE
+LISTING_URL = "https://dataserver-coids.inpe.br/queimadas/queimadas/focos/csv/diario/Brasil/"
+# href de cada <a> da listagem. A página é um índice simples gerado pelo
+# servidor, então uma expressão regular basta e evita montar a árvore do HTML.
+_HREF_RE = re.compile(r"""<a\s[^>]*?href\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+
+def create_session(pool_size: int = 8) -> requests.Session:
+    """
+    Cria uma sessão HTTP com pool de conexões e novas tentativas automáticas.
+
+    Args:
+        pool_size (int): Número máximo de conexões mantidas abertas por host.
+
+    Returns:
+        requests.Session: A sessão configurada.
+    """
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504),
+                  allowed_methods=('GET', 'HEAD'))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def parse_listing(content) -> list:
+    """
+    Extrai os links (href) de uma página de listagem HTML.
+
+    Args:
+        content (bytes | str): O conteúdo da página.
+
+    Returns:
+        list: Os links, na ordem da página, com as entidades HTML decodificadas.
+    """
+    text = content.decode('utf-8', errors='replace') if isinstance(content, bytes) else content
+    return [html.unescape(a or b or c) for a, b, c in _HREF_RE.findall(text)]
+
+def get_last_week_file_urls(listing_url: str, session: requests.Session = None) -> list:
     """
     Encontra as URLs de todos os arquivos CSV da última semana em uma página de listagem.
 
     Args:
         listing_url (str): A URL da página que lista os arquivos.
+        session (requests.Session, opcional): Sessão HTTP a ser reutilizada.
 
     Returns:
         list: Uma lista de URLs completas dos arquivos da última semana.
     """
+    # Os mesmos 7 dias (incluindo hoje) da janela da análise
+    today = datetime.now()
+    return get_file_urls(listing_url, today - timedelta(days=6), today, session=session)
+
+def get_file_urls(listing_url: str, start_date, end_date, session: requests.Session = None) -> list:
+    """
+    Encontra as URLs dos arquivos CSV diários de um intervalo de datas em uma página de listagem.
+
+    Args:
+        listing_url (str): A URL da página que lista os arquivos.
+        start_date (date | datetime): Primeiro dia (inclusive).
+        end_date (date | datetime): Último dia (inclusive).
+        session (requests.Session, opcional): Sessão HTTP a ser reutilizada.
+
+    Returns:
+        list: Uma lista de URLs completas dos arquivos do intervalo.
+    """
+    http = session or requests
     try:
-        response = requests.get(listing_url, timeout=30)
+        response = http.get(listing_url, timeout=30)
         response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'lxml')
-        
-        csv_links = [a['href'] for a in soup.find_all('a', href=True) if a['href'].endswith('.csv')]
+        csv_links = [link for link in parse_listing(response.content) if link.endswith('.csv')]
         
         if not csv_links:
             print("Nenhum arquivo CSV encontrado na página.")
             return []
 
-        today = datetime.now()
-        seven_days_ago = today - timedelta(days=7)
-        week_files = []
+        # Compara só as datas (o intervalo inclui o último dia inteiro)
+        start_day = start_date.date() if isinstance(start_date, datetime) else start_date
+        end_day = end_date.date() if isinstance(end_date, datetime) else end_date
+        range_files = []
 
         for link in csv_links:
             try:
                 # Extrai a data do nome do arquivo (ex: focos_diario_br_20240611.csv)
                 date_str = link.split('_')[-1].split('.')[0]
-                file_date = datetime.strptime(date_str, '%Y%m%d')
+                file_date = datetime.strptime(date_str, '%Y%m%d').date()
                 
-                if seven_days_ago <= file_date <= today:
-                    week_files.append(urljoin(listing_url, link))
+                if start_day <= file_date <= end_day:
+                    range_files.append(urljoin(listing_url, link))
             except (ValueError, IndexError):
                 # Ignora links que não seguem o padrão de data esperado
                 continue
         
-        print(f"Encontrados {len(week_files)} arquivos da última semana.")
-        return week_files
+        print(f"Encontrados {len(range_files)} arquivos de {start_day} a {end_day}.")
+        return range_files
 
     except requests.exceptions.RequestException as e:
         print(f"Erro ao acessar a página de listagem de arquivos: {e}")
         return []
 
-def download_file(url: str, save_path: str):
+def listing_changed(listing_url: str, raw_data_dir: str, session: requests.Session = None) -> bool:
+    """
+    Verifica, com uma requisição condicional, se a página de listagem mudou desde a última consulta.
+
+    Os validadores (ETag / Last-Modified) e o hash do conteúdo da listagem
+    ficam no mesmo cache HTTP dos downloads. Se o servidor responde 304, nada
+    é baixado; se ele ignora os validadores, o hash do conteúdo decide. A
+    listagem mostra o tamanho e a data de cada arquivo, então ela muda também
+    quando o arquivo do dia corrente cresce.
+
+    Args:
+        listing_url (str): A URL da página que lista os arquivos.
+        raw_data_dir (str): Diretório de dados brutos (onde fica o cache HTTP).
+        session (requests.Session, opcional): Sessão HTTP a ser reutilizada.
+
+    Returns:
+        bool: True se a listagem mudou (ou se é a primeira consulta), False se
+              não mudou ou se a consulta falhou.
+    """
+    http = session or requests
+    cache = _load_http_cache(raw_data_dir)
+    validators = cache.get(listing_url, {})
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    try:
+        response = http.get(listing_url, headers=headers, timeout=30)
+        if response.status_code == 304:
+            return False
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"Erro ao consultar a página de listagem de arquivos: {e}")
+        return False
+
+    digest = hashlib.sha256(response.content).hexdigest()
+    changed = digest != validators.get('sha256')
+    _update_http_cache(raw_data_dir, {listing_url: {'etag': response.headers.get('ETag'),
+                                                    'last_modified': response.headers.get('Last-Modified'),
+                                                    'sha256': digest}})
+    return changed
+
+def download_file(url: str, save_path: str, session: requests.Session = None, validators: dict = None) -> dict:
     """
     Baixa um arquivo de uma URL e o salva.
 
+    O conteúdo é gravado em blocos num arquivo temporário, que só substitui o
+    destino ao final do download. Se o arquivo já existir localmente, a
+    requisição é condicional (If-None-Match / If-Modified-Since) e o servidor
+    pode responder 304 sem reenviar o conteúdo.
+
     Args:
         url (str): A URL do arquivo a ser baixado.
         save_path (str): O caminho onde o arquivo será salvo.
+        session (requests.Session, opcional): Sessão HTTP a ser reutilizada.
+        validators (dict, opcional): ETag e Last-Modified do último download.
+
+    Returns:
+        dict: 'status' ('baixado', 'nao_modificado' ou 'erro'), 'bytes',
+              'etag' e 'last_modified'.
     """
+    http = session or requests
+    validators = validators or {}
+    result = {'status': 'erro', 'bytes': 0,
+              'etag': validators.get('etag'), 'last_modified': validators.get('last_modified')}
+
+    headers = {}
+    if os.path.exists(save_path):
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        # Sem Last-Modified registrado, usa a data de modificação do arquivo local
+        headers['If-Modified-Since'] = (validators.get('last_modified')
+                                        or formatdate(os.path.getmtime(save_path), usegmt=True))
+
+    tmp_path = None
     try:
-        response = requests.get(url, timeout=60) # Aumentado o timeout para arquivos maiores
-        response.raise_for_status()
+        with http.get(url, headers=headers, stream=True, timeout=60) as response: # Aumentado o timeout para arquivos maiores
+            if response.status_code == 304:
+                result['status'] = 'nao_modificado'
+                print(f"Arquivo {os.path.basename(save_path)} não foi modificado no servidor.")
+                return result
+            response.raise_for_status()
 
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+            save_dir = os.path.dirname(save_path) or '.'
+            os.makedirs(save_dir, exist_ok=True)
+
+            fd, tmp_path = tempfile.mkstemp(dir=save_dir, prefix='.', suffix='.part')
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    result['bytes'] += len(chunk)
+            os.chmod(tmp_path, FILE_MODE)
+            os.replace(tmp_path, save_path)
+            tmp_path = None
+
+            result['status'] = 'baixado'
+            result['etag'] = response.headers.get('ETag')
+            result['last_modified'] = response.headers.get('Last-Modified')
 
-        with open(save_path, 'wb') as f:
-            f.write(response.content)
-        
         print(f"Download concluído com sucesso! Arquivo salvo em: {save_path}")
 
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, OSError) as e:
         print(f"Erro ao fazer o download do arquivo: {e}")
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return result
+
+def _load_http_cache(raw_data_dir: str) -> dict:
+    path = os.path.join(raw_data_dir, HTTP_CACHE_FILE)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+_http_cache_lock = threading.Lock()
+
+def _update_http_cache(raw_data_dir: str, entries: dict):
+    """
+    Grava entradas no cache HTTP, relendo o arquivo para não perder as gravadas por outra chamada.
+
+    As atualizações do processo são serializadas por um lock; o arquivo é
+    relido dentro dele, e só as chaves de `entries` são substituídas.
+    """
+    if not entries:
+        return
+    with _http_cache_lock:
+        cache = _load_http_cache(raw_data_dir)
+        cache.update(entries)
+        os.makedirs(raw_data_dir, exist_ok=True)
+        path = os.path.join(raw_data_dir, HTTP_CACHE_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+def download_files(urls: list, raw_data_dir: str, max_workers: int = 4, session: requests.Session = None) -> dict:
+    """
+    Baixa (ou atualiza) vários arquivos em paralelo, com uma sessão HTTP compartilhada.
+
+    Arquivos já existentes são revalidados com requisições condicionais, de
+    modo que o arquivo do dia corrente, que cresce ao longo do dia, é
+    atualizado sem baixar novamente os arquivos que não mudaram.
+
+    Args:
+        urls (list): URLs dos arquivos a serem baixados.
+        raw_data_dir (str): Diretório onde os arquivos serão salvos.
+        max_workers (int): Número máximo de downloads simultâneos.
+        session (requests.Session, opcional): Sessão HTTP a ser reutilizada.
+
+    Returns:
+        dict: Resultado de `download_file` para cada nome de arquivo.
+    """
+    cache = _load_http_cache(raw_data_dir)
+    own_session = session is None
+    session = session or create_session(pool_size=max_workers)
+
+    def _download(url):
+        file_name = os.path.basename(url)
+        save_path = os.path.join(raw_data_dir, file_name)
+        return file_name, download_file(url, save_path, session, cache.get(file_name))
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = dict(executor.map(_download, urls))
+    finally:
+        if own_session:
+            session.close()
+
+    # Os validadores são gravados de uma vez, depois de todos os downloads
+    _update_http_cache(raw_data_dir, {file_name: {'etag': result['etag'], 'last_modified': result['last_modified']}
+                                      for file_name, result in results.items()
+                                      if result['status'] != 'erro' and (result['etag'] or result['last_modified'])})
+
+    baixados = sum(r['status'] == 'baixado' for r in results.values())
+    total_bytes = sum(r['bytes'] for r in results.values())
+    metrics.count('arquivos_baixados', baixados)
+    metrics.count('bytes_baixados', total_bytes)
+    print(f"{baixados} de {len(results)} arquivos baixados ({total_bytes / 1024:.0f} KB).")
+    return results
 
 if __name__ == '__main__':
-    # URL da página com a listagem dos arquivos diários
-    LISTING_URL = "https://dataserver-coids.inpe.br/queimadas/queimadas/focos/csv/diario/Brasil/"
     RAW_DATA_DIR = os.path.join("data", "raw")
 
     urls_to_download = get_last_week_file_urls(LISTING_URL)
     
     if urls_to_download:
-        for url in urls_to_download:
-            file_name = os.path.basename(url)
-            save_path = os.path.join(RAW_DATA_DIR, file_name)
-            # Verifica se o arquivo já existe para não baixar novamente
-            if not os.path.exists(save_path):
-                print(f"Baixando {file_name}...")
-                download_file(url, save_path)
-            else:
-                print(f"Arquivo {file_name} já existe. Pulando o download.") 
\ No newline at end of file
+        # Arquivos existentes são revalidados com requisições condicionais
+        download_files(urls_to_download, RAW_DATA_DIR) 
\ No newline at end of file
@@ -1,47 +1,698 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
 import os
 import glob
+import json
+import shutil
+import hashlib
+import functools
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from src import metrics
+from src.raster import RASTER_RESOLUTION, build_raster, write_raster, raster_path_for, update_estado_masks
+from src.dedup import DedupIndex, conflicts
 
-def process_data(raw_file_path: str, processed_file_path: str):
+# Esquema declarado do CSV de focos do INPE (nomes já padronizados em minúsculas).
+# Colunas de baixa cardinalidade são lidas como dicionário (categóricas no pandas)
+# e as numéricas são estreitadas para o menor tipo que comporta os valores.
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+FOCOS_SCHEMA = pa.schema([
+    ('id', pa.string()),
+    ('lat', pa.float32()),
+    ('lon', pa.float32()),
+    ('data_hora_gmt', pa.timestamp('s')),
+    ('satelite', _CATEGORY),
+    ('municipio', _CATEGORY),
+    ('estado', _CATEGORY),
+    ('pais', _CATEGORY),
+    ('municipio_id', pa.int32()),
+    ('estado_id', pa.int8()),
+    ('pais_id', pa.int8()),
+    ('numero_dias_sem_chuva', pa.int16()),
+    ('precipitacao', pa.float32()),
+    ('risco_fogo', pa.float32()),
+    ('bioma', _CATEGORY),
+    ('frp', pa.float32()),
+])
+CATEGORY_COLUMNS = ['satelite', 'municipio', 'estado', 'pais', 'bioma']
+# Em alguns arquivos a coluna vem com casas decimais (ex.: "10.0") ou vazia; ela é
+# lida como float e convertida para inteiro na limpeza.
+_CSV_READ_TYPES = {'numero_dias_sem_chuva': pa.float32()}
+
+# Manifesto (dentro do diretório de dados processados) que registra, para cada
+# arquivo bruto, o tamanho, a data de modificação, o hash e a saída gerada.
+# O prefixo "_" faz o leitor de datasets do pyarrow ignorar o arquivo.
+MANIFEST_FILE = '_manifest.json'
+
+# Os dados processados formam um dataset Parquet particionado por dia
+# (data=AAAA-MM-DD) e, opcionalmente, por estado (estado=...). Dentro de cada
+# arquivo as linhas são ordenadas por estado, município e horário, e divididas
+# em grupos de linhas, para que as estatísticas de cada grupo permitam ao
+# leitor pular o que não corresponde ao filtro.
+SORT_KEYS = ['estado', 'municipio', 'data_hora_gmt']
+ROW_GROUP_SIZE = 16_384
+
+# Rollup diário (estado x município x bioma x hora) gravado na ingestão, com a
+# mesma partição por dia, em <processed_data_dir>/_rollup. Cada célula guarda
+# contagens e somas, para que as médias possam ser recombinadas de forma exata.
+# `eventos` conta só as primeiras detecções de cada evento (ver src/dedup.py).
+ROLLUP_DIR = '_rollup'
+ROLLUP_KEYS = ['estado', 'municipio', 'bioma', 'hora']
+ROLLUP_SUMS = ['total_focos', 'eventos', 'soma_dias_sem_chuva', 'n_dias_sem_chuva', 'soma_frp', 'n_frp']
+
+# Saídas registradas no manifesto para cada arquivo bruto (o Parquet, o rollup,
+# o raster de densidade e o índice de deduplicação, ver src/raster.py e
+# src/dedup.py); se alguma faltar, o arquivo é reprocessado.
+OUTPUT_KEYS = ('saida', 'rollup', 'raster', 'dedup')
+
+# Ingestão em fluxo (arquivos mensais/anuais do INPE, com milhões de linhas): o
+# CSV é lido em blocos de STREAM_BLOCK_SIZE bytes, juntados em lotes de até
+# STREAM_BATCH_ROWS linhas, e cada lote vira grupos de linhas no Parquet, sem
+# nunca carregar o arquivo inteiro. O leitor do pyarrow lê vários blocos à
+# frente, por isso o bloco é pequeno. Em process_new_files, arquivos maiores
+# que STREAM_THRESHOLD bytes usam esse modo automaticamente; os arquivos não
+# diários menores também são divididos por dia, mas lidos de uma vez.
+STREAM_BLOCK_SIZE = 1024 ** 2
+STREAM_BATCH_ROWS = 131_072
+STREAM_THRESHOLD = 256 * 1024 ** 2
+
+def _csv_options(raw_file_path: str):
+    """Monta as opções de conversão do CSV a partir do cabeçalho real do arquivo."""
+    with open(raw_file_path, encoding='utf-8') as f:
+        header = f.readline().strip().split(',')
+    column_types = {}
+    for col in header:
+        name = col.strip().lower()
+        if name in _CSV_READ_TYPES:
+            column_types[col] = _CSV_READ_TYPES[name]
+        elif name in FOCOS_SCHEMA.names:
+            column_types[col] = FOCOS_SCHEMA.field(name).type
+    return pv.ConvertOptions(column_types=column_types,
+                             timestamp_parsers=['%Y-%m-%d %H:%M:%S'],
+                             strings_can_be_null=True)
+
+def read_focos_csv(raw_file_path: str) -> pa.Table:
     """
-    Lê os dados brutos, limpa e os salva em formato Parquet.
+    Lê um CSV de focos do INPE com o esquema declarado, usando o leitor CSV do pyarrow.
 
     Args:
         raw_file_path (str): Caminho do arquivo de dados brutos.
-        processed_file_path (str): Caminho para salvar o arquivo processado.
+
+    Returns:
+        pa.Table: Tabela com os tipos de `FOCOS_SCHEMA`.
     """
-    try:
-        # Carrega o arquivo CSV
-        df = pd.read_csv(raw_file_path)
+    return pv.read_csv(raw_file_path, convert_options=_csv_options(raw_file_path))
 
-        # Limpeza e Transformação
-        # Converte a coluna de data para datetime
-        df['data_hora_gmt'] = pd.to_datetime(df['data_hora_gmt'], format='%Y-%m-%d %H:%M:%S')
+def clean_focos_table(table: pa.Table) -> pa.Table:
+    """
+    Aplica a limpeza padrão a uma tabela (ou lote) de focos lida do CSV.
 
-        # Verifica valores ausentes (exemplo: preenchendo com 0 para dias sem chuva)
-        df['numero_dias_sem_chuva'].fillna(0, inplace=True)
+    Padroniza os nomes de colunas em minúsculas e preenche os valores ausentes
+    de `numero_dias_sem_chuva` com 0.
+    """
+    # Padroniza os nomes de colunas (opcional, mas boa prática)
+    table = table.rename_columns([col.strip().lower() for col in table.column_names])
+
+    # Verifica valores ausentes (exemplo: preenchendo com 0 para dias sem chuva)
+    if 'numero_dias_sem_chuva' in table.column_names:
+        i = table.column_names.index('numero_dias_sem_chuva')
         # Converte para inteiro, pois não precisamos da parte decimal
-        df['numero_dias_sem_chuva'] = df['numero_dias_sem_chuva'].astype(int)
+        filled = pc.fill_null(table.column(i), 0).cast(pa.int16(), safe=False)
+        table = table.set_column(i, 'numero_dias_sem_chuva', filled)
+    return table
 
-        # Padroniza os nomes de colunas (opcional, mas boa prática)
-        df.columns = [col.strip().lower() for col in df.columns]
+def to_pandas(table: pa.Table) -> pd.DataFrame:
+    """
+    Converte uma tabela de focos para pandas mantendo os tipos compactos.
 
-        # Garante que o diretório de destino exista
-        os.makedirs(os.path.dirname(processed_file_path), exist_ok=True)
-        
-        # Salva o dataframe processado em formato Parquet
-        df.to_parquet(processed_file_path, index=False)
+    Colunas de baixa cardinalidade viram categóricas e textos (como `id`)
+    ficam em memória Arrow em vez de um objeto Python por linha.
+    """
+    for i, name in enumerate(table.column_names):
+        if name in CATEGORY_COLUMNS and not pa.types.is_dictionary(table.schema.field(i).type):
+            table = table.set_column(i, name, pc.dictionary_encode(table.column(i)))
+    return table.to_pandas(types_mapper={pa.string(): pd.StringDtype('pyarrow')}.get)
+
+def prepare_for_storage(table: pa.Table) -> pa.Table:
+    """
+    Ordena a tabela pelas chaves de armazenamento e grava as categóricas como texto.
+
+    O Parquet continua codificando essas colunas com dicionário, mas como texto
+    as estatísticas de min/max de cada grupo de linhas podem ser usadas nos filtros.
+    """
+    for i, name in enumerate(table.column_names):
+        if pa.types.is_dictionary(table.schema.field(i).type):
+            table = table.set_column(i, name, table.column(i).cast(pa.string()))
+    keys = [k for k in SORT_KEYS if k in table.column_names]
+    if keys and table.num_rows:
+        table = table.take(pc.sort_indices(table.select(keys), sort_keys=[(k, 'ascending') for k in keys]))
+    return table
+
+def build_rollup(table: pa.Table) -> pa.Table:
+    """
+    Agrega uma tabela de focos por estado, município, bioma e hora do dia.
+
+    Args:
+        table (pa.Table): Tabela de focos já limpa.
+
+    Returns:
+        pa.Table: Uma linha por célula com as colunas `ROLLUP_SUMS`. Sem a
+                  coluna `evento` (tabela não deduplicada), `eventos` é igual
+                  a `total_focos`.
+    """
+    base = pa.table({
+        'estado': table.column('estado'),
+        'municipio': table.column('municipio'),
+        'bioma': table.column('bioma'),
+        'hora': pc.hour(table.column('data_hora_gmt')).cast(pa.int8()),
+        'id': table.column('id'),
+        'dias': table.column('numero_dias_sem_chuva').cast(pa.int64()),
+        'frp': table.column('frp').cast(pa.float64()),
+        'evento': (table.column('evento').cast(pa.int32()) if 'evento' in table.column_names
+                   else pa.repeat(pa.scalar(1, pa.int32()), table.num_rows)),
+    })
+    grouped = base.group_by(ROLLUP_KEYS).aggregate([
+        ('id', 'count'), ('evento', 'sum'), ('dias', 'sum'), ('dias', 'count'), ('frp', 'sum'), ('frp', 'count'),
+    ])
+    rollup = pa.table({
+        **{key: grouped.column(key) for key in ROLLUP_KEYS},
+        'total_focos': grouped.column('id_count').cast(pa.int32()),
+        'eventos': grouped.column('evento_sum').cast(pa.int32()),
+        'soma_dias_sem_chuva': grouped.column('dias_sum'),
+        'n_dias_sem_chuva': grouped.column('dias_count').cast(pa.int32()),
+        'soma_frp': pc.fill_null(grouped.column('frp_sum'), 0.0),
+        'n_frp': grouped.column('frp_count').cast(pa.int32()),
+    })
+    return prepare_for_storage(rollup)
+
+def _write_parquet_atomic(table: pa.Table, path: str):
+    """Grava um Parquet num arquivo temporário e o move para o destino."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(path), '.' + os.path.basename(path) + '.tmp')
+    pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp_path, path)
+
+def _write_estado_partitions(table: pa.Table, processed_file_path: str):
+    """Grava a tabela em subpartições estado=... dentro da partição do dia."""
+    day_dir = os.path.dirname(processed_file_path)
+    stem = os.path.splitext(os.path.basename(processed_file_path))[0]
+    # Remove a versão anterior deste arquivo em todas as subpartições
+    for old in glob.glob(os.path.join(day_dir, 'estado=*', stem + '-*.parquet')):
+        os.remove(old)
+    tmp_dir = os.path.join(day_dir, '.' + stem + '.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    pq.write_to_dataset(table, tmp_dir, partition_cols=['estado'],
+                        basename_template=stem + '-{i}.parquet', row_group_size=ROW_GROUP_SIZE)
+    for part in os.listdir(tmp_dir):
+        os.makedirs(os.path.join(day_dir, part), exist_ok=True)
+        for name in os.listdir(os.path.join(tmp_dir, part)):
+            os.replace(os.path.join(tmp_dir, part, name), os.path.join(day_dir, part, name))
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def process_data(raw_file_path: str, processed_file_path: str, verbose: bool = True,
+                 partition_by_estado: bool = False, rollup_file_path: str = None,
+                 raster_file_path: str = None, raster_resolution: float = RASTER_RESOLUTION,
+                 dedup: DedupIndex = None) -> int:
+    """
+    Lê os dados brutos, limpa e os salva em formato Parquet.
+
+    Args:
+        raw_file_path (str): Caminho do arquivo de dados brutos.
+        processed_file_path (str): Caminho para salvar o arquivo processado
+            (normalmente dentro da partição do dia, ver `processed_path_for`).
+        verbose (bool): Se True, exibe uma amostra e o resumo do DataFrame.
+        partition_by_estado (bool): Se True, divide a saída em subpartições
+            estado=... ao lado de `processed_file_path`.
+        rollup_file_path (str, opcional): Caminho para salvar o rollup diário
+            (ver `build_rollup`).
+        raster_file_path (str, opcional): Caminho para salvar o raster de
+            densidade (ver `src.raster.build_raster`).
+        raster_resolution (float): Resolução do raster, em graus.
+        dedup (DedupIndex, opcional): Se informado, descarta os focos repetidos
+            e marca os eventos (coluna `evento`); o índice não é gravado aqui
+            (ver `DedupIndex.save`).
+
+    Returns:
+        int | None: Número de linhas gravadas (depois de descartados os
+                    duplicados), ou None em caso de erro.
+    """
+    try:
+        # Carrega o arquivo CSV com o esquema declarado (datas já convertidas)
+        table = read_focos_csv(raw_file_path)
+
+        # Limpeza e Transformação
+        table = clean_focos_table(table)
+        if dedup is not None:
+            table = dedup.apply(table)
+
+        # Salva a tabela processada em formato Parquet (ordenada, em grupos de linhas)
+        stored = prepare_for_storage(table)
+        if partition_by_estado:
+            _write_estado_partitions(stored, processed_file_path)
+        else:
+            _write_parquet_atomic(stored, processed_file_path)
+        if rollup_file_path:
+            _write_parquet_atomic(build_rollup(stored), rollup_file_path)
+        if raster_file_path:
+            write_raster(build_raster(stored, raster_resolution), raster_file_path)
         
         print(f"Dados processados e salvos com sucesso em: {processed_file_path}")
-        print("\nAmostra dos dados processados:")
-        print(df.head())
-        print("\nInformações do DataFrame:")
-        df.info()
+        if verbose:
+            df = to_pandas(table)
+            print("\nAmostra dos dados processados:")
+            print(df.head())
+            print("\nInformações do DataFrame:")
+            df.info()
+        return table.num_rows
 
     except FileNotFoundError:
         print(f"Erro: O arquivo {raw_file_path} não foi encontrado.")
     except Exception as e:
         print(f"Ocorreu um erro durante o processamento dos dados: {e}")
+    return None
+
+def merge_rollups(tables: list) -> pa.Table:
+    """Recombina rollups parciais (ex: de lotes diferentes) somando as células iguais."""
+    tables = [t for t in tables if t is not None and t.num_rows]
+    if len(tables) <= 1:
+        return tables[0] if tables else None
+    grouped = pa.concat_tables(tables).group_by(ROLLUP_KEYS).aggregate([(col, 'sum') for col in ROLLUP_SUMS])
+    schema = tables[0].schema
+    merged = pa.table({name: grouped.column(name if name in ROLLUP_KEYS else name + '_sum').cast(schema.field(name).type)
+                       for name in schema.names})
+    return prepare_for_storage(merged)
+
+def _file_date(raw_file_path: str):
+    """Dia de um arquivo diário (ex: focos_diario_br_20250604.csv), ou None."""
+    stem = os.path.splitext(os.path.basename(raw_file_path))[0]
+    try:
+        return datetime.strptime(stem.split('_')[-1], '%Y%m%d').date()
+    except ValueError:
+        return None
+
+def _split_by_day(table: pa.Table, fixed_day=None):
+    """Divide um lote pelas partições de dia em que as suas linhas devem ser gravadas."""
+    if fixed_day is not None:
+        yield f"{fixed_day:%Y-%m-%d}", table
+        return
+    days = pc.strftime(table.column('data_hora_gmt'), format='%Y-%m-%d')
+    for day in pc.unique(days).to_pylist():
+        if day is not None:
+            yield day, table.filter(pc.equal(days, day))
+
+def _iter_batches(reader, batch_rows: int):
+    """Junta os blocos lidos do CSV em tabelas de até `batch_rows` linhas."""
+    pending, rows = [], 0
+    for batch in reader:
+        pending.append(batch)
+        rows += batch.num_rows
+        if rows >= batch_rows:
+            yield pa.Table.from_batches(pending)
+            pending, rows = [], 0
+    if pending:
+        yield pa.Table.from_batches(pending)
+
+def process_data_streaming(raw_file_path: str, processed_data_dir: str, batch_rows: int = STREAM_BATCH_ROWS,
+                           rollup: bool = True, verbose: bool = True,
+                           raster_resolution: float = RASTER_RESOLUTION, dedup: DedupIndex = None) -> dict:
+    """
+    Processa um CSV grande em fluxo, com memória limitada pelo tamanho do lote.
+
+    O CSV é lido em lotes (`pyarrow.csv.open_csv`) de até `batch_rows` linhas
+    (o pico de memória depende do lote, e não do arquivo), ou de uma vez só se
+    `batch_rows` for None (arquivos pequenos); cada lote recebe a mesma
+    limpeza de `process_data` e é anexado como grupos de linhas, ordenados
+    dentro do lote, a um `ParquetWriter` por partição de dia. Arquivos diários
+    vão inteiros para a partição do seu dia (como em `process_data`); os demais
+    (mensais, anuais) são divididos pelo dia de `data_hora_gmt`. Os rollups e
+    os rasters de cada dia são somados lote a lote e gravados no final. As
+    subpartições por estado não são usadas neste modo.
+
+    Args:
+        raw_file_path (str): Caminho do arquivo de dados brutos.
+        processed_data_dir (str): Diretório de saída (dataset particionado por dia).
+        batch_rows (int, opcional): Número máximo de linhas de cada lote; None
+            para ler o arquivo inteiro num único lote.
+        rollup (bool): Se True, grava também o rollup diário de cada dia.
+        verbose (bool): Se True, exibe a vazão ao final.
+        raster_resolution (float, opcional): Resolução dos rasters de
+            densidade de cada dia, em graus; None para não gravá-los.
+        dedup (DedupIndex, opcional): Deduplicação aplicada a cada lote (ver
+            `process_data`).
+
+    Returns:
+        dict: `linhas` processadas e as listas `saidas`, `rollups` e `rasters`
+              com os arquivos gravados, ou None em caso de erro.
+    """
+    stem = os.path.splitext(os.path.basename(raw_file_path))[0]
+    fixed_day = _file_date(raw_file_path)
+    writers = {}
+    rollups = {}
+    rasters = {}
+    rows = 0
+    start = time.perf_counter()
+    try:
+        if batch_rows is None:
+            batches = [read_focos_csv(raw_file_path)]
+        else:
+            reader = pv.open_csv(raw_file_path, read_options=pv.ReadOptions(block_size=STREAM_BLOCK_SIZE),
+                                 convert_options=_csv_options(raw_file_path))
+            batches = _iter_batches(reader, batch_rows)
+        for batch in batches:
+            table = clean_focos_table(batch)
+            if dedup is not None:
+                table = dedup.apply(table)
+            table = prepare_for_storage(table)
+            rows += table.num_rows
+            for day, part in _split_by_day(table, fixed_day):
+                if day not in writers:
+                    path = os.path.join(processed_data_dir, f"data={day}", stem + '.parquet')
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    tmp_path = os.path.join(os.path.dirname(path), '.' + os.path.basename(path) + '.tmp')
+                    writers[day] = (pq.ParquetWriter(tmp_path, part.schema), tmp_path, path)
+                writer = writers[day][0]
+                writer.write_table(part.cast(writer.schema), row_group_size=ROW_GROUP_SIZE)
+                if rollup:
+                    rollups[day] = merge_rollups([rollups.get(day), build_rollup(part)])
+                if raster_resolution:
+                    raster = build_raster(part, raster_resolution)
+                    rasters[day] = raster if day not in rasters else rasters[day] + raster
+
+        outputs = []
+        for day, (writer, tmp_path, path) in sorted(writers.items()):
+            writer.close()
+            os.replace(tmp_path, path)
+            outputs.append(path)
+        rollup_outputs = []
+        for day, table in sorted(rollups.items()):
+            if table is not None:
+                path = rollup_path_for(os.path.join(processed_data_dir, f"data={day}", stem + '.parquet'),
+                                       processed_data_dir)
+                _write_parquet_atomic(table, path)
+                rollup_outputs.append(path)
+        raster_outputs = []
+        for day, raster in sorted(rasters.items()):
+            path = raster_path_for(os.path.join(processed_data_dir, f"data={day}", stem + '.parquet'),
+                                   processed_data_dir, raster_resolution)
+            write_raster(raster, path)
+            raster_outputs.append(path)
+    except Exception as e:
+        for writer, tmp_path, _ in writers.values():
+            try:
+                writer.close()
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        print(f"Ocorreu um erro durante o processamento em fluxo de {raw_file_path}: {e}")
+        return None
+
+    elapsed = time.perf_counter() - start
+    if verbose:
+        print(f"{raw_file_path}: {rows} linhas em {len(outputs)} dia(s), {elapsed:.1f} s "
+              f"({rows / elapsed if elapsed else 0:,.0f} linhas/s).")
+    return {'linhas': rows, 'saidas': outputs, 'rollups': rollup_outputs, 'rasters': raster_outputs}
+
+def file_sha256(path: str) -> str:
+    """Calcula o hash SHA-256 do conteúdo de um arquivo."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest(processed_data_dir: str) -> dict:
+    """
+    Carrega o manifesto de ingestão do diretório de dados processados.
+
+    Args:
+        processed_data_dir (str): O caminho para o diretório de dados processados.
+
+    Returns:
+        dict: Entradas do manifesto indexadas pelo nome do arquivo bruto.
+    """
+    try:
+        with open(os.path.join(processed_data_dir, MANIFEST_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_manifest(processed_data_dir: str, manifest: dict):
+    """Grava o manifesto de forma atômica (arquivo temporário + rename)."""
+    os.makedirs(processed_data_dir, exist_ok=True)
+    path = os.path.join(processed_data_dir, MANIFEST_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+_version_memo = {}
+
+def get_data_version(processed_data_dir: str) -> str:
+    """
+    Retorna a versão dos dados processados: um hash do conteúdo registrado no manifesto.
+
+    A versão só muda quando algum arquivo é (re)processado, e serve de chave
+    para caches em memória. O hash é recalculado apenas quando o arquivo do
+    manifesto muda no disco.
+
+    Args:
+        processed_data_dir (str): O caminho para o diretório de dados processados.
+
+    Returns:
+        str: A versão (vazia se ainda não houver manifesto).
+    """
+    path = os.path.join(processed_data_dir, MANIFEST_FILE)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return ''
+    signature = (stat.st_mtime_ns, stat.st_size)
+    memo = _version_memo.get(path)
+    if memo and memo[0] == signature:
+        return memo[1]
+
+    manifest = load_manifest(processed_data_dir)
+    content = sorted((name, entry.get('sha256'), *(entry.get(key) for key in OUTPUT_KEYS))
+                     for name, entry in manifest.items())
+    version = hashlib.sha256(json.dumps(content).encode('utf-8')).hexdigest()[:16]
+    _version_memo[path] = (signature, version)
+    return version
+
+def processed_path_for(raw_file_path: str, processed_data_dir: str) -> str:
+    """
+    Retorna o caminho do arquivo processado correspondente a um arquivo bruto.
+
+    Arquivos diários (ex: focos_diario_br_20250604.csv) vão para a partição do
+    seu dia: <processed_data_dir>/data=2025-06-04/focos_diario_br_20250604.parquet.
+    Os demais são divididos por dia na ingestão (ver `process_data_streaming`),
+    e o caminho devolvido é só o nome base.
+    """
+    stem = os.path.splitext(os.path.basename(raw_file_path))[0]
+    file_date = _file_date(raw_file_path)
+    if file_date is None:
+        return os.path.join(processed_data_dir, stem + '.parquet')
+    return os.path.join(processed_data_dir, f"data={file_date:%Y-%m-%d}", stem + '.parquet')
+
+def rollup_path_for(processed_file_path: str, processed_data_dir: str) -> str:
+    """Retorna o caminho do rollup diário correspondente a um arquivo processado."""
+    return os.path.join(processed_data_dir, ROLLUP_DIR,
+                        os.path.relpath(processed_file_path, processed_data_dir))
+
+def _entry_outputs(entry: dict, key: str) -> list:
+    """Saídas de uma entrada do manifesto (uma só, ou uma por dia no modo em fluxo)."""
+    value = entry.get(key)
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+def _entry_days(entry: dict) -> set:
+    """Dias (partições data=...) das saídas de uma entrada do manifesto."""
+    days = set()
+    for output in _entry_outputs(entry or {}, 'saida'):
+        part = output.replace(os.sep, '/').split('/')[0]
+        if part.startswith('data='):
+            days.add(part.split('=', 1)[1])
+    return days
+
+def _needs_processing(raw_file_path: str, entry: dict, processed_data_dir: str) -> bool:
+    """Decide se um arquivo bruto é novo ou foi alterado desde o último processamento."""
+    if not entry or not all(key in entry and all(os.path.exists(os.path.join(processed_data_dir, output))
+                                                 for output in _entry_outputs(entry, key))
+                            for key in OUTPUT_KEYS):
+        return True
+    # Arquivo não diário gravado inteiro fora das partições de dia (versões
+    # anteriores): é refeito, dividido por dia, e a saída antiga é removida
+    if _file_date(raw_file_path) is None and not isinstance(entry['saida'], list):
+        return True
+    stat = os.stat(raw_file_path)
+    if stat.st_size == entry['tamanho'] and stat.st_mtime == entry['mtime']:
+        return False
+    # Tamanho ou data mudaram: só reprocessa se o conteúdo de fato mudou
+    if stat.st_size == entry['tamanho'] and file_sha256(raw_file_path) == entry['sha256']:
+        entry['mtime'] = stat.st_mtime
+        return False
+    return True
+
+def _process_entry(raw_file_path: str, processed_file_path: str, rollup_file_path: str, raster_file_path: str,
+                   processed_data_dir: str, partition_by_estado: bool = False, streaming: bool = None,
+                   raster_resolution: float = RASTER_RESOLUTION, dedup_exclude=()):
+    """Processa um arquivo em um processo separado e devolve sua entrada no manifesto."""
+    stat = os.stat(raw_file_path)
+    sha256 = file_sha256(raw_file_path)
+    entry = {
+        'tamanho': stat.st_size,
+        'mtime': stat.st_mtime,
+        'sha256': sha256,
+    }
+    dedup = DedupIndex(processed_data_dir, os.path.splitext(os.path.basename(raw_file_path))[0],
+                       exclude=dedup_exclude)
+    if streaming is None:
+        streaming = stat.st_size > STREAM_THRESHOLD
+    # Arquivos não diários (mensais, anuais) são sempre divididos pelas partições
+    # de dia; o tamanho só decide se são lidos em lotes ou de uma vez
+    if streaming or _file_date(raw_file_path) is None:
+        result = process_data_streaming(raw_file_path, processed_data_dir,
+                                        batch_rows=STREAM_BATCH_ROWS if streaming else None,
+                                        raster_resolution=raster_resolution, dedup=dedup)
+        if result is None:
+            return None
+        entry['linhas'] = result['linhas']
+        entry['saidas'] = result['saidas']
+        entry['rollups'] = result['rollups']
+        entry['rasters'] = result['rasters']
+    else:
+        rows = process_data(raw_file_path, processed_file_path, verbose=False,
+                            partition_by_estado=partition_by_estado, rollup_file_path=rollup_file_path,
+                            raster_file_path=raster_file_path, raster_resolution=raster_resolution, dedup=dedup)
+        if rows is None:
+            return None
+        entry['linhas'] = rows
+    entry['duplicados'] = dedup.duplicados
+    entry['dedup'] = [os.path.relpath(p, processed_data_dir) for p in dedup.save()]
+    return entry
+
+def _remove_stale_outputs(processed_data_dir: str, old_entry: dict, new_entry: dict):
+    """Remove arquivos de uma versão anterior que não fazem parte da nova (ex: dias que sumiram)."""
+    if not old_entry:
+        return
+    for key in OUTPUT_KEYS:
+        stale = set(_entry_outputs(old_entry, key)) - set(_entry_outputs(new_entry, key))
+        for output in stale:
+            path = os.path.join(processed_data_dir, output)
+            if os.path.isfile(path):
+                os.remove(path)
+
+def process_new_files(raw_data_dir: str, processed_data_dir: str, max_workers: int = None,
+                      partition_by_estado: bool = False, streaming: bool = None,
+                      raster_resolution: float = RASTER_RESOLUTION) -> list:
+    """
+    Processa apenas os arquivos brutos novos ou alterados, em paralelo.
+
+    A decisão é feita pelo manifesto do diretório de dados processados, e não
+    pela simples existência do Parquet: um CSV baixado novamente (por exemplo,
+    o do dia corrente) é reprocessado se o seu conteúdo mudou. Uma segunda
+    execução sem arquivos novos não processa nada.
+
+    Args:
+        raw_data_dir (str): Diretório com os arquivos CSV brutos.
+        processed_data_dir (str): Diretório de saída dos arquivos Parquet.
+        max_workers (int, opcional): Número de processos (padrão: núcleos da máquina).
+        partition_by_estado (bool): Se True, particiona também por estado.
+        streaming (bool, opcional): Se True, processa todos os arquivos em fluxo
+            (ver `process_data_streaming`), em lotes; se False, nenhum é lido em
+            lotes. Por padrão, só os maiores que `STREAM_THRESHOLD`. Arquivos não
+            diários passam sempre por `process_data_streaming`, para serem
+            divididos por dia (sem subpartições por estado).
+        raster_resolution (float): Resolução dos rasters de densidade, em graus.
+            Ao final, os rótulos de estado das células são atualizados com as
+            contagens dos dias gravados (ver `src.raster.update_estado_masks`).
+
+    Returns:
+        list: Nomes dos arquivos brutos processados nesta execução.
+    """
+    manifest = load_manifest(processed_data_dir)
+    raw_files = sorted(glob.glob(os.path.join(raw_data_dir, '*.csv')))
+    pending = [f for f in raw_files
+               if _needs_processing(f, manifest.get(os.path.basename(f)), processed_data_dir)]
+
+    if not pending:
+        save_manifest(processed_data_dir, manifest)
+        print("Nenhum arquivo novo ou alterado para processar.")
+        return []
+
+    print(f"Processando {len(pending)} de {len(raw_files)} arquivos...")
+    outputs = [processed_path_for(f, processed_data_dir) for f in pending]
+    rollups = [rollup_path_for(f, processed_data_dir) for f in outputs]
+    rasters = [raster_path_for(f, processed_data_dir, raster_resolution) for f in outputs]
+    worker = functools.partial(_process_entry, processed_data_dir=processed_data_dir,
+                               partition_by_estado=partition_by_estado, streaming=streaming,
+                               raster_resolution=raster_resolution)
+    # Arquivos diários só têm focos do seu dia e podem ser processados em
+    # paralelo; os demais (mensais, anuais) cobrem vários dias e são processados
+    # depois, um de cada vez, para que a deduplicação de cada um veja o índice
+    # gravado pelos anteriores.
+    jobs = list(zip(pending, outputs, rollups, rasters))
+    daily = sorted((job for job in jobs if _file_date(job[0]) is not None),
+                   key=lambda job: (_file_date(job[0]), job[0]))
+    stems = {f: os.path.splitext(os.path.basename(f))[0] for f in pending}
+    # Em paralelo, cada arquivo diário é deduplicado só contra os índices dos
+    # arquivos que não estão nesta execução, e o resultado não depende de qual
+    # processo termina primeiro
+    parallel_worker = functools.partial(worker, dedup_exclude=tuple(stems.values()))
+    entries = {}
+    if len(daily) == 1:
+        entries[daily[0][0]] = parallel_worker(*daily[0])
+    elif daily:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            entries.update(zip([job[0] for job in daily], executor.map(parallel_worker, *zip(*daily))))
+    # Depois, em ordem de data: um arquivo cujos focos se repetem nos de um
+    # arquivo anterior desta execução (ex: na virada do dia) é refeito contra o
+    # índice final desse arquivo
+    done = []
+    for job in daily:
+        entry = entries[job[0]]
+        if entry is not None and done and conflicts(
+                processed_data_dir, [os.path.join(processed_data_dir, p) for p in entry['dedup']], done):
+            entries[job[0]] = worker(*job, dedup_exclude=tuple(s for s in stems.values() if s not in done))
+        if entries[job[0]] is not None:
+            done.append(stems[job[0]])
+    for job in jobs:
+        if job[0] not in entries:
+            entries[job[0]] = worker(*job)
+    entries = [entries[f] for f in pending]
+
+    processed = []
+    changed_days = set()
+    for raw_file_path, output, rollup, raster, entry in zip(pending, outputs, rollups, rasters, entries):
+        if entry is not None:
+            if 'saidas' in entry:
+                # Processado em fluxo: uma saída (e um rollup e um raster) por dia
+                entry['saida'] = [os.path.relpath(p, processed_data_dir) for p in entry.pop('saidas')]
+                entry['rollup'] = [os.path.relpath(p, processed_data_dir) for p in entry.pop('rollups')]
+                entry['raster'] = [os.path.relpath(p, processed_data_dir) for p in entry.pop('rasters')]
+            else:
+                entry['rollup'] = os.path.relpath(rollup, processed_data_dir)
+                entry['raster'] = os.path.relpath(raster, processed_data_dir)
+                # Com partição por estado, a saída registrada é a partição do dia
+                if partition_by_estado:
+                    output = os.path.dirname(output)
+                entry['saida'] = os.path.relpath(output, processed_data_dir)
+            old_entry = manifest.get(os.path.basename(raw_file_path))
+            changed_days |= _entry_days(old_entry) | _entry_days(entry)
+            _remove_stale_outputs(processed_data_dir, old_entry, entry)
+            manifest[os.path.basename(raw_file_path)] = entry
+            processed.append(os.path.basename(raw_file_path))
+            metrics.count('linhas_processadas', entry['linhas'])
+            metrics.count('focos_duplicados', entry['duplicados'])
+    metrics.count('arquivos_processados', len(processed))
+    save_manifest(processed_data_dir, manifest)
+    if processed:
+        update_estado_masks(processed_data_dir, changed_days, raster_resolution)
+    return processed
 
 if __name__ == '__main__':
     # Esta parte é para execução de teste do módulo individualmente
@@ -55,9 +706,7 @@ if __name__ == '__main__':
     else:
         latest_raw_file = max(list_of_files, key=os.path.getctime)
         
-        # Define o nome do arquivo processado com base no original
-        file_name = os.path.basename(latest_raw_file)
-        processed_file_name = os.path.splitext(file_name)[0] + '.parquet'
-        processed_file_path = os.path.join(PROCESSED_DATA_DIR, processed_file_name)
+        # Define o caminho do arquivo processado (partição do dia) com base no original
+        processed_file_path = processed_path_for(latest_raw_file, PROCESSED_DATA_DIR)
         
         process_data(latest_raw_file, processed_file_path) 
\ No newline at end of file
@@ -0,0 +1,233 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import os
+import glob
+from datetime import date, timedelta
+
+# Índice de deduplicação, mantido na ingestão, em
+# <processed_data_dir>/_dedup/data=AAAA-MM-DD/<arquivo>.npz. Para cada arquivo
+# bruto e cada dia dos seus focos, guarda dois vetores ordenados de hashes:
+#
+# - `ids`: o `id` de cada foco gravado. Um foco cujo `id` já está no índice de
+#   outro arquivo (no mesmo dia ou num dia vizinho, por causa da virada do dia
+#   em UTC) é descartado, assim como repetições dentro do próprio arquivo.
+# - `eventos`: as chaves de evento "possuídas" pelo arquivo. A chave junta a
+#   célula (de DEDUP_CELL_KM) e a janela de tempo (de DEDUP_WINDOW_MINUTES) da
+#   detecção: o mesmo fogo visto por vários satélites, ou várias vezes pelo
+#   mesmo satélite, na mesma célula e janela, é um único evento. A detecção
+#   mais antiga de cada chave recebe `evento=True`, a menos que outro arquivo
+#   do dia já possua a chave.
+#
+# Cada consulta lê só os índices dos arquivos do dia e dos dias vizinhos, então
+# o custo não cresce com o histórico. As janelas não atravessam a meia-noite
+# (a duração deve dividir o dia), e por isso as chaves de evento só precisam ser
+# comparadas dentro do mesmo dia.
+DEDUP_DIR = '_dedup'
+DEDUP_CELL_KM = 1.0
+DEDUP_WINDOW_MINUTES = 60
+_KM_PER_DEGREE = 6371.0 * np.pi / 180
+
+def dedup_path_for(processed_data_dir: str, day: str, stem: str) -> str:
+    """Retorna o caminho do índice de um arquivo bruto (`stem`) num dia (AAAA-MM-DD)."""
+    return os.path.join(processed_data_dir, DEDUP_DIR, f"data={day}", stem + '.npz')
+
+def id_hashes(table: pa.Table) -> np.ndarray:
+    """Hash (uint64) do `id` de cada foco."""
+    ids = table.column('id').to_numpy(zero_copy_only=False)
+    return pd.util.hash_array(np.asarray(ids, dtype=object))
+
+def _minutes(table: pa.Table) -> np.ndarray:
+    """Minutos desde 1970 de cada detecção (nulos viram -1)."""
+    seconds = pc.cast(pc.cast(table.column('data_hora_gmt'), pa.timestamp('s')), pa.int64())
+    return pc.fill_null(pc.divide(seconds, 60), -1).to_numpy(zero_copy_only=False)
+
+def event_keys(table: pa.Table, cell_km: float = DEDUP_CELL_KM,
+               window_minutes: int = DEDUP_WINDOW_MINUTES) -> np.ndarray:
+    """
+    Chave (uint64) do evento de cada foco: célula de `cell_km` e janela de `window_minutes`.
+
+    A célula é medida em graus (`cell_km` no sentido norte-sul); no Brasil, a
+    largura leste-oeste varia de ~0,8 a 1 vez a altura.
+    """
+    cell_deg = cell_km / _KM_PER_DEGREE
+    parts = pd.DataFrame({
+        'lat': np.floor(table.column('lat').to_numpy(zero_copy_only=False) / cell_deg).astype('int64'),
+        'lon': np.floor(table.column('lon').to_numpy(zero_copy_only=False) / cell_deg).astype('int64'),
+        'janela': _minutes(table) // window_minutes,
+    })
+    return pd.util.hash_pandas_object(parts, index=False).to_numpy()
+
+def _contains(sorted_values: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Quais `values` estão no vetor ordenado `sorted_values` (busca binária)."""
+    if not len(sorted_values):
+        return np.zeros(len(values), dtype=bool)
+    pos = np.minimum(np.searchsorted(sorted_values, values), len(sorted_values) - 1)
+    return sorted_values[pos] == values
+
+def _first_rows(values: np.ndarray) -> np.ndarray:
+    """Posição da primeira ocorrência de cada valor distinto (por ordenação, mais rápido que `np.unique`)."""
+    order = np.argsort(values, kind='stable')
+    ordered = values[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = ordered[1:] != ordered[:-1]
+    return order[first]
+
+def _merge(sorted_values: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Junta `values` (sem repetições e ausentes de `sorted_values`) ao vetor ordenado."""
+    merged = np.concatenate([sorted_values, values])
+    merged.sort(kind='stable')
+    return merged
+
+class DedupIndex:
+    """
+    Deduplicação incremental dos focos de um arquivo bruto contra o índice persistido.
+
+    `apply` pode ser chamado várias vezes (um lote de cada vez, na ingestão em
+    fluxo): os focos de um lote são comparados também com os dos lotes
+    anteriores. `save` grava o índice do arquivo, substituindo a versão
+    anterior; os índices que o próprio arquivo gravou antes são ignorados na
+    comparação, para que reprocessá-lo não descarte os seus próprios focos.
+
+    Args:
+        processed_data_dir (str): O caminho para o diretório de dados processados.
+        stem (str): Nome do arquivo bruto, sem extensão.
+        cell_km (float): Tamanho da célula da chave de evento, em km.
+        window_minutes (int): Duração da janela da chave de evento, em minutos.
+        exclude (iterable, opcional): Arquivos (sem extensão) cujos índices
+            também são ignorados, como os que estão sendo processados ao mesmo
+            tempo (ver `process_new_files`).
+    """
+
+    def __init__(self, processed_data_dir: str, stem: str, cell_km: float = DEDUP_CELL_KM,
+                 window_minutes: int = DEDUP_WINDOW_MINUTES, exclude=()):
+        if window_minutes <= 0 or (24 * 60) % window_minutes:
+            raise ValueError(f"A janela de deduplicação deve dividir o dia: {window_minutes} min")
+        self.processed_data_dir = processed_data_dir
+        self.stem = stem
+        self.cell_km = cell_km
+        self.window_minutes = window_minutes
+        self.duplicados = 0
+        self._exclude = set(exclude) | {stem}
+        self._days = {}
+
+    def _others(self, day: str) -> list:
+        """Índices gravados por outros arquivos num dia."""
+        indexes = []
+        pattern = os.path.join(self.processed_data_dir, DEDUP_DIR, f"data={day}", '*.npz')
+        for path in sorted(glob.glob(pattern)):
+            if os.path.splitext(os.path.basename(path))[0] in self._exclude:
+                continue
+            with np.load(path) as data:
+                indexes.append((data['ids'], data['eventos']))
+        return indexes
+
+    def _state(self, day: str) -> dict:
+        state = self._days.get(day)
+        if state is None:
+            current = date.fromisoformat(day)
+            neighbors = [self._others(f"{current + timedelta(days=d):%Y-%m-%d}") for d in (-1, 1)]
+            same_day = self._others(day)
+            state = self._days[day] = {
+                'ids_outros': [ids for ids, _ in same_day + neighbors[0] + neighbors[1]],
+                'eventos_outros': [events for _, events in same_day],
+                'ids': np.array([], dtype='uint64'),
+                'eventos': np.array([], dtype='uint64'),
+            }
+        return state
+
+    def apply(self, table: pa.Table) -> pa.Table:
+        """
+        Remove os focos repetidos e acrescenta a coluna `evento`.
+
+        Args:
+            table (pa.Table): Focos já limpos (ver `clean_focos_table`).
+
+        Returns:
+            pa.Table: Os focos sem `id` repetido, com `evento` (bool) marcando a
+                      primeira detecção de cada evento.
+        """
+        n = table.num_rows
+        ids = id_hashes(table)
+        keys = event_keys(table, self.cell_km, self.window_minutes)
+        minutes = _minutes(table)
+        day_numbers = np.where(minutes >= 0, minutes // (24 * 60), -1)
+
+        keep = np.zeros(n, dtype=bool)
+        keep[_first_rows(ids)] = True
+        evento = np.zeros(n, dtype=bool)
+        # Sem data não há dia nem janela: o foco conta como um evento
+        evento[day_numbers < 0] = True
+
+        day_values, day_codes = np.unique(day_numbers, return_inverse=True)
+        for code, day_number in enumerate(day_values):
+            if day_number < 0:
+                continue
+            day = f"{date(1970, 1, 1) + timedelta(days=int(day_number)):%Y-%m-%d}"
+            state = self._state(day)
+            rows = np.flatnonzero((day_codes == code) & keep)
+            seen = np.zeros(len(rows), dtype=bool)
+            for known in state['ids_outros'] + [state['ids']]:
+                seen |= _contains(known, ids[rows])
+            keep[rows[seen]] = False
+            rows = rows[~seen]
+
+            # Primeira detecção (a mais antiga) de cada chave, se a chave ainda não tem dono
+            rows = rows[np.argsort(minutes[rows], kind='stable')]
+            first = rows[_first_rows(keys[rows])]
+            owned = np.zeros(len(first), dtype=bool)
+            for known in state['eventos_outros'] + [state['eventos']]:
+                owned |= _contains(known, keys[first])
+            first = first[~owned]
+            evento[first] = True
+            state['ids'] = _merge(state['ids'], ids[rows])
+            state['eventos'] = _merge(state['eventos'], keys[first])
+
+        self.duplicados += int(n - keep.sum())
+        return table.filter(pa.array(keep)).append_column('evento', pa.array(evento[keep]))
+
+    def save(self) -> list:
+        """Grava o índice de cada dia visto e devolve os caminhos gravados."""
+        paths = []
+        for day, state in sorted(self._days.items()):
+            path = dedup_path_for(self.processed_data_dir, day, self.stem)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = os.path.join(os.path.dirname(path), '.' + os.path.basename(path) + '.tmp')
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, ids=state['ids'], eventos=state['eventos'])
+            os.replace(tmp_path, path)
+            paths.append(path)
+        return paths
+
+def conflicts(processed_data_dir: str, paths: list, stems: list) -> bool:
+    """
+    Indica se os índices gravados em `paths` (de um arquivo) se sobrepõem aos de outros arquivos.
+
+    Há sobreposição quando um `id` do arquivo está no índice de um dos
+    arquivos `stems` no mesmo dia ou num dia vizinho, ou quando uma chave de
+    evento do arquivo também pertence a um deles no mesmo dia: nesses casos o
+    resultado da deduplicação depende de qual arquivo foi processado antes.
+
+    Args:
+        processed_data_dir (str): O caminho para o diretório de dados processados.
+        paths (list): Índices do arquivo (ver `DedupIndex.save`).
+        stems (list): Os outros arquivos, sem extensão.
+    """
+    for path in paths:
+        day = os.path.basename(os.path.dirname(path)).split('=', 1)[1]
+        current = date.fromisoformat(day)
+        with np.load(path) as data:
+            ids, events = data['ids'], data['eventos']
+        for offset in (0, -1, 1):
+            other_day = f"{current + timedelta(days=offset):%Y-%m-%d}"
+            for stem in stems:
+                try:
+                    with np.load(dedup_path_for(processed_data_dir, other_day, stem)) as data:
+                        if _contains(data['ids'], ids).any():
+                            return True
+                        if offset == 0 and _contains(data['eventos'], events).any():
+                            return True
+                except FileNotFoundError:
+                    continue
+    return False
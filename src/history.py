@@ -0,0 +1,276 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import os
+import argparse
+from datetime import date, datetime
+from src.data_processing import ROLLUP_DIR
+from src.data_analysis import (
+    _iso_date, _write_chart, calculate_risk_df, render_top_chart, render_biome_chart,
+    render_daily_chart, render_season_chart,
+)
+from src.metrics import timed
+
+# Análise de intervalos arbitrários (de um dia a vários anos) sem carregar o
+# intervalo inteiro: o dataset é percorrido lote a lote (grupos de linhas do
+# Parquet) e cada lote vira dois agregados parciais pequenos, um por dia e um
+# por localidade (estado x município x bioma), que são somados aos anteriores.
+# A memória depende do número de dias e de localidades, e não do número de focos.
+LOCATION_KEYS = ['estado', 'municipio', 'bioma']
+SUM_COLUMNS = ['total_focos', 'soma_dias_sem_chuva', 'n_dias_sem_chuva', 'soma_frp', 'n_frp']
+SCAN_BATCH_ROWS = 131_072
+# Número de agregados parciais acumulados antes de serem recombinados
+_MERGE_EVERY = 32
+
+# Temporada de fogo (mês, dia) usada por padrão na comparação entre anos
+FIRE_SEASON = ((7, 1), (11, 30))
+
+def _focos_partials(table: pa.Table):
+    """Agregados parciais de um lote de focos individuais."""
+    base = pa.table({
+        'data': table.column('data'),
+        'estado': table.column('estado'),
+        'municipio': table.column('municipio'),
+        'bioma': table.column('bioma'),
+        'dias': table.column('numero_dias_sem_chuva').cast(pa.int64()),
+        'frp': table.column('frp').cast(pa.float64()),
+    })
+    count_all = pc.CountOptions(mode='all')
+    by_location = base.group_by(LOCATION_KEYS).aggregate([
+        ('data', 'count', count_all), ('dias', 'sum'), ('dias', 'count'), ('frp', 'sum'), ('frp', 'count'),
+    ])
+    by_location = pa.table({
+        **{key: by_location.column(key) for key in LOCATION_KEYS},
+        'total_focos': by_location.column('data_count'),
+        'soma_dias_sem_chuva': pc.fill_null(by_location.column('dias_sum'), 0),
+        'n_dias_sem_chuva': by_location.column('dias_count'),
+        'soma_frp': pc.fill_null(by_location.column('frp_sum'), 0.0),
+        'n_frp': by_location.column('frp_count'),
+    })
+    by_day = base.group_by(['data']).aggregate([('data', 'count', count_all)])
+    by_day = pa.table({'data': by_day.column('data'), 'total_focos': by_day.column('data_count')})
+    return by_day, by_location
+
+def _rollup_partials(table: pa.Table):
+    """Agregados parciais de um lote do rollup diário."""
+    by_location = _sum_by(table.select(LOCATION_KEYS + SUM_COLUMNS), LOCATION_KEYS)
+    by_day = _sum_by(table.select(['data', 'total_focos']), ['data'])
+    return by_day, by_location
+
+def _sum_by(table: pa.Table, keys: list) -> pa.Table:
+    """Soma as colunas numéricas de `table` para cada combinação de `keys`."""
+    values = [name for name in table.column_names if name not in keys]
+    grouped = table.group_by(keys).aggregate([(name, 'sum') for name in values])
+    return pa.table({**{key: grouped.column(key) for key in keys},
+                     **{name: grouped.column(name + '_sum') for name in values}})
+
+def _combine(partials: list, keys: list) -> list:
+    """Recombina os agregados parciais acumulados em um só."""
+    partials = [p for p in partials if p.num_rows]
+    if len(partials) <= 1:
+        return partials
+    return [_sum_by(pa.concat_tables(partials), keys)]
+
+@timed()
+def scan_range(processed_data_dir: str, start_date, end_date, estados: list = None,
+               source: str = 'rollup', batch_rows: int = SCAN_BATCH_ROWS):
+    """
+    Percorre um intervalo de dias do dataset e devolve os agregados por dia e por localidade.
+
+    Args:
+        processed_data_dir (str): O caminho para o diretório de dados processados.
+        start_date (date | str): Primeiro dia (inclusive).
+        end_date (date | str): Último dia (inclusive).
+        estados (list, opcional): Estados a incluir.
+        source (str): 'rollup' (padrão, lê o rollup diário) ou 'focos' (lê os
+            focos individuais; útil se o rollup não existir).
+        batch_rows (int): Número máximo de linhas lidas por lote.
+
+    Returns:
+        tuple: (pd.Series com o total de focos por dia, sem dias faltantes;
+                pd.DataFrame no formato de rollup, por estado x município x bioma).
+    """
+    if source == 'rollup':
+        path = os.path.join(processed_data_dir, ROLLUP_DIR)
+        columns = ['data'] + LOCATION_KEYS + SUM_COLUMNS
+        partials_of = _rollup_partials
+    elif source == 'focos':
+        path = processed_data_dir
+        columns = ['data'] + LOCATION_KEYS + ['numero_dias_sem_chuva', 'frp']
+        partials_of = _focos_partials
+    else:
+        raise ValueError(f"Fonte desconhecida: {source}")
+
+    start_iso, end_iso = _iso_date(start_date), _iso_date(end_date)
+    days, locations = [], []
+    try:
+        dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    except FileNotFoundError:
+        dataset = None
+    if dataset is not None and 'data' in dataset.schema.names:
+        expr = (ds.field('data') >= start_iso) & (ds.field('data') <= end_iso)
+        if estados is not None:
+            expr = expr & ds.field('estado').isin(list(estados))
+        for batch in dataset.to_batches(columns=columns, filter=expr, batch_size=batch_rows):
+            if batch.num_rows == 0:
+                continue
+            by_day, by_location = partials_of(pa.Table.from_batches([batch]))
+            days.append(by_day)
+            locations.append(by_location)
+            if len(locations) >= _MERGE_EVERY:
+                days = _combine(days, ['data'])
+                locations = _combine(locations, LOCATION_KEYS)
+    days = _combine(days, ['data'])
+    locations = _combine(locations, LOCATION_KEYS)
+
+    index = pd.date_range(start_iso, end_iso, freq='D').date
+    focos_por_dia = pd.Series(0, index=index, name='total_focos', dtype='int64')
+    if days:
+        counts = days[0].to_pandas()
+        counts['data'] = pd.to_datetime(counts['data']).dt.date
+        focos_por_dia.update(counts.set_index('data')['total_focos'])
+        focos_por_dia = focos_por_dia.astype('int64')
+
+    if locations:
+        agregado = locations[0].to_pandas()
+    else:
+        agregado = pd.DataFrame(columns=LOCATION_KEYS + SUM_COLUMNS)
+    return focos_por_dia, agregado
+
+def analyze_range(processed_data_dir: str, start_date, end_date, estados: list = None,
+                  level: str = 'municipio', top_n: int = 10, source: str = 'rollup') -> dict:
+    """
+    Analisa um intervalo de dias qualquer: série diária, localidades, biomas e risco.
+
+    Args:
+        processed_data_dir (str): O caminho para o diretório de dados processados.
+        start_date (date | str): Primeiro dia (inclusive).
+        end_date (date | str): Último dia (inclusive).
+        estados (list, opcional): Estados a incluir.
+        level (str): 'estado' ou 'municipio', para as localidades e o risco.
+        top_n (int): Número de localidades no ranking.
+        source (str): Fonte dos dados (ver `scan_range`).
+
+    Returns:
+        dict: `focos_por_dia` (Series), `top_localidades` (Series),
+              `biomas` (Series), `risco` (DataFrame, ver `calculate_risk_df`)
+              e `agregado` (DataFrame no formato de rollup).
+    """
+    focos_por_dia, agregado = scan_range(processed_data_dir, start_date, end_date, estados, source)
+    if agregado.empty:
+        top, biomas, risco = pd.Series(dtype='int64'), pd.Series(dtype='int64'), pd.DataFrame()
+    else:
+        top = agregado.groupby(level)['total_focos'].sum().nlargest(top_n)
+        biomas = agregado.groupby('bioma')['total_focos'].sum().sort_values(ascending=False)
+        risco = calculate_risk_df(agregado, level=level)
+    return {
+        'focos_por_dia': focos_por_dia,
+        'top_localidades': top,
+        'biomas': biomas,
+        'risco': risco,
+        'agregado': agregado,
+    }
+
+def _season_bounds(year: int, season: tuple) -> tuple:
+    """Primeiro e último dia da temporada que começa em `year` (pode virar o ano)."""
+    (start_month, start_day), (end_month, end_day) = season
+    start = date(year, start_month, start_day)
+    end = date(year if (end_month, end_day) >= (start_month, start_day) else year + 1, end_month, end_day)
+    return start, end
+
+def compare_seasons(processed_data_dir: str, year: int = None, previous: int = 5,
+                    season: tuple = FIRE_SEASON, estados: list = None) -> dict:
+    """
+    Compara a temporada de fogo de `year` com as `previous` temporadas anteriores.
+
+    Cada temporada é percorrida separadamente (ver `scan_range`), então o custo
+    de memória é o de uma temporada por vez.
+
+    Args:
+        processed_data_dir (str): O caminho para o diretório de dados processados.
+        year (int, opcional): Ano da temporada atual (padrão: ano corrente).
+        previous (int): Número de temporadas anteriores a comparar.
+        season (tuple): ((mês, dia), (mês, dia)) de início e fim da temporada.
+        estados (list, opcional): Estados a incluir.
+
+    Returns:
+        dict: `resumo` (DataFrame por ano com total, média diária, pico e dia
+              do pico) e `acumulado` (DataFrame com o total acumulado por dia
+              da temporada, uma coluna por ano).
+    """
+    year = year or datetime.now().year
+    today = datetime.now().date()
+    resumo, acumulado = [], {}
+    for season_year in range(year - previous, year + 1):
+        start, end = _season_bounds(season_year, season)
+        # A temporada em andamento é comparada só até hoje
+        end = min(end, today)
+        if end < start:
+            continue
+        focos_por_dia, _ = scan_range(processed_data_dir, start, end, estados)
+        resumo.append({
+            'ano': season_year,
+            'total_focos': int(focos_por_dia.sum()),
+            'media_diaria': float(focos_por_dia.mean()),
+            'pico_diario': int(focos_por_dia.max()),
+            'dia_pico': focos_por_dia.idxmax() if focos_por_dia.any() else None,
+        })
+        acumulado[season_year] = focos_por_dia.cumsum().reset_index(drop=True)
+    resumo = pd.DataFrame(resumo)
+    if not resumo.empty:
+        resumo = resumo.set_index('ano')
+    acumulado = pd.DataFrame(acumulado)
+    acumulado.index.name = 'dia_da_temporada'
+    return {'resumo': resumo, 'acumulado': acumulado}
+
+def generate_range_report(processed_data_dir: str, reports_dir: str, start_date, end_date,
+                          estados: list = None, level: str = 'estado') -> dict:
+    """
+    Gera em <reports_dir>/historico/<inicio>_<fim>/ os gráficos e tabelas de um intervalo.
+
+    Returns:
+        dict: O resultado de `analyze_range`.
+    """
+    result = analyze_range(processed_data_dir, start_date, end_date, estados, level=level)
+    output_dir = os.path.join(reports_dir, 'historico', f"{_iso_date(start_date)}_{_iso_date(end_date)}")
+    os.makedirs(output_dir, exist_ok=True)
+    _write_chart(render_daily_chart(result['focos_por_dia']), os.path.join(output_dir, 'focos_por_dia.png'))
+    _write_chart(render_top_chart(result['agregado'], level=level),
+                 os.path.join(output_dir, 'focos_por_localidade.png'))
+    _write_chart(render_biome_chart(result['agregado']), os.path.join(output_dir, 'focos_por_bioma.png'))
+    result['focos_por_dia'].to_csv(os.path.join(output_dir, 'focos_por_dia.csv'), index_label='data')
+    result['risco'].to_csv(os.path.join(output_dir, f'tabela_risco_{level}s.csv'), index=False)
+    print(f"Relatório de {_iso_date(start_date)} a {_iso_date(end_date)} "
+          f"({int(result['focos_por_dia'].sum())} focos) salvo em: {output_dir}")
+    return result
+
+def generate_season_report(processed_data_dir: str, reports_dir: str, year: int = None,
+                           previous: int = 5, estados: list = None) -> dict:
+    """Gera em <reports_dir>/historico/ a comparação entre temporadas (ver `compare_seasons`)."""
+    result = compare_seasons(processed_data_dir, year, previous, estados=estados)
+    output_dir = os.path.join(reports_dir, 'historico')
+    os.makedirs(output_dir, exist_ok=True)
+    _write_chart(render_season_chart(result['acumulado']), os.path.join(output_dir, 'temporadas.png'))
+    result['resumo'].to_csv(os.path.join(output_dir, 'temporadas.csv'))
+    print(f"Comparação de {len(result['resumo'])} temporadas salva em: {output_dir}")
+    return result
+
+if __name__ == '__main__':
+    PROCESSED_DATA_DIR = os.path.join("data", "processed")
+    REPORTS_DIR = "reports"
+
+    parser = argparse.ArgumentParser(description="Análise histórica de focos de queimadas.")
+    parser.add_argument('--inicio', help="Primeiro dia do intervalo (AAAA-MM-DD).")
+    parser.add_argument('--fim', help="Último dia do intervalo (AAAA-MM-DD, padrão: hoje).")
+    parser.add_argument('--temporadas', type=int, metavar='N',
+                        help="Compara a temporada de fogo atual com as N anteriores.")
+    args = parser.parse_args()
+
+    if args.temporadas is not None:
+        generate_season_report(PROCESSED_DATA_DIR, REPORTS_DIR, previous=args.temporadas)
+    if args.inicio:
+        generate_range_report(PROCESSED_DATA_DIR, REPORTS_DIR, args.inicio,
+                              args.fim or datetime.now().date())
+    if args.temporadas is None and not args.inicio:
+        parser.print_help()
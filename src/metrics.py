@@ -0,0 +1,209 @@
+import os
+import io
+import sys
+import json
+import time
+import pstats
+import cProfile
+import functools
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Relatórios de execução (um JSON por execução + cópia da última) em <reports_dir>/metricas
+METRICS_DIR = 'metricas'
+LAST_RUN_FILE = 'ultima_execucao.json'
+# Etapas a perfilar (cProfile + tracemalloc), separadas por vírgula; "*" perfila todas
+PROFILE_ENV = 'PIPELINE_PROFILE'
+
+_current = None
+
+class RunMetrics:
+    """
+    Tempos, contadores e pico de memória de uma execução do pipeline.
+
+    As etapas podem ser aninhadas (o nome registrado é o caminho, ex:
+    "analise/render_top_chart") e uma mesma etapa chamada várias vezes acumula
+    o tempo e o número de chamadas. Só são medidas as etapas executadas na
+    thread que iniciou a execução (no Streamlit, outras sessões continuam
+    chamando as mesmas funções enquanto o pipeline roda).
+
+    `on_stage`, se informado, é chamado no início e no fim de cada etapa de
+    primeiro nível, como `on_stage(nome, registro)` (registro None no início),
+    para acompanhar o progresso de fora do processo (ver src/runner.py).
+    """
+
+    def __init__(self, profile_stages=None, on_stage=None):
+        if profile_stages is None:
+            profile_stages = [s.strip() for s in os.environ.get(PROFILE_ENV, '').split(',') if s.strip()]
+        self.profile_stages = set(profile_stages)
+        self.started_at = datetime.now()
+        self._t0 = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.profiles = {}
+        self._stack = []
+        self._thread = threading.get_ident()
+        self.on_stage = on_stage
+
+    def is_owner(self) -> bool:
+        return threading.get_ident() == self._thread
+
+    def _should_profile(self, name: str, path: str) -> bool:
+        return bool(self.profile_stages) and (
+            '*' in self.profile_stages or name in self.profile_stages or path in self.profile_stages)
+
+    @contextmanager
+    def stage(self, name: str):
+        path = '/'.join(self._stack + [name])
+        profile = self._should_profile(name, path) and not tracemalloc.is_tracing()
+        profiler = cProfile.Profile() if profile else None
+        notify = self.on_stage if not self._stack else None
+        if notify:
+            notify(name, None)
+        if profile:
+            tracemalloc.start()
+            profiler.enable()
+        self._stack.append(name)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield self
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            self._stack.pop()
+            record = self.stages.setdefault(path, {'chamadas': 0, 'duracao_s': 0.0, 'cpu_s': 0.0})
+            record['chamadas'] += 1
+            record['duracao_s'] += wall
+            record['cpu_s'] += cpu
+            record['pico_rss_mb'] = peak_rss_mb()
+            if profile:
+                profiler.disable()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.profiles[path] = {'profiler': profiler, 'pico_tracemalloc_mb': peak / 1024 ** 2}
+            if notify:
+                notify(name, record)
+
+    def count(self, name: str, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self) -> dict:
+        """Monta o relatório da execução como um dicionário serializável em JSON."""
+        total = time.perf_counter() - self._t0
+        derived = {}
+        processing = self.stages.get('processamento')
+        if processing and processing['duracao_s'] > 0 and 'linhas_processadas' in self.counters:
+            derived['linhas_por_segundo'] = self.counters['linhas_processadas'] / processing['duracao_s']
+        download = self.stages.get('download')
+        if download and download['duracao_s'] > 0 and 'bytes_baixados' in self.counters:
+            derived['bytes_por_segundo'] = self.counters['bytes_baixados'] / download['duracao_s']
+        return {
+            'inicio': self.started_at.isoformat(timespec='seconds'),
+            'duracao_total_s': total,
+            'pico_rss_mb': peak_rss_mb(),
+            'etapas': self.stages,
+            'contadores': {**self.counters, **derived},
+            'perfis': {path: {'pico_tracemalloc_mb': p['pico_tracemalloc_mb'], 'arquivo': p.get('arquivo')}
+                       for path, p in self.profiles.items()},
+        }
+
+    def write(self, reports_dir: str) -> str:
+        """
+        Grava o relatório da execução (e os perfis, se houver) em <reports_dir>/metricas.
+
+        Returns:
+            str: O caminho do JSON gravado.
+        """
+        metrics_dir = os.path.join(reports_dir, METRICS_DIR)
+        os.makedirs(metrics_dir, exist_ok=True)
+        stamp = self.started_at.strftime('%Y%m%d_%H%M%S')
+        for path, profile in self.profiles.items():
+            prof_path = os.path.join(metrics_dir, f"execucao_{stamp}_{path.replace('/', '.')}.prof")
+            profile['profiler'].dump_stats(prof_path)
+            profile['arquivo'] = prof_path
+
+        report = self.report()
+        run_path = os.path.join(metrics_dir, f"execucao_{stamp}.json")
+        for path in (run_path, os.path.join(metrics_dir, LAST_RUN_FILE)):
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            os.replace(path + '.tmp', path)
+        return run_path
+
+def peak_rss_mb() -> float:
+    """Pico de memória residente do processo e dos processos filhos já encerrados, em MB."""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss é dado em KB no Linux e em bytes no macOS
+    return peak / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+
+def start_run(profile_stages=None, on_stage=None) -> RunMetrics:
+    """Inicia a coleta de métricas de uma execução (substitui a anterior, se houver)."""
+    global _current
+    _current = RunMetrics(profile_stages, on_stage)
+    return _current
+
+def finish_run(reports_dir: str) -> str:
+    """Encerra a execução corrente e grava o seu relatório. Retorna o caminho do JSON."""
+    global _current
+    run, _current = _current, None
+    if run is None:
+        return None
+    return run.write(reports_dir)
+
+def current_run() -> RunMetrics:
+    """A execução corrente, ou None se nenhuma métrica estiver sendo coletada."""
+    return _current
+
+@contextmanager
+def stage(name: str):
+    """Mede uma etapa da execução corrente; sem execução ativa, não faz nada."""
+    run = _current
+    if run is None or not run.is_owner():
+        yield None
+        return
+    with run.stage(name):
+        yield run
+
+def count(name: str, value=1):
+    """Soma `value` ao contador `name` da execução corrente, se houver."""
+    run = _current
+    if run is not None and run.is_owner():
+        run.count(name, value)
+
+def timed(name: str = None):
+    """Decorador que mede cada chamada da função como uma etapa."""
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            run = _current
+            if run is None or not run.is_owner():
+                return func(*args, **kwargs)
+            with run.stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def load_last_run(reports_dir: str) -> dict:
+    """Carrega o relatório da última execução, ou None se não houver."""
+    try:
+        with open(os.path.join(reports_dir, METRICS_DIR, LAST_RUN_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def profile_summary(prof_path: str, limit: int = 20) -> str:
+    """Resumo textual (funções com maior tempo acumulado) de um arquivo .prof."""
+    out = io.StringIO()
+    pstats.Stats(prof_path, stream=out).sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
@@ -0,0 +1,360 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import os
+import glob
+from src.metrics import timed
+
+# Rasters diários de densidade: a cada ingestão, os focos de cada arquivo são
+# contados (e o seu FRP somado) numa grade regular em graus sobre a caixa
+# envolvente do Brasil. Cada raster é um .npy (camadas x linhas x colunas, float32)
+# em <processed_data_dir>/_raster/res=<graus>/data=AAAA-MM-DD/<arquivo>.npy,
+# lido com memória mapeada: a densidade de um intervalo qualquer é a soma dos
+# rasters dos seus dias, sem carregar os focos. A linha 0 é a mais ao sul.
+RASTER_DIR = '_raster'
+RASTER_RESOLUTION = 0.25
+RASTER_LAYERS = ('focos', 'frp')
+# Caixa envolvente do Brasil: lat. mínima, lat. máxima, lon. mínima, lon. máxima
+BRAZIL_BOUNDS = (-34.0, 5.5, -74.5, -34.0)
+
+# Rótulo de cada célula: o estado com mais focos nela (em todos os dados
+# processados), atualizado ao final de cada ingestão. A máscara de um estado
+# são as células com o seu rótulo; células de divisa ficam com o estado
+# predominante. Junto dos rótulos fica o total de focos de cada estado por
+# célula, e cada dia guarda a sua parte (DAY_COUNTS_FILE, na pasta do dia dos
+# rasters): uma ingestão reconta só os dias que gravou.
+MASKS_FILE = '_estados.npz'
+DAY_COUNTS_FILE = '_estados.npz'
+
+def grid_shape(resolution: float = RASTER_RESOLUTION) -> tuple:
+    """Número de linhas e colunas da grade na resolução pedida (em graus)."""
+    lat_min, lat_max, lon_min, lon_max = BRAZIL_BOUNDS
+    return (int(np.ceil(round((lat_max - lat_min) / resolution, 6))),
+            int(np.ceil(round((lon_max - lon_min) / resolution, 6))))
+
+def raster_dir(processed_data_dir: str, resolution: float = RASTER_RESOLUTION) -> str:
+    """Diretório dos rasters de uma resolução."""
+    return os.path.join(processed_data_dir, RASTER_DIR, f"res={resolution:g}")
+
+def raster_path_for(processed_file_path: str, processed_data_dir: str,
+                    resolution: float = RASTER_RESOLUTION) -> str:
+    """Retorna o caminho do raster diário correspondente a um arquivo processado."""
+    relative = os.path.relpath(processed_file_path, processed_data_dir)
+    return os.path.join(raster_dir(processed_data_dir, resolution), os.path.splitext(relative)[0] + '.npy')
+
+def cell_index(lat, lon, resolution: float = RASTER_RESOLUTION) -> np.ndarray:
+    """Posição (linear) da célula de cada ponto na grade, ou -1 fora da caixa do Brasil."""
+    lat_min, _, lon_min, _ = BRAZIL_BOUNDS
+    rows, cols = grid_shape(resolution)
+    row = np.floor((np.asarray(lat, dtype='float64') - lat_min) / resolution)
+    col = np.floor((np.asarray(lon, dtype='float64') - lon_min) / resolution)
+    inside = (row >= 0) & (row < rows) & (col >= 0) & (col < cols)
+    return np.where(inside, row * cols + col, -1).astype('int64')
+
+def build_raster(table: pa.Table, resolution: float = RASTER_RESOLUTION) -> np.ndarray:
+    """
+    Conta os focos e soma o FRP de cada célula da grade.
+
+    Args:
+        table (pa.Table): Focos com `lat`, `lon` e `frp`.
+        resolution (float): Tamanho da célula, em graus.
+
+    Returns:
+        np.ndarray: Matriz float32 (camadas `RASTER_LAYERS` x linhas x colunas).
+    """
+    rows, cols = grid_shape(resolution)
+    cells = cell_index(table.column('lat').to_numpy(zero_copy_only=False),
+                       table.column('lon').to_numpy(zero_copy_only=False), resolution)
+    frp = pc.fill_null(table.column('frp'), 0).to_numpy(zero_copy_only=False).astype('float64')
+    inside = cells >= 0
+    cells, frp = cells[inside], frp[inside]
+    raster = np.empty((len(RASTER_LAYERS), rows, cols), dtype='float32')
+    raster[0] = np.bincount(cells, minlength=rows * cols).reshape(rows, cols)
+    raster[1] = np.bincount(cells, weights=np.nan_to_num(frp), minlength=rows * cols).reshape(rows, cols)
+    return raster
+
+def write_raster(raster: np.ndarray, path: str):
+    """Grava um raster num arquivo temporário e o move para o destino."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(path), '.' + os.path.basename(path) + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        np.save(f, raster)
+    os.replace(tmp_path, path)
+
+def _raster_files(processed_data_dir: str, start_date=None, end_date=None,
+                  resolution: float = RASTER_RESOLUTION) -> list:
+    """Rasters diários dos dias do intervalo (inclusive)."""
+    files = []
+    for day_dir in sorted(glob.glob(os.path.join(raster_dir(processed_data_dir, resolution), 'data=*'))):
+        day = os.path.basename(day_dir).split('=', 1)[1]
+        if start_date is not None and day < str(start_date)[:10]:
+            continue
+        if end_date is not None and day > str(end_date)[:10]:
+            continue
+        files.extend(sorted(glob.glob(os.path.join(day_dir, '*.npy'))))
+    return files
+
+@timed()
+def load_density(processed_data_dir: str, start_date=None, end_date=None, estado: str = None,
+                 resolution: float = RASTER_RESOLUTION) -> np.ndarray:
+    """
+    Soma os rasters diários de um intervalo.
+
+    Cada raster é aberto com memória mapeada e somado diretamente no
+    acumulador, sem cópias intermediárias.
+
+    Args:
+        processed_data_dir (str): O caminho para o diretório de dados processados.
+        start_date (date | str, opcional): Primeiro dia (inclusive).
+        end_date (date | str, opcional): Último dia (inclusive).
+        estado (str, opcional): Mantém só as células do estado (ver `estado_mask`).
+        resolution (float): Resolução dos rasters, em graus.
+
+    Returns:
+        np.ndarray: Matriz float64 (camadas `RASTER_LAYERS` x linhas x colunas),
+                    zerada se não houver rasters no intervalo.
+    """
+    total = np.zeros((len(RASTER_LAYERS),) + grid_shape(resolution), dtype='float64')
+    for path in _raster_files(processed_data_dir, start_date, end_date, resolution):
+        raster = np.load(path, mmap_mode='r')
+        if raster.shape != total.shape:
+            print(f"Aviso: raster com formato inesperado ignorado: {path}")
+            continue
+        np.add(total, raster, out=total)
+    if estado is not None:
+        total *= estado_mask(processed_data_dir, estado, resolution)
+    return total
+
+def _count_cells(batches, resolution: float) -> dict:
+    """Número de focos de cada estado em cada célula (vetores densos), a partir de lotes com `lat`, `lon` e `estado`."""
+    rows, cols = grid_shape(resolution)
+    counts = {}
+    for batch in batches:
+        cells = cell_index(batch.column('lat').to_numpy(zero_copy_only=False),
+                           batch.column('lon').to_numpy(zero_copy_only=False), resolution)
+        estados = pc.dictionary_encode(batch.column('estado').cast(pa.string()))
+        codes = estados.indices.to_numpy(zero_copy_only=False)
+        inside = (cells >= 0) & ~np.asarray(estados.is_null())
+        for code, name in enumerate(estados.dictionary.to_pylist()):
+            selected = cells[inside & (codes == code)]
+            if len(selected):
+                counts[name] = counts.get(name, 0) + np.bincount(selected, minlength=rows * cols)
+    return counts
+
+def _day_counts_path(processed_data_dir: str, day: str, resolution: float) -> str:
+    return os.path.join(raster_dir(processed_data_dir, resolution), f"data={day}", DAY_COUNTS_FILE)
+
+def _count_day(processed_data_dir: str, day: str, resolution: float, batch_rows: int) -> dict:
+    """Conta os focos de cada estado por célula num dia, lendo só a partição do dia."""
+    day_dir = os.path.join(processed_data_dir, f"data={day}")
+    if not os.path.isdir(day_dir):
+        return {}
+    dataset = ds.dataset(day_dir, format='parquet', partitioning='hive')
+    return _count_cells(dataset.to_batches(columns=['lat', 'lon', 'estado'], batch_size=batch_rows), resolution)
+
+def _save_day_counts(path: str, counts: dict):
+    """Grava as contagens de um dia só com as células não vazias (ou remove o arquivo, se não houver)."""
+    if not counts:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    names = sorted(counts)
+    cells = [np.flatnonzero(counts[name]) for name in names]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, estados=np.array(names), tamanhos=np.array([len(c) for c in cells]),
+                 celulas=np.concatenate(cells), contagens=np.concatenate(
+                     [counts[name][c] for name, c in zip(names, cells)]))
+    os.replace(tmp_path, path)
+
+def _load_day_counts(path: str, resolution: float) -> dict:
+    """Lê as contagens de um dia gravadas por `_save_day_counts` (vazio se não houver)."""
+    try:
+        data = np.load(path)
+    except FileNotFoundError:
+        return {}
+    size = grid_shape(resolution)[0] * grid_shape(resolution)[1]
+    counts = {}
+    with data:
+        bounds = np.concatenate([[0], np.cumsum(data['tamanhos'])])
+        cells, values = data['celulas'], data['contagens']
+        for i, name in enumerate(data['estados'].tolist()):
+            dense = np.zeros(size, dtype='int64')
+            dense[cells[bounds[i]:bounds[i + 1]]] = values[bounds[i]:bounds[i + 1]]
+            counts[name] = dense
+    return counts
+
+def _write_masks(processed_data_dir: str, resolution: float, totals: dict) -> bool:
+    """Grava os rótulos de estado das células (e os totais por estado dos quais eles saem)."""
+    totals = {name: total for name, total in totals.items() if total.any()}
+    if not totals:
+        return False
+    rows, cols = grid_shape(resolution)
+    names = sorted(totals)
+    stacked = np.stack([totals[name] for name in names])
+    labels = np.where(stacked.max(axis=0) > 0, stacked.argmax(axis=0), -1).astype('int16')
+    path = os.path.join(raster_dir(processed_data_dir, resolution), MASKS_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, estados=np.array(names), rotulos=labels.reshape(rows, cols), contagens=stacked)
+    os.replace(tmp_path, path)
+    return True
+
+def build_estado_masks(processed_data_dir: str, resolution: float = RASTER_RESOLUTION,
+                       batch_rows: int = 1_000_000) -> bool:
+    """
+    Calcula o rótulo de estado de cada célula a partir de todos os focos processados.
+
+    Lê só `lat`, `lon` e `estado`, em lotes, dia a dia. As contagens de cada
+    dia são gravadas ao lado dos rasters do dia (para `update_estado_masks`),
+    e os rótulos em `MASKS_FILE`, no diretório dos rasters da resolução.
+
+    Returns:
+        bool: True se os rótulos foram gravados.
+    """
+    totals = {}
+    try:
+        for day_dir in sorted(glob.glob(os.path.join(processed_data_dir, 'data=*'))):
+            day = os.path.basename(day_dir).split('=', 1)[1]
+            counts = _count_day(processed_data_dir, day, resolution, batch_rows)
+            _save_day_counts(_day_counts_path(processed_data_dir, day, resolution), counts)
+            for name, count in counts.items():
+                totals[name] = totals.get(name, 0) + count
+    except Exception as e:
+        print(f"Ocorreu um erro ao calcular as máscaras de estado: {e}")
+        return False
+    return _write_masks(processed_data_dir, resolution, totals)
+
+def update_estado_masks(processed_data_dir: str, days: list, resolution: float = RASTER_RESOLUTION,
+                        batch_rows: int = 1_000_000) -> bool:
+    """
+    Atualiza os rótulos de estado das células depois de uma ingestão.
+
+    Só os dias em `days` (os que tiveram arquivos gravados ou removidos) são
+    recontados: o total de cada estado é corrigido pela diferença entre a
+    contagem nova e a gravada do dia, e o custo não cresce com o histórico.
+    Sem totais gravados (ex: rótulos de uma versão anterior), todos os dias
+    são contados (ver `build_estado_masks`).
+
+    Args:
+        processed_data_dir (str): O caminho para o diretório de dados processados.
+        days (list): Dias alterados, no formato 'AAAA-MM-DD'.
+        resolution (float): Resolução dos rasters, em graus.
+
+    Returns:
+        bool: True se os rótulos foram gravados.
+    """
+    path = os.path.join(raster_dir(processed_data_dir, resolution), MASKS_FILE)
+    try:
+        with np.load(path) as data:
+            if 'contagens' not in data.files:
+                return build_estado_masks(processed_data_dir, resolution, batch_rows)
+            totals = dict(zip(data['estados'].tolist(), data['contagens'].astype('int64')))
+    except FileNotFoundError:
+        return build_estado_masks(processed_data_dir, resolution, batch_rows)
+
+    try:
+        for day in sorted(set(days)):
+            day_path = _day_counts_path(processed_data_dir, day, resolution)
+            old = _load_day_counts(day_path, resolution)
+            new = _count_day(processed_data_dir, day, resolution, batch_rows)
+            for name in set(old) | set(new):
+                totals[name] = totals.get(name, 0) + new.get(name, 0) - old.get(name, 0)
+            _save_day_counts(day_path, new)
+    except Exception as e:
+        print(f"Ocorreu um erro ao atualizar as máscaras de estado: {e}")
+        return False
+    return _write_masks(processed_data_dir, resolution, totals)
+
+_masks_memo = {}
+
+def estado_mask(processed_data_dir: str, estado: str, resolution: float = RASTER_RESOLUTION) -> np.ndarray:
+    """
+    Máscara booleana (linhas x colunas) das células de um estado.
+
+    Os rótulos são lidos uma vez e guardados em memória até o arquivo mudar.
+    Sem rótulos calculados (ou para um estado sem focos), a máscara é vazia.
+    """
+    path = os.path.join(raster_dir(processed_data_dir, resolution), MASKS_FILE)
+    try:
+        signature = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return np.zeros(grid_shape(resolution), dtype=bool)
+    memo = _masks_memo.get(path)
+    if not memo or memo[0] != signature:
+        with np.load(path) as data:
+            memo = (signature, data['estados'].tolist(), data['rotulos'])
+        _masks_memo[path] = memo
+    _, names, labels = memo
+    if estado not in names:
+        return np.zeros(labels.shape, dtype=bool)
+    return labels == names.index(estado)
+
+def build_rasters(processed_data_dir: str, resolution: float = RASTER_RESOLUTION) -> int:
+    """
+    Gera os rasters de todos os arquivos processados numa outra resolução.
+
+    Na ingestão só a resolução padrão é gerada; esta função refaz os rasters
+    (e os rótulos de estado) a partir dos Parquets já processados.
+
+    Returns:
+        int: Número de rasters gravados.
+    """
+    written = 0
+    for day_dir in sorted(glob.glob(os.path.join(processed_data_dir, 'data=*'))):
+        files = {}
+        for path in glob.glob(os.path.join(day_dir, '*.parquet')):
+            files.setdefault(os.path.basename(path), []).append(path)
+        # Subpartições por estado (estado=.../<arquivo>-N.parquet) somam no raster do arquivo de origem
+        for path in glob.glob(os.path.join(day_dir, 'estado=*', '*.parquet')):
+            stem = os.path.splitext(os.path.basename(path))[0].rsplit('-', 1)[0]
+            files.setdefault(stem + '.parquet', []).append(path)
+        for stem, paths in sorted(files.items()):
+            table = ds.dataset(paths, format='parquet').to_table(columns=['lat', 'lon', 'frp'])
+            write_raster(build_raster(table, resolution),
+                         raster_path_for(os.path.join(day_dir, stem), processed_data_dir, resolution))
+            written += 1
+    build_estado_masks(processed_data_dir, resolution)
+    return written
+
+@timed()
+def density_image(raster: np.ndarray, layer: str = 'focos', cmap: str = 'inferno', scale: int = 3) -> np.ndarray:
+    """
+    Converte uma camada do raster em imagem (RGBA, norte para cima).
+
+    As cores seguem o logaritmo dos valores (a densidade varia em várias
+    ordens de grandeza) e células sem focos ficam transparentes. A conversão é
+    uma consulta à tabela de cores, sem passar pelo matplotlib para desenhar.
+
+    Args:
+        raster (np.ndarray): Saída de `load_density`.
+        layer (str): Camada (ver `RASTER_LAYERS`).
+        cmap (str): Mapa de cores do matplotlib.
+        scale (int): Cada célula vira um bloco de `scale` x `scale` pixels.
+
+    Returns:
+        np.ndarray: Imagem uint8 (altura x largura x 4).
+    """
+    # Importado aqui: a ingestão usa este módulo e não precisa do matplotlib
+    from matplotlib import colormaps
+
+    values = raster[RASTER_LAYERS.index(layer)][::-1]
+    logs = np.log1p(np.maximum(values, 0))
+    top = logs.max()
+    image = colormaps[cmap](logs / top if top > 0 else logs, bytes=True)
+    image[values <= 0] = 0
+    if scale > 1:
+        image = image.repeat(scale, axis=0).repeat(scale, axis=1)
+    return image
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gera os rasters de densidade dos dados processados.")
+    parser.add_argument('--resolucao', type=float, default=RASTER_RESOLUTION, help='Tamanho da célula, em graus.')
+    parser.add_argument('--dados', default=os.path.join("data", "processed"))
+    args = parser.parse_args()
+    print(f"{build_rasters(args.dados, args.resolucao)} rasters gravados em {raster_dir(args.dados, args.resolucao)}.")
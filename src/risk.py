@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Índice de risco: combinação ponderada do total de focos, da média de dias
+# sem chuva e da média de FRP de cada localidade, normalizados (min-max).
+RISK_FEATURES = ['total_focos', 'media_dias_sem_chuva', 'media_frp']
+RISK_WEIGHTS = (0.5, 0.3, 0.2)
+RISK_COLUMNS = ['Localidade', 'total_focos', 'media_dias_sem_chuva', 'media_frp', 'indice_risco']
+_ROLLUP_SUMS = ['total_focos', 'soma_dias_sem_chuva', 'n_dias_sem_chuva', 'soma_frp', 'n_frp']
+
+def location_features(df: pd.DataFrame, keys: list, dedup: bool = False) -> pd.DataFrame:
+    """
+    Calcula, em um único agrupamento, as variáveis do índice para cada localidade.
+
+    Aceita focos individuais ou um rollup (as médias são recombinadas a partir
+    das somas e contagens de cada célula). Um rollup em Arrow (ver
+    src/snapshot.py) é somado com os kernels do Arrow; só o resultado, uma
+    linha por localidade, passa para o pandas.
+
+    Args:
+        df (pd.DataFrame | pa.Table): Focos individuais ou rollup.
+        keys (list): Colunas que identificam a localidade (ex: ['estado', 'municipio']).
+        dedup (bool): Se True, `total_focos` conta eventos (a primeira detecção
+            de cada fogo, ver src/dedup.py) em vez de detecções. As médias
+            continuam usando todas as detecções.
+
+    Returns:
+        pd.DataFrame: Colunas `RISK_FEATURES`, indexado por `keys` (ordenado).
+    """
+    columns = table_columns(df)
+    count_col = 'eventos' if 'total_focos' in columns else 'evento'
+    if dedup and count_col not in columns:
+        print("Aviso: dados sem a marcação de eventos (reprocesse-os); contando as detecções.")
+        dedup = False
+    if 'total_focos' in columns:
+        sum_columns = _ROLLUP_SUMS + (['eventos'] if dedup else [])
+        if isinstance(df, pa.Table):
+            sums = df.group_by(keys).aggregate([(c, 'sum') for c in sum_columns])
+            sums = sums.select(keys + [c + '_sum' for c in sum_columns]).rename_columns(keys + sum_columns)
+            sums = sums.to_pandas().dropna(subset=keys).set_index(keys).sort_index()
+        else:
+            sums = df.groupby(keys, observed=True)[sum_columns].sum()
+        features = pd.DataFrame({
+            'total_focos': sums['eventos' if dedup else 'total_focos'],
+            'media_dias_sem_chuva': sums['soma_dias_sem_chuva'] / sums['n_dias_sem_chuva'],
+            'media_frp': sums['soma_frp'] / sums['n_frp'].where(sums['n_frp'] > 0),
+        })
+    else:
+        features = df.groupby(keys, observed=True).agg(
+            total_focos=('evento', 'sum') if dedup else ('id', 'count'),
+            media_dias_sem_chuva=('numero_dias_sem_chuva', 'mean'),
+            media_frp=('frp', 'mean'),
+        )
+    features['media_frp'] = features['media_frp'].fillna(0)
+    return features
+
+def table_columns(df) -> list:
+    """Colunas de um DataFrame ou de uma tabela Arrow."""
+    return df.column_names if isinstance(df, pa.Table) else list(df.columns)
+
+def is_empty(df) -> bool:
+    """Indica se um DataFrame ou uma tabela Arrow não tem linhas."""
+    return df.num_rows == 0 if isinstance(df, pa.Table) else df.empty
+
+def _group_bounds(labels: np.ndarray):
+    """Início e fim de cada sequência de rótulos iguais (os grupos já estão contíguos)."""
+    n = len(labels)
+    if n == 0:
+        return np.array([], dtype='int64'), np.array([], dtype='int64')
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    return starts, np.r_[starts[1:], n]
+
+def minmax_normalize(values: np.ndarray, starts: np.ndarray = None) -> np.ndarray:
+    """
+    Normaliza cada coluna para [0, 1] (min-max), no todo ou dentro de cada grupo.
+
+    Args:
+        values (np.ndarray): Matriz (linhas x variáveis).
+        starts (np.ndarray, opcional): Início de cada grupo de linhas contíguas;
+            sem ele, a normalização é feita sobre todas as linhas.
+
+    Returns:
+        np.ndarray: A matriz normalizada. Colunas (ou grupos) sem variação viram 0.
+    """
+    values = np.asarray(values, dtype='float64')
+    if len(values) == 0:
+        return values
+    if starts is None:
+        starts = np.array([0])
+    # fmin/fmax ignoram NaN, como o min/max do pandas
+    mins = np.fmin.reduceat(values, starts, axis=0)
+    ranges = np.fmax.reduceat(values, starts, axis=0) - mins
+    sizes = np.diff(np.r_[starts, len(values)])
+    mins, ranges = np.repeat(mins, sizes, axis=0), np.repeat(ranges, sizes, axis=0)
+    normalized = np.zeros_like(values)
+    np.divide(values - mins, ranges, out=normalized, where=ranges > 0)
+    normalized[np.isnan(values)] = np.nan
+    return normalized
+
+def top_k_indices(scores: np.ndarray, starts: np.ndarray, ends: np.ndarray, k: int) -> np.ndarray:
+    """
+    Posições das `k` maiores notas de cada grupo, em ordem decrescente dentro do grupo.
+
+    Usa seleção parcial (`np.argpartition`) em cada grupo e só ordena os `k`
+    selecionados. Notas NaN ficam por último.
+    """
+    scores = np.where(np.isnan(scores), -np.inf, scores)
+    selected = []
+    for start, end in zip(starts, ends):
+        segment = scores[start:end]
+        if len(segment) > k:
+            idx = np.argpartition(-segment, k - 1)[:k]
+        else:
+            idx = np.arange(len(segment))
+        idx = idx[np.argsort(-segment[idx], kind='stable')]
+        selected.append(idx + start)
+    return np.concatenate(selected) if selected else np.array([], dtype='int64')
+
+class RiskEngine:
+    """
+    Índice de risco de todas as localidades de um nível, agrupadas, calculado de uma vez.
+
+    As variáveis e a normalização são calculadas uma única vez na construção;
+    depois, trocar os pesos custa um produto de matrizes e obter a tabela de um
+    grupo (por exemplo, os municípios críticos de um estado) é uma consulta.
+
+    Args:
+        df (pd.DataFrame | pa.Table): Focos individuais ou rollup.
+        level (str): Nível das localidades ('municipio' ou 'estado').
+        group (str, opcional): Coluna de agrupamento (padrão: 'estado' para
+            municípios; nenhum para estados).
+        scope (str): 'grupo' normaliza dentro de cada grupo (equivale a
+            calcular o índice só com os dados daquele estado); 'global'
+            normaliza sobre todas as localidades.
+        dedup (bool): Se True, conta eventos em vez de detecções (ver
+            `location_features`).
+    """
+
+    def __init__(self, df: pd.DataFrame, level: str = 'municipio', group: str = 'estado',
+                 scope: str = 'grupo', dedup: bool = False):
+        if scope not in ('grupo', 'global'):
+            raise ValueError(f"Escopo de normalização desconhecido: {scope}")
+        if level == group:
+            group = None
+        self.level, self.group, self.scope = level, group, scope
+        keys = [group, level] if group else [level]
+        if is_empty(df) or any(key not in table_columns(df) for key in keys):
+            self.features = pd.DataFrame(columns=RISK_FEATURES)
+        else:
+            self.features = location_features(df, keys, dedup)
+        if group:
+            self.groups = self.features.index.get_level_values(group).to_numpy()
+            self.labels = self.features.index.get_level_values(level).to_numpy()
+        else:
+            self.groups = np.zeros(len(self.features), dtype='int8')
+            self.labels = self.features.index.to_numpy()
+        self.starts, self.ends = _group_bounds(self.groups)
+        values = self.features[RISK_FEATURES].to_numpy(dtype='float64')
+        self.normalized = minmax_normalize(values, self.starts if scope == 'grupo' else None)
+
+    def scores(self, weights=RISK_WEIGHTS) -> np.ndarray:
+        """
+        Índice de risco de cada localidade.
+
+        Args:
+            weights: Pesos das variáveis (3 valores), ou uma matriz com um
+                conjunto de pesos por linha para simular vários cenários.
+
+        Returns:
+            np.ndarray: Um índice por localidade (ou uma coluna por cenário).
+        """
+        return self.normalized @ np.asarray(weights, dtype='float64').T
+
+    def top_k(self, k: int = 15, weights=RISK_WEIGHTS) -> pd.DataFrame:
+        """
+        As `k` localidades de maior risco de cada grupo.
+
+        Returns:
+            pd.DataFrame: Colunas `RISK_COLUMNS`, indexado pelo grupo (ex: estado)
+                          quando houver agrupamento.
+        """
+        scores = self.scores(weights)
+        idx = top_k_indices(scores, self.starts, self.ends, k)
+        table = pd.DataFrame({
+            'Localidade': self.labels[idx],
+            **{col: self.features[col].to_numpy()[idx] for col in RISK_FEATURES},
+            'indice_risco': scores[idx],
+        }, columns=RISK_COLUMNS)
+        if self.group:
+            table.index = pd.Index(self.groups[idx], name=self.group)
+        return table
+
+    def sweep(self, weight_sets, k: int = 15) -> dict:
+        """Tabelas `top_k` para vários conjuntos de pesos (análise de cenários)."""
+        return {tuple(float(w) for w in weights): self.top_k(k, weights) for weights in weight_sets}
+
+def risk_table_for(table: pd.DataFrame, key) -> pd.DataFrame:
+    """Tabela de risco de um grupo (ex: um estado) a partir da tabela de `RiskEngine.top_k`."""
+    if key not in table.index:
+        return pd.DataFrame(columns=RISK_COLUMNS)
+    return table.loc[[key]].reset_index(drop=True)
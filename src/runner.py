@@ -0,0 +1,308 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from datetime import datetime
+from src.data_processing import get_data_version
+
+# Execução do pipeline em segundo plano, fora do processo do Streamlit.
+#
+# - LOCK_FILE garante uma única execução por vez: é criado com O_EXCL e guarda
+#   o PID do processo dono. Um lock cujo dono já morreu (processo encerrado à
+#   força, máquina reiniciada) é considerado abandonado e pode ser tomado.
+# - STATUS_FILE guarda o estado da execução corrente ou da última: etapa atual,
+#   duração de cada etapa concluída e, ao final, a versão dos dados gerada. A
+#   aplicação lê esse arquivo para mostrar o progresso.
+# - LOG_FILE recebe a saída (prints) da execução em segundo plano.
+LOCK_FILE = os.path.join('data', '.pipeline.lock')
+STATUS_FILE = os.path.join('data', '.pipeline_status.json')
+LOG_FILE = os.path.join('reports', 'metricas', 'pipeline.log')
+PROCESSED_DATA_DIR = os.path.join('data', 'processed')
+RAW_DATA_DIR = os.path.join('data', 'raw')
+# Etapas de main.main(), na ordem, para o cálculo do progresso
+PIPELINE_STAGES = ['listagem', 'download', 'processamento', 'analise']
+# Um lock sem conteúdo legível (processo morto entre criar e escrever o
+# arquivo) só é considerado abandonado depois deste tempo
+_EMPTY_LOCK_GRACE_S = 60
+# Intervalo padrão entre consultas à listagem do INPE no modo agendado
+SCHEDULE_INTERVAL_S = 15 * 60
+
+def _pid_alive(pid: int) -> bool:
+    """Verifica se existe um processo com o PID informado."""
+    if pid <= 0:
+        return False
+    if os.name == 'nt':
+        # No Windows, os.kill(pid, 0) enviaria um CTRL_C ao processo
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        exit_code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        kernel32.CloseHandle(handle)
+        return exit_code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def read_lock(lock_path: str = LOCK_FILE) -> dict:
+    """
+    Retorna o conteúdo do lock (PID e início) se ele estiver ativo, ou None.
+
+    Um lock cujo processo dono não existe mais é tratado como inexistente.
+    """
+    try:
+        with open(lock_path, encoding='utf-8') as f:
+            content = f.read()
+        mtime = os.path.getmtime(lock_path)
+    except FileNotFoundError:
+        return None
+    try:
+        owner = json.loads(content)
+    except ValueError:
+        # Lock recém-criado, ainda sem conteúdo, ou abandonado nesse ponto
+        return {'pid': None} if time.time() - mtime < _EMPTY_LOCK_GRACE_S else None
+    return owner if _pid_alive(owner.get('pid', -1)) else None
+
+def acquire_lock(lock_path: str = LOCK_FILE) -> bool:
+    """
+    Tenta obter o lock de execução do pipeline, sem esperar.
+
+    O arquivo é criado com O_CREAT | O_EXCL, de modo que só um processo
+    consegue criá-lo. Se ele já existe mas o dono morreu, é removido e a
+    criação é tentada de novo.
+
+    Args:
+        lock_path (str): Caminho do arquivo de lock.
+
+    Returns:
+        bool: True se o lock foi obtido, False se outra execução está em andamento.
+    """
+    os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+    for _ in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if read_lock(lock_path) is not None:
+                return False
+            print(f"Removendo lock abandonado: {lock_path}")
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+            continue
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'pid': os.getpid(), 'inicio': datetime.now().isoformat(timespec='seconds')}, f)
+        return True
+    return False
+
+def release_lock(lock_path: str = LOCK_FILE):
+    """Libera o lock, se ele pertencer a este processo."""
+    try:
+        with open(lock_path, encoding='utf-8') as f:
+            owner = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return
+    if owner.get('pid') == os.getpid():
+        os.remove(lock_path)
+
+def is_running(lock_path: str = LOCK_FILE) -> bool:
+    """Indica se há uma execução do pipeline em andamento."""
+    return read_lock(lock_path) is not None
+
+def write_status(status: dict, status_path: str = STATUS_FILE):
+    """Grava o estado da execução de forma atômica (arquivo temporário + os.replace)."""
+    os.makedirs(os.path.dirname(status_path) or '.', exist_ok=True)
+    tmp_path = status_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(status, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, status_path)
+
+def _is_active(status: dict) -> bool:
+    """Indica se o estado gravado corresponde a uma execução ainda viva."""
+    if status.get('estado') not in ('iniciando', 'executando'):
+        return False
+    if status.get('pid') is None:
+        # Estado provisório gravado antes de o processo filho existir
+        started = datetime.fromisoformat(status['inicio'])
+        return (datetime.now() - started).total_seconds() < _EMPTY_LOCK_GRACE_S
+    return _pid_alive(status['pid'])
+
+def load_status(status_path: str = STATUS_FILE) -> dict:
+    """
+    Carrega o estado da execução corrente ou da última, ou None se não houver.
+
+    Uma execução marcada como em andamento cujo processo não existe mais é
+    devolvida com estado 'interrompido'.
+    """
+    try:
+        with open(status_path, encoding='utf-8') as f:
+            status = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if status.get('estado') in ('iniciando', 'executando') and not _is_active(status):
+        status['estado'] = 'interrompido'
+    return status
+
+def progress(status: dict) -> float:
+    """Fração (0 a 1) das etapas do pipeline já concluídas."""
+    if not status:
+        return 0.0
+    if status.get('estado') == 'concluido':
+        return 1.0
+    done = sum(1 for name in PIPELINE_STAGES if status.get('etapas', {}).get(name, {}).get('estado') == 'concluida')
+    return done / len(PIPELINE_STAGES)
+
+def data_version(processed_data_dir: str = PROCESSED_DATA_DIR, status_path: str = STATUS_FILE) -> str:
+    """
+    Versão dos dados que a aplicação deve usar.
+
+    Enquanto uma execução está em andamento, devolve a versão registrada no
+    início dela: a aplicação continua usando os dados (e os caches) anteriores
+    e só passa para a versão nova quando a execução termina.
+    """
+    status = load_status(status_path)
+    if status and status.get('estado') in ('iniciando', 'executando') and 'versao_anterior' in status:
+        return status['versao_anterior']
+    return get_data_version(processed_data_dir)
+
+def _freeze_snapshots():
+    """Garante os retratos da semana na versão atual dos dados (ver `data_version`)."""
+    try:
+        from src.data_analysis import prepare_weekly_snapshots
+        prepare_weekly_snapshots(PROCESSED_DATA_DIR)
+    except Exception as e:
+        print(f"Não foi possível gravar os retratos da versão atual dos dados: {e}")
+
+def run_pipeline(all_states: bool = False, lock_path: str = LOCK_FILE, status_path: str = STATUS_FILE) -> bool:
+    """
+    Executa o pipeline completo (main.main) com o lock e registrando o progresso.
+
+    Args:
+        all_states (bool): Gera também os relatórios de cada estado.
+        lock_path (str): Caminho do arquivo de lock.
+        status_path (str): Caminho do arquivo de estado.
+
+    Returns:
+        bool: True se o pipeline foi executado com sucesso, False se outra
+              execução estava em andamento ou se houve erro.
+    """
+    from main import main
+    if not acquire_lock(lock_path):
+        print("Já existe uma execução do pipeline em andamento.")
+        return False
+
+    status = {
+        'pid': os.getpid(),
+        'estado': 'executando',
+        'inicio': datetime.now().isoformat(timespec='seconds'),
+        'etapa': None,
+        'etapas': {},
+        'versao_anterior': get_data_version(PROCESSED_DATA_DIR),
+    }
+
+    def on_stage(name, record):
+        if record is None:
+            status['etapa'] = name
+            status['etapas'][name] = {'estado': 'executando'}
+        else:
+            status['etapas'][name] = {'estado': 'concluida', 'duracao_s': record['duracao_s']}
+        write_status(status, status_path)
+
+    try:
+        write_status(status, status_path)
+        # A aplicação lê a versão anterior dos retratos até o fim da execução
+        _freeze_snapshots()
+        main(all_states=all_states, on_stage=on_stage)
+        status['estado'] = 'concluido'
+        return True
+    except Exception as e:
+        status['estado'] = 'erro'
+        status['erro'] = str(e)
+        print(f"Erro durante a execução do pipeline: {e}")
+        return False
+    finally:
+        status['etapa'] = None
+        status['fim'] = datetime.now().isoformat(timespec='seconds')
+        status['versao_dados'] = get_data_version(PROCESSED_DATA_DIR)
+        write_status(status, status_path)
+        release_lock(lock_path)
+
+def start_background(all_states: bool = False, lock_path: str = LOCK_FILE,
+                     status_path: str = STATUS_FILE, log_path: str = LOG_FILE) -> bool:
+    """
+    Inicia o pipeline num processo separado e retorna imediatamente.
+
+    O processo filho obtém o lock; se duas chamadas acontecerem ao mesmo tempo,
+    apenas uma execução acontece. A saída vai para `log_path` e o progresso
+    pode ser acompanhado com `load_status`.
+
+    Returns:
+        bool: True se a execução foi iniciada, False se já havia uma em andamento.
+    """
+    if is_running(lock_path) or _is_active(load_status(status_path) or {}):
+        return False
+    # Estado provisório, gravado antes de o processo filho existir: a aplicação
+    # mostra a execução nova logo após o clique, e o filho o substitui ao obter o lock
+    write_status({'pid': None, 'estado': 'iniciando', 'etapa': None, 'etapas': {},
+                  'inicio': datetime.now().isoformat(timespec='seconds'),
+                  'versao_anterior': get_data_version(PROCESSED_DATA_DIR)}, status_path)
+    os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+    command = [sys.executable, '-m', 'src.runner', '--lock', lock_path, '--status', status_path]
+    if all_states:
+        command.append('--todos-estados')
+    with open(log_path, 'a', encoding='utf-8') as log:
+        subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                         start_new_session=True, env={**os.environ, 'PYTHONUNBUFFERED': '1'})
+    return True
+
+def schedule(interval_s: int = SCHEDULE_INTERVAL_S, all_states: bool = False, listing_url: str = None,
+             raw_data_dir: str = RAW_DATA_DIR, lock_path: str = LOCK_FILE, status_path: str = STATUS_FILE):
+    """
+    Consulta periodicamente a listagem do INPE e executa o pipeline quando ela muda.
+
+    Cada consulta é uma requisição condicional (ver `listing_changed`): sem
+    dados novos, o servidor responde 304 e nada é baixado nem processado. Se a
+    execução falhar, ela é tentada de novo na próxima consulta.
+
+    Args:
+        interval_s (int): Intervalo entre consultas, em segundos.
+        all_states (bool): Gera também os relatórios de cada estado.
+        listing_url (str, opcional): Página de listagem (padrão: LISTING_URL).
+        raw_data_dir (str): Diretório de dados brutos (onde fica o cache HTTP).
+        lock_path (str): Caminho do arquivo de lock.
+        status_path (str): Caminho do arquivo de estado.
+    """
+    from src.data_collection import LISTING_URL, listing_changed
+
+    listing_url = listing_url or LISTING_URL
+    pending = False
+    print(f"Consultando {listing_url} a cada {interval_s} s (Ctrl+C para encerrar).")
+    while True:
+        if listing_changed(listing_url, raw_data_dir) or pending:
+            print(f"\n[{datetime.now():%Y-%m-%d %H:%M:%S}] Listagem alterada, executando o pipeline...")
+            pending = not run_pipeline(all_states, lock_path, status_path)
+        time.sleep(interval_s)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Execução do pipeline com lock e registro de progresso.")
+    parser.add_argument('--todos-estados', action='store_true',
+                        help="Gera também os relatórios de cada estado em reports/estados/.")
+    parser.add_argument('--agendar', action='store_true',
+                        help="Consulta a listagem do INPE periodicamente e executa o pipeline quando há dados novos.")
+    parser.add_argument('--intervalo', type=int, default=SCHEDULE_INTERVAL_S,
+                        help="Intervalo entre consultas no modo agendado, em segundos.")
+    parser.add_argument('--lock', default=LOCK_FILE, help=argparse.SUPPRESS)
+    parser.add_argument('--status', default=STATUS_FILE, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.agendar:
+        schedule(args.intervalo, args.todos_estados, lock_path=args.lock, status_path=args.status)
+    else:
+        sys.exit(0 if run_pipeline(args.todos_estados, args.lock, args.status) else 1)
@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+class SliceIndex:
+    """
+    Índice de posições de linha por estado e dia, para filtrar sem percorrer o DataFrame.
+
+    O DataFrame é ordenado uma única vez por (estado, dia); depois disso, os
+    focos (ou grupos do rollup) de um estado, ou de um estado num dia, ocupam
+    um intervalo contíguo de linhas, e a seleção é uma fatia (`iloc[a:b]`), sem
+    cópia dos dados. Os focos de um dia em todos os estados não são contíguos
+    nessa ordem: para eles o índice guarda as posições já agrupadas por dia, e
+    a seleção copia só as linhas do dia. As listas de estados e de dias (as
+    opções dos filtros da aplicação) também são calculadas na construção.
+
+    Também aceita uma tabela Arrow (como o retrato de src/snapshot.py); se ela
+    já estiver ordenada por (estado, dia), não é copiada, e as fatias são
+    vistas (`Table.slice`) sobre a memória da tabela.
+
+    Args:
+        df (pd.DataFrame | pa.Table): Focos ou rollup, com as colunas `key` e `date_col`.
+        key (str): Coluna do estado.
+        date_col (str): Coluna de data (datetime); só o dia é considerado.
+    """
+
+    def __init__(self, df: pd.DataFrame, key: str = 'estado', date_col: str = 'data'):
+        if isinstance(df, pa.Table):
+            values = df.column(key).combine_chunks()
+            if not pa.types.is_dictionary(values.type):
+                values = values.dictionary_encode()
+            categories = values.dictionary.to_pylist()
+            codes = values.indices.fill_null(-1).to_numpy()
+            days = df.column(date_col)
+            if not pa.types.is_date32(days.type):
+                days = pc.cast(days, pa.date32())
+            day_numbers = pc.cast(days, pa.int32()).to_numpy()
+        else:
+            values = df[key].astype('category')
+            categories = list(values.cat.categories)
+            codes = values.cat.codes.to_numpy()
+            day_numbers = df[date_col].to_numpy().astype('datetime64[D]').astype('int64')
+        # Posição de cada estado na ordem alfabética (nulos vão para o fim)
+        rank = np.empty(len(categories) + 1, dtype='int64')
+        rank[:-1] = np.argsort(np.argsort(np.asarray(categories, dtype=object)))
+        rank[-1] = len(categories)
+        key_codes = rank[codes]
+        day_values, day_codes = np.unique(day_numbers, return_inverse=True)
+
+        order = np.lexsort((day_codes, key_codes))
+        self._copied = not np.array_equal(order, np.arange(len(order)))
+        if not self._copied:
+            self.frame = df
+        elif isinstance(df, pa.Table):
+            self.frame = df.take(order)
+        else:
+            self.frame = df.iloc[order].reset_index(drop=True)
+        key_codes, day_codes = key_codes[order], day_codes[order]
+        n_days = len(day_values)
+
+        names = sorted(categories)
+        # Limites [início, fim) de cada estado e de cada (estado, dia) na ordem do frame
+        self._key_bounds = np.searchsorted(key_codes, np.arange(len(names) + 1))
+        pair_codes = key_codes * n_days + day_codes
+        self._pair_bounds = np.searchsorted(pair_codes, np.arange(len(names) * n_days + 1))
+        # Posições das linhas de cada dia (em todos os estados), agrupadas por dia
+        self._day_rows = np.argsort(day_codes, kind='stable')
+        self._day_bounds = np.searchsorted(day_codes[self._day_rows], np.arange(n_days + 1))
+
+        self._days = [d.date() for d in pd.to_datetime(day_values, unit='D')]
+        self._day_code = {d: i for i, d in enumerate(self._days)}
+        counts = np.diff(self._key_bounds)
+        self._key_code = {name: i for i, name in enumerate(names) if counts[i]}
+        self.estados = [name for name in names if name in self._key_code]
+        per_key = np.diff(self._pair_bounds).reshape(len(names), n_days) if n_days else None
+        self._key_days = {name: [self._days[d] for d in np.flatnonzero(per_key[i])]
+                          for name, i in self._key_code.items()}
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @property
+    def nbytes(self) -> int:
+        """Memória ocupada pelo índice: os vetores de posições e, se o frame foi reordenado, a cópia."""
+        size = sum(array.nbytes for array in (self._key_bounds, self._pair_bounds, self._day_rows, self._day_bounds))
+        if self._copied:
+            size += self.frame.nbytes if isinstance(self.frame, pa.Table) else int(self.frame.memory_usage(deep=True).sum())
+        return size
+
+    def _rows(self, start: int, stop: int):
+        if isinstance(self.frame, pa.Table):
+            return self.frame.slice(start, stop - start)
+        return self.frame.iloc[start:stop]
+
+    def _take(self, rows: np.ndarray):
+        if isinstance(self.frame, pa.Table):
+            return self.frame.take(rows)
+        return self.frame.iloc[rows]
+
+    def dias(self, estado: str = None) -> list:
+        """Dias (datetime.date) com dados, em ordem, no país ou num estado."""
+        if estado is None:
+            return list(self._days)
+        return list(self._key_days.get(estado, []))
+
+    def select(self, estado: str = None, dia=None):
+        """
+        Linhas de um estado, de um dia ou de um estado num dia.
+
+        Args:
+            estado (str, opcional): Estado (None para todos).
+            dia (datetime.date, opcional): Dia (None para todos).
+
+        Returns:
+            pd.DataFrame | pa.Table: As linhas selecionadas (vazio se o estado ou
+                                     o dia não tiverem dados), na ordem (estado, dia).
+        """
+        if estado is not None and estado not in self._key_code:
+            return self._rows(0, 0)
+        if dia is not None and dia not in self._day_code:
+            return self._rows(0, 0)
+        if estado is None and dia is None:
+            return self.frame
+        if dia is None:
+            k = self._key_code[estado]
+            return self._rows(self._key_bounds[k], self._key_bounds[k + 1])
+        d = self._day_code[dia]
+        if estado is None:
+            return self._take(self._day_rows[self._day_bounds[d]:self._day_bounds[d + 1]])
+        pair = self._key_code[estado] * len(self._days) + d
+        return self._rows(self._pair_bounds[pair], self._pair_bounds[pair + 1])
@@ -0,0 +1,362 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pandas as pd
+import os
+import glob
+import json
+import tempfile
+import shutil
+from src.data_processing import ROLLUP_DIR, ROLLUP_KEYS, ROLLUP_SUMS, get_data_version
+from src.raster import RASTER_RESOLUTION, RASTER_LAYERS, MASKS_FILE, grid_shape, raster_dir, load_density
+from src.metrics import timed
+
+# Retrato do rollup de um intervalo (a janela da última semana), em
+# <processed_data_dir>/_snapshot, num único arquivo Arrow IPC sem compressão.
+# O arquivo é aberto por mapeamento de memória: abrir o retrato não lê nem
+# copia os dados, as colunas apontam para as páginas do arquivo, que ficam no
+# cache de páginas do sistema e são compartilhadas entre o processo do
+# Streamlit e os do relatório. O nome leva o intervalo e a versão dos dados
+# (ver `get_data_version`); um retrato de outra versão é refeito na abertura.
+#
+# Junto do rollup fica o retrato da densidade do mesmo intervalo: os rasters
+# de cada dia (ver src/raster.py), num .npy por camada (dias x linhas x
+# colunas), lido com memória mapeada como os rasters diários, e os rótulos de
+# estado das células num .npz pequeno, gravado por último.
+# Com os dois, a aplicação continua lendo uma versão fixa dos dados enquanto o
+# pipeline grava a seguinte (ver `src.runner.data_version`).
+#
+# O retrato é atualizado de forma incremental, como o agregado da janela que
+# ficava em <processed_data_dir>/_janela (LEGACY_WINDOW_DIR, removido na
+# primeira gravação): os metadados do esquema guardam a "impressão digital"
+# (nome, tamanho e mtime dos arquivos) do rollup de cada dia, e o retrato novo
+# parte do mais recente, descartando as linhas dos dias que saíram da janela e
+# lendo só as partições dos dias novos ou reprocessados.
+#
+# As linhas ficam ordenadas por (estado, data), e estado, município e bioma
+# são colunas de dicionário com os valores em ordem alfabética. A coluna `data`
+# é date32: nenhuma coluna vira objeto Python.
+SNAPSHOT_DIR = '_snapshot'
+SNAPSHOT_COLUMNS = ['data'] + ROLLUP_KEYS + ROLLUP_SUMS
+_DICTIONARY_COLUMNS = ['estado', 'municipio', 'bioma']
+LEGACY_WINDOW_DIR = '_janela'
+
+def snapshot_path(processed_data_dir: str, start_date, end_date, version: str) -> str:
+    """Caminho do retrato de um intervalo numa versão dos dados."""
+    name = f"rollup_{start_date:%Y%m%d}_{end_date:%Y%m%d}_{version or 'vazio'}.arrow"
+    return os.path.join(processed_data_dir, SNAPSHOT_DIR, name)
+
+def density_snapshot_path(processed_data_dir: str, start_date, end_date, version: str,
+                          resolution: float = RASTER_RESOLUTION) -> str:
+    """Caminho do retrato da densidade de um intervalo numa versão dos dados (o .npz com dias e rótulos)."""
+    name = f"densidade_{resolution:g}_{start_date:%Y%m%d}_{end_date:%Y%m%d}_{version or 'vazio'}.npz"
+    return os.path.join(processed_data_dir, SNAPSHOT_DIR, name)
+
+def _layer_path(path: str, layer: str) -> str:
+    """Caminho do .npy de uma camada do retrato da densidade."""
+    name = os.path.basename(path).replace('densidade_', f"densidade-{layer}_", 1)
+    return os.path.join(os.path.dirname(path), os.path.splitext(name)[0] + '.npy')
+
+def _pinned(processed_data_dir: str, version: str = None):
+    """Versão pedida (None para a atual) e se ela é a atual, a única que pode ser montada."""
+    current = get_data_version(processed_data_dir)
+    if version is None:
+        return current, True
+    return version, version == current
+
+def _snapshot_version(path: str) -> str:
+    """Versão dos dados de um retrato, a partir do nome do arquivo."""
+    return os.path.splitext(os.path.basename(path))[0].rsplit('_', 1)[-1]
+
+def _remove_old_snapshots(snapshot_dir: str, version: str):
+    """
+    Remove os retratos de versões anteriores à anterior à `version`.
+
+    Os retratos da versão atual (de qualquer intervalo) e os da versão
+    imediatamente anterior ficam: durante uma execução do pipeline a aplicação
+    continua lendo a versão anterior (ver `src.runner.data_version`). No
+    Windows, um retrato ainda aberto por outro processo só é removido numa
+    próxima vez.
+    """
+    paths = glob.glob(os.path.join(snapshot_dir, '*_*.*'))
+    newest = {}
+    for path in paths:
+        other = _snapshot_version(path)
+        newest[other] = max(newest.get(other, 0), os.path.getmtime(path))
+    previous = sorted((v for v in newest if v != version), key=newest.get)[-1:]
+    for path in paths:
+        if _snapshot_version(path) not in [version] + previous:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def _sorted_dictionary(values: pa.ChunkedArray) -> pa.DictionaryArray:
+    """Codifica textos como dicionário com os valores em ordem alfabética."""
+    values = values.combine_chunks()
+    dictionary = pc.unique(values.drop_null()).sort()
+    return pa.DictionaryArray.from_arrays(pc.index_in(values, value_set=dictionary), dictionary)
+
+def _day_files(processed_data_dir: str, day) -> list:
+    """Arquivos de rollup da partição de um dia."""
+    return sorted(glob.glob(os.path.join(processed_data_dir, ROLLUP_DIR, f"data={day:%Y-%m-%d}", '*.parquet')))
+
+def _day_fingerprint(processed_data_dir: str, day) -> list:
+    """Identifica a versão do rollup de um dia pelos arquivos que o compõem."""
+    fingerprint = []
+    for f in _day_files(processed_data_dir, day):
+        stat = os.stat(f)
+        fingerprint.append([os.path.basename(f), stat.st_size, stat.st_mtime_ns])
+    return fingerprint
+
+def _read_day(processed_data_dir: str, day) -> pa.Table:
+    """Lê o rollup de um dia, só da partição do dia, nas colunas do retrato (sem dicionários)."""
+    files = _day_files(processed_data_dir, day)
+    if files:
+        dataset = ds.dataset(files, format='parquet')
+        table = dataset.to_table(columns=[c for c in SNAPSHOT_COLUMNS if c in dataset.schema.names])
+    else:
+        table = pa.table({})
+    return _day_table(table, day)
+
+def _day_table(table: pa.Table, day) -> pa.Table:
+    """Completa o rollup de um dia com a coluna `data` e as colunas que faltarem."""
+    columns = {'data': pa.array([day] * table.num_rows, pa.date32())}
+    for name in SNAPSHOT_COLUMNS[1:]:
+        if name not in table.column_names:
+            # Rollup gravado antes de alguma coluna existir (ex: `eventos`)
+            columns[name] = pa.nulls(table.num_rows, pa.int32()) if name in ROLLUP_SUMS else pa.nulls(table.num_rows, pa.string())
+        else:
+            columns[name] = table.column(name)
+    return pa.table(columns)
+
+def _snapshot_days(table: pa.Table) -> dict:
+    """Impressões digitais dos dias de um retrato, guardadas nos metadados do esquema."""
+    metadata = table.schema.metadata or {}
+    return json.loads(metadata.get(b'dias', b'{}'))
+
+@timed()
+def build_snapshot(processed_data_dir: str, start_date, end_date, previous: str = None) -> pa.Table:
+    """
+    Monta o retrato do rollup diário de um intervalo (ver comentário do módulo).
+
+    Os dias de `previous` cujo rollup não mudou são copiados do retrato
+    anterior; só as partições dos demais dias do intervalo são lidas.
+
+    Args:
+        processed_data_dir (str): O caminho para o diretório de dados processados.
+        start_date (date): Primeiro dia (inclusive).
+        end_date (date): Último dia (inclusive).
+        previous (str, opcional): Retrato anterior (de outro intervalo ou versão) a reaproveitar.
+
+    Returns:
+        pa.Table: O rollup do intervalo, em um único bloco de memória por coluna.
+    """
+    days = {f"{day:%Y-%m-%d}": _day_fingerprint(processed_data_dir, day)
+            for day in pd.date_range(start_date, end_date).date}
+    tables, reused = [], []
+    if previous is not None:
+        try:
+            old = read_snapshot(previous)
+        except (OSError, pa.ArrowInvalid) as e:
+            print(f"Retrato anterior {previous} ignorado: {e}")
+        else:
+            old_days = _snapshot_days(old)
+            reused = [day for day, fingerprint in days.items() if old_days.get(day) == fingerprint]
+            if reused:
+                old = old.filter(pc.is_in(old.column('data'), value_set=pa.array(pd.to_datetime(reused).date, pa.date32())))
+                tables.append(pa.table({name: pc.cast(old.column(name), pa.string()) if name in _DICTIONARY_COLUMNS
+                                        else old.column(name) for name in SNAPSHOT_COLUMNS}))
+    for day in pd.to_datetime([day for day in days if day not in reused]).date:
+        tables.append(_read_day(processed_data_dir, day))
+
+    # Dias sem rollup não têm linhas, e as colunas deles não têm o tipo das gravadas
+    tables = [t for t in tables if t.num_rows]
+    if not tables:
+        try:
+            schema = ds.dataset(os.path.join(processed_data_dir, ROLLUP_DIR), format='parquet').schema
+        except FileNotFoundError:
+            schema = pa.schema([])
+        tables = [_day_table(schema.empty_table().select([c for c in SNAPSHOT_COLUMNS if c in schema.names]), start_date)]
+    table = pa.concat_tables(tables, promote_options='permissive')
+    if table.num_rows:
+        table = table.take(pc.sort_indices(table, sort_keys=[('estado', 'ascending'), ('data', 'ascending')]))
+    for name in _DICTIONARY_COLUMNS:
+        i = table.column_names.index(name)
+        table = table.set_column(i, name, _sorted_dictionary(table.column(i)))
+    return table.combine_chunks().replace_schema_metadata({'dias': json.dumps(days)})
+
+def write_snapshot(table: pa.Table, path: str):
+    """Grava o retrato em Arrow IPC, de forma atômica (arquivo temporário + os.replace)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f, pa.ipc.new_file(f, table.schema) as writer:
+            writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def read_snapshot(path: str) -> pa.Table:
+    """Abre um retrato por mapeamento de memória (sem ler nem copiar os dados)."""
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+def ensure_snapshot(processed_data_dir: str, start_date, end_date, version: str = None) -> str:
+    """
+    Garante que o retrato do intervalo existe e retorna o seu caminho.
+
+    O retrato novo parte do retrato do rollup gravado por último (ver
+    `build_snapshot`). Ao gravá-lo, remove os de versões antigas (ver
+    `_remove_old_snapshots`).
+
+    Args:
+        processed_data_dir (str): O caminho para o diretório de dados processados.
+        start_date (date): Primeiro dia (inclusive).
+        end_date (date): Último dia (inclusive).
+        version (str, opcional): Versão dos dados (padrão: a atual). O retrato
+            de uma versão anterior não pode ser montado, só reaproveitado.
+
+    Returns:
+        str: O caminho do retrato, ou None se ele for de uma versão anterior e não existir.
+    """
+    version, current = _pinned(processed_data_dir, version)
+    path = snapshot_path(processed_data_dir, start_date, end_date, version)
+    if os.path.exists(path):
+        return path
+    if not current:
+        print(f"Retrato da versão {version} dos dados indisponível.")
+        return None
+    previous = sorted(glob.glob(os.path.join(os.path.dirname(path), 'rollup_*.arrow')), key=os.path.getmtime)
+    write_snapshot(build_snapshot(processed_data_dir, start_date, end_date, previous[-1] if previous else None), path)
+    _remove_old_snapshots(os.path.dirname(path), version or 'vazio')
+    shutil.rmtree(os.path.join(processed_data_dir, LEGACY_WINDOW_DIR), ignore_errors=True)
+    return path
+
+def open_snapshot(processed_data_dir: str, start_date, end_date, version: str = None) -> pa.Table:
+    """
+    Abre (montando, se preciso) o retrato do rollup de um intervalo.
+
+    Args:
+        processed_data_dir (str): O caminho para o diretório de dados processados.
+        start_date (date): Primeiro dia (inclusive).
+        end_date (date): Último dia (inclusive).
+        version (str, opcional): Versão dos dados (ver `ensure_snapshot`).
+
+    Returns:
+        pa.Table: O rollup do intervalo, mapeado em memória (vazio se o
+                  retrato da versão pedida não existir).
+    """
+    path = ensure_snapshot(processed_data_dir, start_date, end_date, version)
+    if path is None:
+        return pa.table({'data': pa.array([], pa.date32())})
+    return read_snapshot(path)
+
+def write_density_snapshot(processed_data_dir: str, start_date, end_date, path: str,
+                           resolution: float = RASTER_RESOLUTION):
+    """
+    Grava o retrato da densidade de um intervalo: um .npy por camada e o .npz com os dias e os rótulos.
+
+    Cada camada é preenchida dia a dia num arquivo mapeado em memória, sem
+    montar o intervalo inteiro na memória. Os arquivos são gravados de forma
+    atômica, e o .npz (que marca o retrato como completo) por último.
+    """
+    days = pd.date_range(start_date, end_date).date
+    shape = (len(days),) + grid_shape(resolution)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    tmp_paths = {layer: tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp') for layer in RASTER_LAYERS}
+    tmp_paths['rotulos'] = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+    try:
+        for fd, _ in tmp_paths.values():
+            os.close(fd)
+        layers = {layer: np.lib.format.open_memmap(tmp_paths[layer][1], mode='w+', dtype='float32', shape=shape)
+                  for layer in RASTER_LAYERS}
+        for i, day in enumerate(days):
+            density = load_density(processed_data_dir, day, day, resolution=resolution)
+            for j, layer in enumerate(RASTER_LAYERS):
+                layers[layer][i] = density[j]
+        for layer in RASTER_LAYERS:
+            layers[layer].flush()
+            del layers[layer]
+            os.replace(tmp_paths[layer][1], _layer_path(path, layer))
+
+        try:
+            with np.load(os.path.join(raster_dir(processed_data_dir, resolution), MASKS_FILE)) as data:
+                names, labels = data['estados'], data['rotulos']
+        except FileNotFoundError:
+            names, labels = np.array([], dtype=str), np.full(grid_shape(resolution), -1, dtype='int16')
+        with open(tmp_paths['rotulos'][1], 'wb') as f:
+            np.savez(f, dias=np.array([f"{day:%Y-%m-%d}" for day in days]), estados=names, rotulos=labels)
+        os.replace(tmp_paths['rotulos'][1], path)
+    finally:
+        for _, tmp_path in tmp_paths.values():
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+def ensure_density_snapshot(processed_data_dir: str, start_date, end_date, version: str = None,
+                            resolution: float = RASTER_RESOLUTION) -> str:
+    """Garante que o retrato da densidade do intervalo existe (ver `ensure_snapshot`)."""
+    version, current = _pinned(processed_data_dir, version)
+    path = density_snapshot_path(processed_data_dir, start_date, end_date, version, resolution)
+    if all(os.path.exists(p) for p in [path] + [_layer_path(path, layer) for layer in RASTER_LAYERS]):
+        return path
+    if not current:
+        print(f"Retrato da densidade da versão {version} dos dados indisponível.")
+        return None
+    write_density_snapshot(processed_data_dir, start_date, end_date, path, resolution)
+    _remove_old_snapshots(os.path.dirname(path), version or 'vazio')
+    return path
+
+def read_density(path: str, start_date=None, end_date=None, estado: str = None,
+                 resolution: float = RASTER_RESOLUTION) -> np.ndarray:
+    """
+    Soma a densidade dos dias de um retrato (como `src.raster.load_density`).
+
+    As camadas são abertas com memória mapeada e só as páginas dos dias
+    pedidos são lidas, sem copiar o retrato.
+
+    Args:
+        path (str): Retrato da densidade (ver `ensure_density_snapshot`), ou None.
+        start_date (date, opcional): Primeiro dia (inclusive).
+        end_date (date, opcional): Último dia (inclusive).
+        estado (str, opcional): Mantém só as células do estado.
+        resolution (float): Resolução dos rasters, em graus.
+
+    Returns:
+        np.ndarray: Matriz float64 (camadas x linhas x colunas), zerada se não houver dados.
+    """
+    total = np.zeros((len(RASTER_LAYERS),) + grid_shape(resolution), dtype='float64')
+    if path is None:
+        return total
+    with np.load(path) as data:
+        days, names, labels = data['dias'], data['estados'].tolist(), data['rotulos']
+    # Os dias do retrato são consecutivos: o intervalo pedido é uma fatia
+    first = np.searchsorted(days, str(start_date)[:10]) if start_date is not None else 0
+    last = np.searchsorted(days, str(end_date)[:10], side='right') if end_date is not None else len(days)
+    for j, layer in enumerate(RASTER_LAYERS):
+        values = np.load(_layer_path(path, layer), mmap_mode='r')
+        for i in range(first, last):
+            np.add(total[j], values[i], out=total[j])
+    if estado is not None:
+        if estado not in names:
+            return np.zeros_like(total)
+        total *= labels == names.index(estado)
+    return total
+
+def sum_by(table: pa.Table, keys: list, columns: list = ROLLUP_SUMS) -> pa.Table:
+    """Soma `columns` por `keys` com os kernels do Arrow (mantendo os nomes das colunas)."""
+    columns = [c for c in columns if c in table.column_names]
+    sums = table.group_by(keys).aggregate([(c, 'sum') for c in columns])
+    return sums.select(keys + [c + '_sum' for c in columns]).rename_columns(keys + columns)
+
+def filter_estado(table: pa.Table, estado: str) -> pa.Table:
+    """Linhas de um estado."""
+    return table.filter(pc.field('estado') == estado)
+
+def daily_totals(table: pa.Table) -> pd.Series:
+    """Total de focos por dia (datetime.date), em ordem."""
+    sums = sum_by(table, ['data'], ['total_focos']).sort_by('data')
+    return pd.Series(sums.column('total_focos').to_numpy(), index=sums.column('data').to_pylist(),
+                     name='total_focos', dtype='int64')
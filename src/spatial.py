@@ -0,0 +1,408 @@
+import numpy as np
+import pandas as pd
+import os
+from src.metrics import timed
+
+# Índice espacial em grade e agrupamento de focos próximos (estilo DBSCAN).
+#
+# Os focos são distribuídos em linhas de altura `cell_km` e, dentro de cada
+# linha, em colunas cuja largura em graus é calculada na latitude da linha mais
+# próxima do equador, de modo que nenhuma célula passa de `cell_km` x `cell_km`.
+# A busca de vizinhos compara só os focos de células próximas, em vez de todos
+# os pares de focos.
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = EARTH_RADIUS_KM * np.pi / 180
+# Número máximo de pares candidatos gerados de cada vez (limita a memória)
+MAX_PAIRS = 4_000_000
+# Focos de cada célula comparados antes da verificação completa entre duas células
+_SAMPLE_PER_CELL = 4
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Distância em km entre pontos (vetorizada), pela fórmula de haversine."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype='float64')) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+class GridIndex:
+    """
+    Índice de pontos (lat/lon) em uma grade de resolução fixa, em km.
+
+    Os pontos são ordenados pela chave da célula; cada célula ocupa um trecho
+    contíguo dessa ordem (`cell_start`, `cell_count`), localizado por busca
+    binária na lista de chaves.
+
+    Args:
+        lat (array): Latitudes, em graus.
+        lon (array): Longitudes, em graus.
+        cell_km (float): Tamanho máximo da célula, em km (nas duas direções).
+    """
+
+    def __init__(self, lat, lon, cell_km: float):
+        self.lat = np.asarray(lat, dtype='float64')
+        self.lon = np.asarray(lon, dtype='float64')
+        self.cell_km = float(cell_km)
+        n = len(self.lat)
+        self.cell_lat = self.cell_km / KM_PER_DEGREE
+        self.lat0 = float(self.lat.min()) if n else 0.0
+        self.lon0 = float(self.lon.min()) if n else 0.0
+
+        rows = self._row(self.lat)
+        cols = self._col(rows, self.lon)
+        self.n_cols = int(cols.max()) + 1 if n else 1
+        keys = rows * self.n_cols + cols
+        self.order = np.argsort(keys, kind='stable')
+        self.cell_keys, self.cell_start, self.cell_count = np.unique(
+            keys[self.order], return_index=True, return_counts=True)
+        self.cell_row, self.cell_col = np.divmod(self.cell_keys, self.n_cols)
+        # Pontos na ordem das células, com a célula de cada um
+        self.sorted_lat, self.sorted_lon = self.lat[self.order], self.lon[self.order]
+        self.point_cell = np.repeat(np.arange(len(self.cell_keys)), self.cell_count)
+        self.sorted_cos = np.cos(np.radians(self.sorted_lat))
+        if n:
+            starts = self.cell_start
+            self.bbox = np.column_stack([
+                np.minimum.reduceat(self.sorted_lat, starts), np.maximum.reduceat(self.sorted_lat, starts),
+                np.minimum.reduceat(self.sorted_lon, starts), np.maximum.reduceat(self.sorted_lon, starts),
+            ])
+        else:
+            self.bbox = np.empty((0, 4))
+        self.bbox_cos = np.cos(np.radians(np.maximum(np.abs(self.bbox[:, 0]), np.abs(self.bbox[:, 1]))))
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _row(self, lat) -> np.ndarray:
+        return np.floor((np.asarray(lat, dtype='float64') - self.lat0) / self.cell_lat).astype('int64')
+
+    def _row_width(self, rows) -> np.ndarray:
+        """Largura das colunas (em graus) de cada linha: `cell_km` na latitude mais próxima do equador."""
+        low = self.lat0 + np.asarray(rows) * self.cell_lat
+        high = low + self.cell_lat
+        nearest = np.where((low <= 0) & (high >= 0), 0.0, np.minimum(np.abs(low), np.abs(high)))
+        return self.cell_km / (KM_PER_DEGREE * np.cos(np.radians(np.minimum(nearest, 89.0))))
+
+    def _col(self, rows, lon) -> np.ndarray:
+        return np.floor((np.asarray(lon, dtype='float64') - self.lon0) / self._row_width(rows)).astype('int64')
+
+    def _lon_reach(self, rows, radius_km: float) -> np.ndarray:
+        """Quantos graus de longitude `radius_km` podem valer na linha (na latitude mais distante do equador)."""
+        low = self.lat0 + np.asarray(rows) * self.cell_lat
+        farthest = np.maximum(np.abs(low - self.cell_lat), np.abs(low + 2 * self.cell_lat))
+        return radius_km / (KM_PER_DEGREE * np.cos(np.radians(np.minimum(farthest, 89.0))))
+
+    def _cells_at(self, rows: np.ndarray, cols: np.ndarray):
+        """Posições (no vetor de células) das células pedidas e máscara das que existem."""
+        valid = (cols >= 0) & (cols < self.n_cols)
+        keys = rows * self.n_cols + cols
+        pos = np.minimum(np.searchsorted(self.cell_keys, keys), max(len(self.cell_keys) - 1, 0))
+        return pos, valid & (self.cell_keys[pos] == keys)
+
+    def _cells_near(self, rows, lon_low, lon_high, radius_km: float, half: bool = False):
+        """
+        Células com pontos que podem estar a até `radius_km` de uma faixa
+        [lon_low, lon_high] das linhas `rows`.
+
+        Com `half`, percorre só a própria linha e as de cima (basta para
+        encontrar cada par de células uma vez).
+
+        Returns:
+            tuple: (origem, célula), o índice da faixa de entrada e a célula encontrada.
+        """
+        rows = np.asarray(rows)
+        reach_rows = int(np.ceil(radius_km / self.cell_km))
+        sources, cells = [], []
+        for dr in range(0 if half else -reach_rows, reach_rows + 1):
+            target = rows + dr
+            width = self._row_width(target)
+            # A linha vizinha mais distante do equador limita a largura de `radius_km` em graus
+            reach = np.maximum(self._lon_reach(rows, radius_km), self._lon_reach(target, radius_km))
+            first = np.floor((lon_low - reach - self.lon0) / width).astype('int64')
+            last = np.floor((lon_high + reach - self.lon0) / width).astype('int64')
+            span = last - first
+            for k in range(int(span.max()) + 1 if len(span) else 0):
+                pos, found = self._cells_at(target, first + k)
+                found &= k <= span
+                sources.append(np.flatnonzero(found))
+                cells.append(pos[found])
+        if not sources:
+            return np.array([], dtype='int64'), np.array([], dtype='int64')
+        return np.concatenate(sources), np.concatenate(cells)
+
+    @staticmethod
+    def _gap_km(box_a: np.ndarray, cos_a: np.ndarray, box_b: np.ndarray, cos_b: np.ndarray) -> np.ndarray:
+        """
+        Limite inferior da distância (km) entre retângulos (lat mín., lat máx.,
+        lon mín., lon máx.), dado o cosseno da latitude mais distante do equador de cada um.
+        """
+        dlat = np.maximum(0, np.maximum(box_b[:, 0] - box_a[:, 1], box_a[:, 0] - box_b[:, 1]))
+        dlon = np.maximum(0, np.maximum(box_b[:, 2] - box_a[:, 3], box_a[:, 2] - box_b[:, 3]))
+        dlon *= np.minimum(cos_a, cos_b)
+        # Pequena folga para a diferença entre a aproximação plana e a esfera
+        return KM_PER_DEGREE * np.sqrt(dlat * dlat + dlon * dlon) * (1 - 1e-3)
+
+    def near_box(self, pos: np.ndarray, cells: np.ndarray, radius_km: float) -> np.ndarray:
+        """Quais pontos (posições na ordem das células) podem estar a até `radius_km` de algum ponto de `cells`."""
+        lat, lon, box = self.sorted_lat[pos], self.sorted_lon[pos], self.bbox[cells]
+        dlat = np.maximum(0, np.maximum(box[:, 0] - lat, lat - box[:, 1]))
+        dlon = np.maximum(0, np.maximum(box[:, 2] - lon, lon - box[:, 3]))
+        dlon *= np.minimum(self.sorted_cos[pos], self.bbox_cos[cells])
+        return KM_PER_DEGREE * np.sqrt(dlat * dlat + dlon * dlon) * (1 - 1e-3) <= radius_km
+
+    def neighbor_cells(self, radius_km: float):
+        """
+        Pares de células distintas com pontos que podem estar a até `radius_km`
+        uns dos outros.
+
+        Returns:
+            tuple: (a, b), arrays de índices de células, cada par não ordenado uma única vez (a < b).
+        """
+        if not len(self):
+            return np.array([], dtype='int64'), np.array([], dtype='int64')
+        width = self._row_width(self.cell_row)
+        lon_low = self.lon0 + self.cell_col * width
+        a, b = self._cells_near(self.cell_row, lon_low, lon_low + width, radius_km, half=True)
+        keep = a < b
+        a, b = a[keep], b[keep]
+        keep = self._gap_km(self.bbox[a], self.bbox_cos[a], self.bbox[b], self.bbox_cos[b]) <= radius_km
+        return a[keep], b[keep]
+
+    def within(self, i: np.ndarray, j: np.ndarray, radius_km: float) -> np.ndarray:
+        """
+        Quais pares (i, j) de posições na ordem das células estão a até `radius_km`.
+
+        Usa a aproximação equirretangular, que a poucos km difere da haversine
+        em menos de 0,01%, com bem menos operações por par.
+        """
+        dlat = self.sorted_lat[i] - self.sorted_lat[j]
+        dlon = (self.sorted_lon[i] - self.sorted_lon[j]) * (self.sorted_cos[i] + self.sorted_cos[j]) / 2
+        return dlat * dlat + dlon * dlon <= (radius_km / KM_PER_DEGREE) ** 2
+
+    def query_radius(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Índices (na ordem original) dos pontos a até `radius_km` de (lat, lon)."""
+        if not len(self):
+            return np.array([], dtype='int64')
+        _, pos = self._cells_near(self._row(np.array([lat])), np.array([lon]), np.array([lon]), radius_km)
+        if not len(pos):
+            return np.array([], dtype='int64')
+        sizes = self.cell_count[pos]
+        starts = np.repeat(self.cell_start[pos] - np.r_[0, np.cumsum(sizes)[:-1]], sizes)
+        candidates = self.order[starts + np.arange(sizes.sum())]
+        distances = haversine_km(lat, lon, self.lat[candidates], self.lon[candidates])
+        return np.sort(candidates[distances <= radius_km])
+
+def cross_pairs(a: np.ndarray, b: np.ndarray, start: np.ndarray, count: np.ndarray,
+                max_pairs: int = MAX_PAIRS):
+    """
+    Gera, em blocos, todos os pares de elementos entre os trechos `a[k]` e `b[k]`.
+
+    Cada trecho `c` ocupa as posições `start[c]` a `start[c] + count[c] - 1`.
+
+    Yields:
+        tuple: (k, i, j), o índice do par de trechos e as posições dos elementos.
+    """
+    sizes = count[a] * count[b]
+    nonempty = np.flatnonzero(sizes > 0)
+    sizes = sizes[nonempty]
+    if not len(sizes):
+        return
+    # Blocos cujos pares somam até `max_pairs` (um par de trechos grande fica sozinho)
+    block_id = (np.cumsum(sizes) - 1) // max_pairs
+    bounds = np.r_[0, np.flatnonzero(np.diff(block_id)) + 1, len(sizes)]
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        k = nonempty[first:last]
+        block_sizes = sizes[first:last]
+        rep = np.repeat(np.arange(len(k)), block_sizes)
+        local = np.arange(block_sizes.sum()) - np.repeat(np.r_[0, np.cumsum(block_sizes)[:-1]], block_sizes)
+        i, j = np.divmod(local, count[b[k]][rep])
+        yield k[rep], start[a[k]][rep] + i, start[b[k]][rep] + j
+
+def _expand(start: np.ndarray, count: np.ndarray):
+    """Posições de todos os trechos (`start`, `count`), com o índice do trecho de cada uma."""
+    k = np.repeat(np.arange(len(count)), count)
+    offsets = np.r_[0, np.cumsum(count)[:-1]]
+    return k, np.arange(int(count.sum())) - np.repeat(offsets - start, count)
+
+def _compress(parent: np.ndarray) -> np.ndarray:
+    """Aponta cada elemento diretamente para a raiz do seu conjunto (in-place)."""
+    while True:
+        grand = parent[parent]
+        if np.array_equal(grand, parent):
+            return parent
+        parent[:] = grand
+
+def _union(parent: np.ndarray, a: np.ndarray, b: np.ndarray):
+    """Une (vetorizado) os conjuntos de cada par (a[i], b[i]); a raiz é sempre o menor índice."""
+    while len(a):
+        _compress(parent)
+        ra, rb = parent[a], parent[b]
+        differ = ra != rb
+        if not differ.any():
+            return
+        a, b, ra, rb = a[differ], b[differ], ra[differ], rb[differ]
+        np.minimum.at(parent, np.maximum(ra, rb), np.minimum(ra, rb))
+
+@timed()
+def dbscan(lat, lon, eps_km: float = 1.5, min_samples: int = 3, max_pairs: int = MAX_PAIRS) -> np.ndarray:
+    """
+    Agrupa focos próximos no estilo DBSCAN, com busca de vizinhos pela grade.
+
+    Um foco é "núcleo" se tem pelo menos `min_samples` focos (contando ele
+    mesmo) a até `eps_km`; núcleos vizinhos formam um grupo, e focos não
+    núcleo a até `eps_km` de um núcleo entram no grupo dele. Os demais são
+    ruído.
+
+    A grade usa células com diagonal de até `eps_km`: os focos de uma mesma
+    célula são todos vizinhos entre si, então células com `min_samples` focos
+    ou mais só têm núcleos e a ligação entre grupos é decidida por célula
+    (basta um par de núcleos a até `eps_km` entre duas células), sem comparar
+    todos os pares de focos das regiões densas.
+
+    Args:
+        lat (array): Latitudes, em graus.
+        lon (array): Longitudes, em graus.
+        eps_km (float): Raio da vizinhança, em km.
+        min_samples (int): Número mínimo de focos na vizinhança de um núcleo.
+        max_pairs (int): Pares candidatos avaliados por bloco.
+
+    Returns:
+        np.ndarray: O grupo de cada foco (0, 1, ...), ou -1 para ruído.
+    """
+    index = GridIndex(lat, lon, eps_km / np.sqrt(2))
+    n = len(index)
+    if n == 0:
+        return np.array([], dtype='int64')
+    n_cells = len(index.cell_keys)
+    count, start, cell = index.cell_count, index.cell_start, index.point_cell
+    a, b = index.neighbor_cells(eps_km)
+
+    # Núcleos: em células densas, todos; nas demais, conta os vizinhos das células próximas
+    counts = count[cell].copy()
+    sparse = count < min_samples
+    close_i, close_j = [], []
+    pick = sparse[a] | sparse[b]
+    for _, i, j in cross_pairs(a[pick], b[pick], start, count, max_pairs):
+        close = index.within(i, j, eps_km)
+        i, j = i[close], j[close]
+        counts += np.bincount(i, minlength=n) + np.bincount(j, minlength=n)
+        close_i.append(i)
+        close_j.append(j)
+    core = counts >= min_samples
+
+    # Núcleos de cada célula, contíguos (os pontos já estão na ordem das células)
+    core_pos = np.flatnonzero(core)
+    core_count = np.bincount(cell[core_pos], minlength=n_cells)
+    core_start = np.r_[0, np.cumsum(core_count)[:-1]]
+
+    # Ligação entre células: primeiro uma amostra de núcleos, depois todos os pares das que restarem
+    pick = (core_count[a] > 0) & (core_count[b] > 0)
+    a, b = a[pick], b[pick]
+    linked = np.zeros(len(a), dtype=bool)
+    sample = np.minimum(core_count, _SAMPLE_PER_CELL)
+    for k, i, j in cross_pairs(a, b, core_start, sample, max_pairs):
+        linked[k[index.within(core_pos[i], core_pos[j], eps_km)]] = True
+    # Nas restantes, só os núcleos perto do retângulo da outra célula podem formar o par
+    pending = np.flatnonzero(~linked)
+    near_pos, near_start, near_count = [], [], []
+    offset = 0
+    for this, other in ((a[pending], b[pending]), (b[pending], a[pending])):
+        k, pos = _expand(core_start[this], core_count[this])
+        near = index.near_box(core_pos[pos], other[k], eps_km)
+        counts_near = np.bincount(k[near], minlength=len(pending))
+        near_pos.append(core_pos[pos[near]])
+        near_start.append(offset + np.r_[0, np.cumsum(counts_near)[:-1]])
+        near_count.append(counts_near)
+        offset += len(near_pos[-1])
+    near_pos, near_start, near_count = (np.concatenate(v) for v in (near_pos, near_start, near_count))
+    side_a = np.arange(len(pending))
+    for k, i, j in cross_pairs(side_a, side_a + len(pending), near_start, near_count, max_pairs):
+        linked[pending[k[index.within(near_pos[i], near_pos[j], eps_km)]]] = True
+    parent = np.arange(n_cells)
+    _union(parent, a[linked], b[linked])
+    roots = _compress(parent)
+
+    labels = np.full(n, -1, dtype='int64')
+    # Núcleos e focos de borda na mesma célula de um núcleo (a menos de `eps_km` dele)
+    in_core_cell = core_count[cell] > 0
+    labels[in_core_cell] = roots[cell[in_core_cell]]
+    # Demais focos de borda: o grupo de um núcleo vizinho em outra célula
+    if close_i:
+        i, j = np.concatenate(close_i), np.concatenate(close_j)
+        for p, q in ((i, j), (j, i)):
+            border = (labels[p] < 0) & core[q]
+            labels[p[border]] = roots[cell[q[border]]]
+
+    clustered = labels >= 0
+    labels[clustered] = np.unique(labels[clustered], return_inverse=True)[1]
+    result = np.empty(n, dtype='int64')
+    result[index.order] = labels
+    return result
+
+def cluster_summary(df: pd.DataFrame, labels: np.ndarray) -> pd.DataFrame:
+    """
+    Resume cada grupo de focos: centroide, tamanho, FRP, bioma e municípios atingidos.
+
+    Args:
+        df (pd.DataFrame): Focos com `lat`, `lon` e, se houver, `frp`, `bioma`,
+            `municipio`, `estado` e `data_hora_gmt`.
+        labels (np.ndarray): Grupo de cada foco (ver `dbscan`).
+
+    Returns:
+        pd.DataFrame: Uma linha por grupo (índice `grupo`), do maior para o menor.
+    """
+    focos = df.assign(grupo=np.asarray(labels))
+    focos = focos[focos['grupo'] >= 0]
+    if focos.empty:
+        return pd.DataFrame()
+
+    aggregations = {'n_focos': ('lat', 'size'), 'lat': ('lat', 'mean'), 'lon': ('lon', 'mean')}
+    if 'frp' in focos.columns:
+        aggregations.update(frp_max=('frp', 'max'), frp_total=('frp', 'sum'))
+    if 'data_hora_gmt' in focos.columns:
+        aggregations.update(inicio=('data_hora_gmt', 'min'), fim=('data_hora_gmt', 'max'))
+    summary = focos.groupby('grupo').agg(**aggregations)
+
+    if 'bioma' in focos.columns:
+        # Bioma predominante: o de mais focos no grupo
+        biomas = focos.groupby(['grupo', 'bioma'], observed=True).size().reset_index(name='n')
+        biomas = biomas.sort_values('n', ascending=False).drop_duplicates('grupo')
+        summary['bioma'] = biomas.set_index('grupo')['bioma'].astype(str)
+    for col, count_col in (('municipio', 'n_municipios'), ('estado', 'n_estados')):
+        if col in focos.columns:
+            places = focos[['grupo', col]].drop_duplicates().astype({col: str})
+            summary[count_col] = places.groupby('grupo').size()
+            summary[col + 's'] = places.sort_values(col).groupby('grupo')[col].agg(', '.join)
+    return summary.sort_values('n_focos', ascending=False)
+
+def find_hotspots(processed_data_dir: str, start_date, end_date, estados: list = None,
+                  eps_km: float = 1.5, min_samples: int = 3) -> pd.DataFrame:
+    """
+    Carrega os focos de um intervalo e devolve o resumo dos agrupamentos espaciais.
+
+    Args:
+        processed_data_dir (str): O caminho para o diretório de dados processados.
+        start_date (date | str): Primeiro dia (inclusive).
+        end_date (date | str): Último dia (inclusive).
+        estados (list, opcional): Estados a incluir.
+        eps_km (float): Raio da vizinhança, em km.
+        min_samples (int): Número mínimo de focos na vizinhança de um núcleo.
+
+    Returns:
+        pd.DataFrame: O resultado de `cluster_summary`.
+    """
+    # Importado aqui: src.data_analysis carrega o matplotlib, que o agrupamento não usa
+    from src.data_analysis import load_data
+
+    df = load_data(processed_data_dir, start_date, end_date, estados,
+                   columns=['lat', 'lon', 'data_hora_gmt', 'municipio', 'estado', 'bioma', 'frp'])
+    if df.empty:
+        return pd.DataFrame()
+    labels = dbscan(df['lat'].to_numpy(), df['lon'].to_numpy(), eps_km, min_samples)
+    return cluster_summary(df, labels)
+
+if __name__ == '__main__':
+    from datetime import datetime, timedelta
+
+    PROCESSED_DATA_DIR = os.path.join("data", "processed")
+    end_date = datetime.now().date()
+    hotspots = find_hotspots(PROCESSED_DATA_DIR, end_date - timedelta(days=6), end_date)
+    print(hotspots.head(20))
@@ -0,0 +1,72 @@
+import datetime as dt
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src import snapshot
+from src.data_processing import ROLLUP_DIR
+
+START = dt.date(2025, 6, 1)
+
+def _write_rollup(processed_data_dir, day, focos):
+    """Grava a partição de rollup de um dia, com um foco por estado em `focos`."""
+    partition = os.path.join(processed_data_dir, ROLLUP_DIR, f"data={day:%Y-%m-%d}")
+    os.makedirs(partition, exist_ok=True)
+    n = len(focos)
+    table = pa.table({
+        'estado': focos,
+        'municipio': [f"MUNICIPIO {day.day}"] * n,
+        'bioma': ['Cerrado'] * n,
+        'hora': pa.array([day.day % 24] * n, pa.int8()),
+        'total_focos': pa.array([day.day] * n, pa.int32()),
+        'eventos': pa.array([1] * n, pa.int32()),
+        'soma_dias_sem_chuva': pa.array([day.day * 2] * n, pa.int64()),
+        'n_dias_sem_chuva': pa.array([1] * n, pa.int32()),
+        'soma_frp': [day.day * 1.5] * n,
+        'n_frp': pa.array([1] * n, pa.int32()),
+    })
+    pq.write_table(table, os.path.join(partition, f"focos_diario_br_{day:%Y%m%d}.parquet"))
+
+def _record_reads(monkeypatch):
+    """Registra os dias cujas partições o `build_snapshot` lê."""
+    read = []
+    read_day = snapshot._read_day
+    def recording(processed_data_dir, day):
+        read.append(day)
+        return read_day(processed_data_dir, day)
+    monkeypatch.setattr(snapshot, '_read_day', recording)
+    return read
+
+def test_advancing_window_reads_only_new_day(tmp_path, monkeypatch):
+    for i in range(8):
+        _write_rollup(tmp_path, START + dt.timedelta(days=i), ['PARÁ', 'BAHIA'])
+    previous = os.path.join(tmp_path, 'anterior.arrow')
+    snapshot.write_snapshot(snapshot.build_snapshot(tmp_path, START, START + dt.timedelta(days=6)), previous)
+
+    read = _record_reads(monkeypatch)
+    table = snapshot.build_snapshot(tmp_path, START + dt.timedelta(days=1), START + dt.timedelta(days=7), previous)
+
+    # O dia que saiu da janela é descartado do retrato anterior, sem ler a partição
+    assert read == [START + dt.timedelta(days=7)]
+    monkeypatch.undo()
+    full = snapshot.build_snapshot(tmp_path, START + dt.timedelta(days=1), START + dt.timedelta(days=7))
+    assert table.equals(full, check_metadata=True)
+    assert START not in table.column('data').to_pylist()
+
+def test_reprocessed_day_is_read_again(tmp_path, monkeypatch):
+    for i in range(7):
+        _write_rollup(tmp_path, START + dt.timedelta(days=i), ['PARÁ'])
+    end = START + dt.timedelta(days=6)
+    previous = os.path.join(tmp_path, 'anterior.arrow')
+    snapshot.write_snapshot(snapshot.build_snapshot(tmp_path, START, end), previous)
+    changed = START + dt.timedelta(days=3)
+    _write_rollup(tmp_path, changed, ['PARÁ', 'AMAZONAS', 'BAHIA'])
+
+    read = _record_reads(monkeypatch)
+    table = snapshot.build_snapshot(tmp_path, START, end, previous)
+
+    assert read == [changed]
+    monkeypatch.undo()
+    assert table.equals(snapshot.build_snapshot(tmp_path, START, end), check_metadata=True)
+    assert table.num_rows == 9